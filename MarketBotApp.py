@@ -1,5 +1,6 @@
-from gui_v2 import MarketCSGOBotApp
 import logging
+import sys
+from metrics import start_metrics_server
 
 
 def setup_logging():
@@ -12,8 +13,14 @@ def setup_logging():
     logger.setLevel('INFO')
 
 
-# Application entrypoint
+# Application entrypoint, `--headless` runs the bot without GUI (see daemon.py for its flags)
 if __name__ == '__main__':
+    if '--headless' in sys.argv[1:]:
+        import daemon
+        sys.exit(daemon.main([arg for arg in sys.argv[1:] if arg != '--headless']))
+
+    from gui_v2 import MarketCSGOBotApp  # Tk is loaded only for the GUI
     setup_logging()
+    start_metrics_server()
     app = MarketCSGOBotApp()
     app.mainloop()
@@ -1,58 +1,150 @@
 import time
 
-from requests import get, RequestException, Response
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from urllib.parse import urlencode, quote
+from requests import RequestException, Response
 from json.decoder import JSONDecodeError
 from dotenv import load_dotenv
 from os import getenv
 from data_structures import ItemOnSale
+from decoding import loads, decode_items, decode_lowest_prices, decode_specific_lowest_price
+from http_client import get_session
+from cache import TTLCache
+from price_index import PriceDumpIndex, iter_dump_items
+from rate_limiter import TokenBucket, get_rate_limiter_for_url
+from cancellation import is_cancelled, wait
+from resilience import (ERROR_JSON, ERROR_SERVER, classify_exception, classify_response, get_backoff_delay,
+                        get_circuit_breaker)
+from metrics import (get_endpoint_name, http_request_seconds, http_retries_total, http_failures_total,
+                     http_errors_total, json_decode_errors_total)
 from logging import getLogger
 
 logger = getLogger('market_bot')
 
-API_ITEM_STATUS = {
-    'ON_SALE': '1',
-    'NEED_TO_TRANSFER': '2',
-    'WAITING_FOR_TRANSFER': '3',
-    'READY_TO_RECEIVE': '4',
-}
-
 load_dotenv()
 
-SLEEP_AFTER_REQUEST = 0.42
-SLEEP_ON_RETRY = 1
-REQUEST_TIMEOUT = 8
-
+MARKET_API_URL = getenv('MARKET_API_URL', 'https://market.csgo.com/api/v2')
+TELEGRAM_API_URL = getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+# Outcomes of sending a Telegram message
+TELEGRAM_SENT = 'sent'
+TELEGRAM_FAILED = 'failed'  # network, server or rate-limit error, the message can be sent again later
+TELEGRAM_REJECTED = 'rejected'  # Telegram refused the message itself, e.g. broken markup, sending it again fails too
 
-def get_response_with_retries(request_url, max_retries, sleep_after_request=SLEEP_AFTER_REQUEST,
-                              sleep_on_retry=SLEEP_ON_RETRY) -> Response or None:
-    """ Return response or None if all retries fail. """
+# Pause before the first retry, it doubles with every next one
+SLEEP_ON_RETRY = 1
+# (connect, read) seconds. A request in flight can't be cancelled, so this also bounds how long stopping takes
+REQUEST_CONNECT_TIMEOUT = 3.05
+REQUEST_READ_TIMEOUT = 5
+REQUEST_TIMEOUT = (REQUEST_CONNECT_TIMEOUT, REQUEST_READ_TIMEOUT)
+# How often a thread waiting for a rate limiter token checks for cancellation
+CANCEL_CHECK_INTERVAL = 0.1
+# Limits of names in one search-list-items-by-hash-name-all request
+LOWEST_PRICES_CHUNK_SIZE = 50
+LOWEST_PRICES_MAX_QUERY_LENGTH = 6000
+LOWEST_PRICES_MAX_WORKERS = 3
+# Lowest market prices are reused for a short time instead of being requested again
+LOWEST_PRICES_CACHE_SIZE = 4096
+LOWEST_PRICES_CACHE_TTL = 3.
+
+# Full market dump (prices/USD.json) is kept as a local index and rebuilt when older than max age
+PRICES_DUMP_MAX_AGE = 10 * 60
+PRICES_DUMP_CHUNK_SIZE = 64 * 1024
+# After a failed refresh lookups use the old index, the dump is not downloaded again for this long
+PRICES_DUMP_RETRY_DELAY = 60
+PRICES_DUMP_INDEX_PATH = Path(__file__).parent.resolve() / 'prices_USD.idx'
+
+lowest_prices_cache = TTLCache(maxsize=LOWEST_PRICES_CACHE_SIZE, ttl=LOWEST_PRICES_CACHE_TTL)
+prices_dump_index: PriceDumpIndex or None = None  # opened on first use by get_prices_dump_index()
+_prices_dump_index_lock = Lock()
+_prices_dump_refresh_lock = Lock()
+_prices_dump_refresh_time = None  # time.monotonic() of the last refresh attempt
+
+
+def get_response_with_retries(request_url, max_retries, rate_limiter: TokenBucket = None,
+                              sleep_on_retry: float = None, stream=False) -> Response or None:
+    """ Return response or None if all retries fail, the endpoint's circuit breaker is open or the loop
+    was stopped. Connections are reused through the shared session. Every attempt takes a token from
+    the rate limiter shared by all threads using the same host and key. Timeouts, connection errors and
+    rate-limit errors are retried after exponential backoff with jitter starting from `sleep_on_retry`,
+    5xx responses are returned to the caller. Responses which are not streamed are reported to the
+    breaker by safe_json(), after the body is decoded. """
+    if rate_limiter is None:
+        rate_limiter = get_rate_limiter_for_url(request_url)
+    sleep_on_retry = SLEEP_ON_RETRY if sleep_on_retry is None else sleep_on_retry
+    session = get_session()
+    endpoint = get_endpoint_name(request_url)
+    breaker = get_circuit_breaker(endpoint)
     for attempt in range(max_retries + 1):
+        if not breaker.allow_request():
+            logger.debug(f'Circuit breaker of {endpoint} is open, request skipped.')
+            return
+        # To not exceed limit of 5 requests/sec
+        while not rate_limiter.acquire(timeout=CANCEL_CHECK_INTERVAL):
+            if is_cancelled():
+                break
+        if is_cancelled():
+            logger.debug('Request cancelled.')
+            return
+        start = time.perf_counter()
         try:
-            response = get(request_url, timeout=REQUEST_TIMEOUT)
-            time.sleep(sleep_after_request)  # To not exceed limit of 5 requests/sec
-            return response
+            response = session.get(request_url, timeout=REQUEST_TIMEOUT, stream=stream)
+            http_request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status=response.status_code)
         except RequestException as e:
-            logger.debug(f'Error occurred while executing request: {e.response}')
+            http_request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, status='error')
+            error_kind = classify_exception(e)
+            http_errors_total.inc(endpoint=endpoint, kind=error_kind)
+            breaker.record_failure()
+            logger.debug(f'Error occurred while executing request: {error_kind}, {e}')
             if attempt == max_retries:  # if it was last attempt
                 logger.debug('Failed executing request.')
+                http_failures_total.inc(endpoint=endpoint)
                 return
-            logger.debug('Retrying ...')
-        time.sleep(sleep_on_retry)  # Wait more if exception occurred
+        else:
+            error_kind = classify_response(response)
+            if error_kind is None:
+                if stream:
+                    breaker.record_success()
+                return response
+            http_errors_total.inc(endpoint=endpoint, kind=error_kind)
+            if error_kind == ERROR_SERVER:
+                breaker.record_failure()
+                return response  # server answered, the caller reads the error
+            rate_limiter.penalize()
+            logger.debug('Rate limit exceeded.')
+            if attempt == max_retries:
+                http_failures_total.inc(endpoint=endpoint)
+                return response
+        http_retries_total.inc(endpoint=endpoint, reason=error_kind)
+        logger.debug('Retrying ...')
+        if not wait(get_backoff_delay(attempt, sleep_on_retry)):
+            logger.debug('Request cancelled.')
+            return
 
 
 def safe_json(response: Response) -> dict:
-    """ Always returns json. If JSONDecodeError occurs, the output contains key 'success': False """
+    """ Always returns json. If JSONDecodeError occurs, the output contains key 'success': False.
+    Decoded body means the endpoint works, invalid one counts as its failure. """
+    endpoint = get_endpoint_name(response.url)
+    # 5xx responses are already reported
+    is_reported = classify_response(response) == ERROR_SERVER
     try:
-        return response.json()
+        response_json = loads(response.content)
     except JSONDecodeError as e:
-        # Pause to prevent spamming on a server fail
-        time.sleep(SLEEP_ON_RETRY)
+        json_decode_errors_total.inc(endpoint=endpoint)
+        if not is_reported:
+            http_errors_total.inc(endpoint=endpoint, kind=ERROR_JSON)
+            get_circuit_breaker(endpoint).record_failure()
         return {'success': False, 'error': f'Invalid json body from server, {e.msg}.'}
+    if not is_reported:
+        get_circuit_breaker(endpoint).record_success()
+    return response_json
 
 
 def get_items_on_sale_and_pending_api() -> (list[ItemOnSale], list[ItemOnSale]):
     """ Get items that on sale right now. Return empty list on failure or items list. """
-    request_url = f'https://market.csgo.com/api/v2/items?key={getenv("SECRET_KEY")}'
+    request_url = f'{MARKET_API_URL}/items?key={getenv("SECRET_KEY")}'
     max_retries = 2
 
     response = get_response_with_retries(request_url, max_retries)
@@ -66,35 +158,13 @@ def get_items_on_sale_and_pending_api() -> (list[ItemOnSale], list[ItemOnSale]):
         logger.info(f'Server fail on getting items on sale. Error message: {error_msg}')
         return [], []
 
-    # If there is no items on sale
-    if not response_json['items']:
-        return [], []
-
-    items_on_sale = []
-    items_pending = []
-    for item in response_json['items']:
-        new_item = ItemOnSale(
-            item_id=item['item_id'],
-            position=item['position'],
-            price=int(item['price'] * 1000),  # convert price from float to int format
-            currency=item['currency'],
-            market_hash_name=item['market_hash_name'],
-        )
-        if item['status'] == API_ITEM_STATUS['ON_SALE']:
-            items_on_sale.append(new_item)
-        elif item['status'] in (
-                API_ITEM_STATUS['NEED_TO_TRANSFER'],
-                API_ITEM_STATUS['WAITING_FOR_TRANSFER'],
-                API_ITEM_STATUS['READY_TO_RECEIVE'],
-        ):
-            items_pending.append(new_item)
-
-    return items_on_sale, items_pending
+    # Prices are converted exactly, malformed items are skipped one by one
+    return decode_items(response_json)
 
 
 def set_price_api(item_id: str, price: int) -> bool:
     """ Set price on item by its item_id. Return True if set, False on fail. """
-    request_url = f'https://market.csgo.com/api/v2/set-price' \
+    request_url = f'{MARKET_API_URL}/set-price' \
                   f'?key={getenv("SECRET_KEY")}&item_id={item_id}&price={price}&cur=USD'
     max_retries = 2
 
@@ -113,34 +183,84 @@ def set_price_api(item_id: str, price: int) -> bool:
     return True
 
 
-def get_item_lowest_price_api(market_hash_name: str) -> int:
-    """ Deprecated, slow version. Get minimum market price by hash_name. Return price or 0 on failure. """
-    request_url = f'https://market.csgo.com/api/v2/prices/USD.json'
-    max_retries = 2
+def get_prices_dump_index() -> PriceDumpIndex:
+    """ Return the index of the full market dump, opened on the first call so importing this module
+    touches no files. """
+    global prices_dump_index
+    with _prices_dump_index_lock:
+        if prices_dump_index is None:
+            prices_dump_index = PriceDumpIndex(PRICES_DUMP_INDEX_PATH)
+        return prices_dump_index
+
+
+def refresh_stale_prices_dump_index() -> PriceDumpIndex:
+    """ Rebuild the index if it is older than PRICES_DUMP_MAX_AGE, unless the last attempt was less than
+    PRICES_DUMP_RETRY_DELAY ago. Return the index. """
+    index = get_prices_dump_index()
+    is_retry_due = _prices_dump_refresh_time is None \
+        or time.monotonic() - _prices_dump_refresh_time >= PRICES_DUMP_RETRY_DELAY
+    if index.is_stale(PRICES_DUMP_MAX_AGE) and is_retry_due:
+        refresh_prices_dump_index_api()
+    return index
+
+
+def refresh_prices_dump_index_api() -> bool:
+    """ Stream full market dump into the on-disk index without loading it into memory.
+    Return True if the index was rebuilt. Skipped if another thread is already refreshing. """
+    global _prices_dump_refresh_time
+    if not _prices_dump_refresh_lock.acquire(blocking=False):
+        return False
+    try:
+        _prices_dump_refresh_time = time.monotonic()
+        request_url = f'{MARKET_API_URL}/prices/USD.json'
+        max_retries = 2
+
+        response = get_response_with_retries(request_url, max_retries, stream=True)
+        if response is None:
+            logger.info('Failed on getting prices dump. Max attempts exceeded.')
+            return False
+
+        with response:
+            if not response.ok:
+                logger.info(f'Server fail on getting prices dump. Status code: {response.status_code}')
+                return False
+            try:
+                entries_count = get_prices_dump_index().replace(
+                    iter_dump_items(response.iter_content(chunk_size=PRICES_DUMP_CHUNK_SIZE)))
+            except (RequestException, ValueError) as e:  # ValueError covers a truncated or undecodable dump
+                logger.info(f'Failed on reading prices dump, the old index is kept: {e}')
+                return False
+
+        if not entries_count:
+            logger.info('Server fail on getting prices dump. No items in the dump.')
+            return False
+        logger.debug(f'prices dump index rebuilt with {entries_count} items')
+        return True
+    finally:
+        _prices_dump_refresh_lock.release()
 
-    response = get_response_with_retries(request_url, max_retries)
-    if response is None:
-        logger.info('Failed on getting price by name. Max attempts exceeded.')
-        return 0
 
-    response_json = safe_json(response)
-    if not response_json['success']:
-        logger.info('Server fail on getting price by name.')
-        return 0
+def get_item_lowest_price_api(market_hash_name: str) -> int:
+    """ Get minimum market price by hash_name from the full market dump index.
+    The dump is downloaded once per PRICES_DUMP_MAX_AGE, lookups are local. Return price or 0 on failure. """
+    lowest_price = refresh_stale_prices_dump_index().lookup(market_hash_name)
+    logger.debug(f'lowest price from dump index = {lowest_price}')
+    return lowest_price
 
-    lowest_price = 0
-    for item in response_json['items']:
-        if item['market_hash_name'] == market_hash_name:
-            lowest_price = int(float(item['price']) * 1000)
-            logger.debug(f'lowest price from api = {lowest_price}')
 
-    return lowest_price
+def get_dict_of_items_lowest_prices_from_dump_api(market_hash_names: list[str]) -> dict[str, int]:
+    """ Price a whole inventory from one dump download. Names missing from the dump are missing from the result. """
+    return refresh_stale_prices_dump_index().lookup_many(dict.fromkeys(market_hash_names))
 
 
 def get_item_lowest_price_v2_api(market_hash_name: str) -> int:
     """ Get minimum market price by hash_name. Return price or 0 on failure. """
-    request_url = f'https://market.csgo.com/api/v2/search-item-by-hash-name-specific' \
-                  f'?key={getenv("SECRET_KEY")}&hash_name={market_hash_name}'
+    cached_price = lowest_prices_cache.get(market_hash_name)
+    if cached_price is not None:
+        return cached_price
+
+    request_url = f'{MARKET_API_URL}/search-item-by-hash-name-specific' \
+                  f'?key={getenv("SECRET_KEY")}&hash_name={quote(market_hash_name)}'
     max_retries = 2
 
     response = get_response_with_retries(request_url, max_retries)
@@ -153,60 +273,110 @@ def get_item_lowest_price_v2_api(market_hash_name: str) -> int:
         logger.info('Server fail on getting price by name.')
         return 0
 
-    lowest_price = 0
-    if response_json['data']:
-        lowest_price = response_json['data'][0]['price']
+    lowest_price = decode_specific_lowest_price(response_json)
+    if lowest_price:
         logger.debug(f'lowest price from api v2 = {lowest_price}')
+        lowest_prices_cache.set(market_hash_name, lowest_price)
 
     return lowest_price
 
 
-def get_dict_of_items_lowest_prices_api(market_hash_names: list[str]) -> dict[str, int]:
-    request_url = 'https://market.csgo.com/api/v2/search-list-items-by-hash-name-all?' \
-                  f'key={getenv("SECRET_KEY")}'
-    for hash_name in market_hash_names:
-        request_url += f'&list_hash_name[]={hash_name}'
-
+def split_hash_names_into_chunks(market_hash_names: list[str], chunk_size=LOWEST_PRICES_CHUNK_SIZE,
+                                 max_query_length=LOWEST_PRICES_MAX_QUERY_LENGTH) -> list[list[str]]:
+    """ Remove duplicates (keeping order) and split names into chunks limited
+    by count and by length of the url-encoded query. """
+    chunks = []
+    chunk, query_length = [], 0
+    for hash_name in dict.fromkeys(market_hash_names):
+        param_length = len(urlencode({'list_hash_name[]': hash_name})) + 1
+        if chunk and (len(chunk) == chunk_size or query_length + param_length > max_query_length):
+            chunks.append(chunk)
+            chunk, query_length = [], 0
+        chunk.append(hash_name)
+        query_length += param_length
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def get_chunk_of_items_lowest_prices_api(market_hash_names: list[str]) -> dict[str, int] or None:
+    """ Get lowest prices for one chunk of names. Return None on failure. """
+    query = urlencode([('key', getenv('SECRET_KEY') or '')] +
+                      [('list_hash_name[]', hash_name) for hash_name in market_hash_names])
+    request_url = f'{MARKET_API_URL}/search-list-items-by-hash-name-all?{query}'
     max_retries = 2
 
     response = get_response_with_retries(request_url, max_retries)
     if response is None:
         logger.info('Failed on getting list of prices by name. Max attempts exceeded.')
-        return {}
+        return
 
     response_json = safe_json(response)
     if not response_json['success']:
         logger.info('Server fail on getting list of prices by name.')
-        return {}
+        return
+
+    return decode_lowest_prices(response_json)
+
 
-    lowest_prices = {}
-    if response_json['data']:
-        prices_dict = response_json['data']
-        for key, value in prices_dict.items():
-            if value[0]['price'].isdigit():
-                lowest_prices[key] = int(value[0]['price'])
+def get_lowest_prices_with_failures_api(market_hash_names: list[str], chunk_size=LOWEST_PRICES_CHUNK_SIZE,
+                                        max_workers=LOWEST_PRICES_MAX_WORKERS) -> (dict[str, int], list[str]):
+    """ Get lowest prices for distinct names in chunks, fetched concurrently within the shared rate limit.
+    Prices still alive in the cache are not requested again.
+    Return merged prices and names from the chunks that failed. """
+    lowest_prices, missing_hash_names = lowest_prices_cache.get_many(dict.fromkeys(market_hash_names))
+    chunks = split_hash_names_into_chunks(missing_hash_names, chunk_size)
+    if not chunks:
+        return lowest_prices, []
 
+    failed_hash_names = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        for chunk, chunk_prices in zip(chunks, executor.map(get_chunk_of_items_lowest_prices_api, chunks)):
+            if chunk_prices is None:
+                failed_hash_names.extend(chunk)
+            else:
+                lowest_prices.update(chunk_prices)
+                for hash_name, price in chunk_prices.items():
+                    lowest_prices_cache.set(hash_name, price)
+
+    return lowest_prices, failed_hash_names
+
+
+def get_dict_of_items_lowest_prices_api(market_hash_names: list[str]) -> dict[str, int]:
+    """ Get lowest prices by names. Names that failed are missing from the result. """
+    lowest_prices, failed_hash_names = get_lowest_prices_with_failures_api(market_hash_names)
+    if failed_hash_names:
+        logger.info(f'Failed on getting lowest prices for {len(failed_hash_names)} item names.')
     return lowest_prices
 
 
-def send_telegram_message(message: str) -> bool:
-    request_url = f'https://api.telegram.org/bot{getenv("TELEGRAM_BOT_TOKEN")}/sendMessage?' \
-                  f'chat_id={getenv("TELEGRAM_CHAT_ID")}&text={message}&parse_mode=Markdown'
-    max_retries = 3
+def send_telegram_message(message: str, max_retries=3, parse_mode: str or None = 'Markdown') -> bool:
+    return post_telegram_message(message, max_retries, parse_mode) == TELEGRAM_SENT
+
+
+def post_telegram_message(message: str, max_retries=3, parse_mode: str or None = 'Markdown') -> str:
+    """ Send message to the chat, as plain text if parse_mode is None. Return TELEGRAM_SENT, TELEGRAM_FAILED
+    or TELEGRAM_REJECTED. """
+    request_url = f'{TELEGRAM_API_URL}/bot{getenv("TELEGRAM_BOT_TOKEN")}/sendMessage?' \
+                  f'chat_id={getenv("TELEGRAM_CHAT_ID")}&text={quote(message)}'
+    if parse_mode is not None:
+        request_url += f'&parse_mode={parse_mode}'
 
     response = get_response_with_retries(request_url, max_retries)
 
     if response is None:
         logger.info('Failed on sending telegram message. Max attempts exceeded.')
-        return False
+        return TELEGRAM_FAILED
 
     response_json = safe_json(response)
-    if 'ok' in response_json:
-        if response_json['ok']:
-            return True
-
-    logger.info('Server fail on sending telegram message.')
-    return False
+    if response_json.get('ok'):
+        return TELEGRAM_SENT
+    if classify_response(response) is not None:
+        logger.info('Server fail on sending telegram message.')
+        return TELEGRAM_FAILED
+
+    logger.info(f'Telegram rejected message: {response_json.get("description", response_json)}')
+    return TELEGRAM_REJECTED
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+""" Parse throughput of big items and lowest prices payloads: previous response.json() plus hand-walking
+vs decoding.py with the stdlib json backend and with orjson (when installed).
+Payloads are generated in the shape of recorded responses, or read from files given with --items / --prices.
+Run from the repository root: python -m benchmarks.bench_decoding """
+import argparse
+import json
+import random
+import time
+from unittest.mock import patch
+
+import decoding
+from data_structures import ItemOnSale
+from decoding import loads, decode_items, decode_lowest_prices
+
+ITEMS_COUNT = 20_000
+NAMES_COUNT = 5_000
+RUNS = 5
+
+
+def make_items_payload() -> bytes:
+    rng = random.Random(0)
+    items = [{'item_id': str(4_000_000_000 + i), 'assetid': str(30_000_000_000 + i),
+              'classid': str(rng.randrange(10 ** 9)), 'instanceid': '0', 'real_instance': '0',
+              'market_hash_name': f'Item name {i % 3000} (Field-Tested)',
+              'position': rng.randint(1, 30), 'price': rng.randint(10, 500_000) / 1000, 'currency': 'USD',
+              'status': rng.choice('11112'), 'live_time': rng.randint(0, 10 ** 6), 'left': None, 'botid': '0'}
+             for i in range(ITEMS_COUNT)]
+    return json.dumps({'success': True, 'items': items}).encode()
+
+
+def make_prices_payload() -> bytes:
+    rng = random.Random(1)
+    data = {f'Item name {i} (Field-Tested)': [{'market_hash_name': f'Item name {i} (Field-Tested)',
+                                               'price': str(rng.randint(10, 500_000 + offer)), 'class': '1',
+                                               'instance': '0', 'count': 1} for offer in range(3)]
+            for i in range(NAMES_COUNT)}
+    return json.dumps({'success': True, 'currency': 'USD', 'data': data}).encode()
+
+
+def previous_items(document: bytes) -> list[ItemOnSale]:
+    """ get_items_on_sale_and_pending_api before the decoding layer. """
+    items = []
+    for item in json.loads(document)['items']:
+        items.append(ItemOnSale(item['item_id'], item['position'], int(item['price'] * 1000),
+                                item['currency'], item['market_hash_name']))
+    return items
+
+
+def previous_prices(document: bytes) -> dict[str, int]:
+    lowest_prices = {}
+    for key, value in json.loads(document)['data'].items():
+        if value and value[0]['price'].isdigit():
+            lowest_prices[key] = int(value[0]['price'])
+    return lowest_prices
+
+
+def measure(function, document: bytes) -> float:
+    """ Best of runs, in MB/s. """
+    best = float('inf')
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function(document)
+        best = min(best, time.perf_counter() - start)
+    return len(document) / best / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', help='recorded response of the items endpoint')
+    parser.add_argument('--prices', help='recorded response of search-list-items-by-hash-name-all')
+    args = parser.parse_args()
+    items_document = open(args.items, 'rb').read() if args.items else make_items_payload()
+    prices_document = open(args.prices, 'rb').read() if args.prices else make_prices_payload()
+
+    cases = [
+        ('items', items_document, previous_items, lambda document: decode_items(loads(document))),
+        ('prices', prices_document, previous_prices, lambda document: decode_lowest_prices(loads(document))),
+    ]
+    print(f'orjson {"installed" if decoding.orjson is not None else "not installed"}')
+    print(f'{"payload":>8} {"size, MB":>9} {"previous, MB/s":>15} {"json, MB/s":>11} {"orjson, MB/s":>13}')
+    for name, document, previous, decode in cases:
+        previous_speed = measure(previous, document)
+        with patch('decoding.orjson', None):
+            json_speed = measure(decode, document)
+        orjson_speed = measure(decode, document) if decoding.orjson is not None else float('nan')
+        print(f'{name:>8} {len(document) / 1e6:>9.2f} {previous_speed:>15.1f} {json_speed:>11.1f} '
+              f'{orjson_speed:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+""" Run price_update_loop against the local fake market and report items repriced per second,
+API calls per iteration and p50/p99 iteration latency for inventories of different sizes.
+Run from the repository root: python -m benchmarks.bench_end_to_end [--duration 15] [--rate 5] [--sizes 10 100] """
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from threading import Event, Thread
+
+import api_requests
+from bot import MarketBot, price_update_loop
+from rate_limiter import get_rate_limiter, reset_rate_limiters
+from tests.fake_market import FakeMarket
+
+API_KEY = 'bench-key'
+
+
+def percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else float('nan')
+
+
+def run(listings_count: int, duration: float, rate: float, latency: float) -> dict:
+    market = FakeMarket(latency=latency, rate_limit=rate, undercut_chance=0.05).start()
+    for i in range(listings_count):
+        name = f'Item name {i % max(1, listings_count // 2)}'
+        market.add_item(str(1_000_000 + i), name, price=10_000, competitor_price=9_000)
+
+    api_requests.MARKET_API_URL = market.api_url
+    api_requests.TELEGRAM_API_URL = market.url
+    api_requests.lowest_prices_cache.clear()
+    reset_rate_limiters()
+    # Token bucket burst on top of the refill rate would overrun the market's sliding window, leave headroom
+    get_rate_limiter('127.0.0.1', API_KEY, rate=rate * 0.9, burst=1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bot = MarketBot()
+        bot.db_path = Path(tmp_dir) / 'bot_data.db'
+        bot.save_items_user_prices_to_db([(item_id, 1_000, 20_000) for item_id in market.items])
+
+        stop_event, finish_event = Event(), Event()
+        start = time.perf_counter()
+        Thread(target=price_update_loop, args=(bot, stop_event, finish_event), daemon=True).start()
+        time.sleep(duration)
+        stop_event.set()
+        finish_event.wait()
+        elapsed = time.perf_counter() - start
+        bot.storage.close()
+    market.stop()
+
+    iteration_starts = market.items_requests_times
+    iteration_latencies = [end - begin for begin, end in zip(iteration_starts, iteration_starts[1:])]
+    iterations = max(1, len(iteration_starts))
+    return {
+        'repriced_per_second': market.price_changes_count / elapsed,
+        'calls_per_iteration': sum(market.requests_count.values()) / iterations,
+        'iterations': iterations,
+        'p50': percentile(iteration_latencies, 0.5),
+        'p99': percentile(iteration_latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=30., help='seconds per inventory size')
+    parser.add_argument('--rate', type=float, default=5., help='requests/sec allowed by the fake market')
+    parser.add_argument('--latency', type=float, default=0.05, help='fake market response latency, seconds')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+    os.environ['SECRET_KEY'] = API_KEY
+
+    print(f'{"listings":>8} {"repriced/s":>10} {"calls/iter":>10} {"iters":>6} {"p50 iter, s":>11} {"p99 iter, s":>11}')
+    for listings_count in args.sizes:
+        result = run(listings_count, args.duration, args.rate, args.latency)
+        print(f'{listings_count:>8} {result["repriced_per_second"]:>10.2f} {result["calls_per_iteration"]:>10.1f} '
+              f'{result["iterations"]:>6} {result["p50"]:>11.3f} {result["p99"]:>11.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+""" Compare per-request latency of one-shot requests.get calls with the pooled keep-alive session.
+Run from the repository root: python -m benchmarks.bench_http_session """
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import mean
+from threading import Thread
+
+import requests
+
+from http_client import create_session
+
+REQUESTS_COUNT = 300
+RESPONSE_BODY = b'{"success": true}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive is only possible with HTTP/1.1
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(send, url) -> list[float]:
+    timings = []
+    for _ in range(REQUESTS_COUNT):
+        start = time.perf_counter()
+        send(url, timeout=5)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/api/v2/items'
+
+    session = create_session()
+    try:
+        one_shot = measure(requests.get, url)
+        pooled = measure(session.get, url)
+    finally:
+        session.close()
+        server.shutdown()
+
+    print(f'requests.get (new connection): {mean(one_shot) * 1000:.3f} ms/request')
+    print(f'pooled session (keep-alive):   {mean(pooled) * 1000:.3f} ms/request')
+    print(f'saving: {(mean(one_shot) - mean(pooled)) * 1000:.3f} ms/request '
+          f'({(1 - mean(pooled) / mean(one_shot)) * 100:.1f}%)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+""" Memory of 50k listings and allocations of one items merge, measured with tracemalloc:
+plain dataclass items (previous ItemOnSale) vs slotted items with interned hash names.
+Run from the repository root: python -m benchmarks.bench_item_memory """
+import json
+import tracemalloc
+from dataclasses import dataclass
+
+from data_structures import ItemOnSale, ItemStore
+
+LISTINGS_COUNT = 50_000
+DISTINCT_NAMES_COUNT = 5_000
+
+
+@dataclass
+class PlainItemOnSale:
+    item_id: str
+    position: int
+    price: int
+    currency: str
+    market_hash_name: str
+    user_min_price = 0
+    user_target_price = 0
+    last_update_time = 0.
+
+
+def api_response() -> bytes:
+    return json.dumps({'items': [
+        {'item_id': str(4_000_000_000 + i), 'position': i % 20, 'price': (1000 + i) / 1000, 'currency': 'USD',
+         'market_hash_name': f'Item name {i % DISTINCT_NAMES_COUNT} (Field-Tested)'}
+        for i in range(LISTINGS_COUNT)]}).encode()
+
+
+def parse_items(item_class, response: bytes) -> list:
+    """ Same conversion as get_items_on_sale_and_pending_api, every string is a new object after json.loads. """
+    return [item_class(item['item_id'], item['position'], int(item['price'] * 1000), item['currency'],
+                       item['market_hash_name']) for item in json.loads(response)['items']]
+
+
+def measure(item_class, response: bytes) -> (int, int):
+    tracemalloc.start()
+    store = ItemStore(parse_items(item_class, response))
+    for item in store:
+        item.user_min_price, item.user_target_price = 100, 900  # per instance state, as set from db
+    store_size = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.reset_peak()
+    before_merge = tracemalloc.get_traced_memory()[0]
+    store.merge(parse_items(item_class, response))
+    merge_peak = tracemalloc.get_traced_memory()[1] - before_merge
+    tracemalloc.stop()
+    return store_size, merge_peak
+
+
+def main():
+    response = api_response()
+    print(f'{LISTINGS_COUNT} listings, {DISTINCT_NAMES_COUNT} distinct hash names')
+    print(f'{"":<26} {"store, MiB":>10} {"merge peak, MiB":>16}')
+    for title, item_class in (('plain dataclass', PlainItemOnSale), ('slotted, interned names', ItemOnSale)):
+        store_size, merge_peak = measure(item_class, response)
+        print(f'{title:<26} {store_size / 2 ** 20:>10.2f} {merge_peak / 2 ** 20:>16.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+""" Pricing pass lookups and items merge at 10k listings: list with linear search vs ItemStore.
+Run from the repository root: python -m benchmarks.bench_item_store """
+import time
+
+from data_structures import ItemOnSale, ItemStore
+
+LISTINGS_COUNT = 10_000
+
+
+def make_items() -> list[ItemOnSale]:
+    return [ItemOnSale(str(4_000_000_000 + i), i % 20, 1000 + i, 'USD', f'Item name {i % 2000}')
+            for i in range(LISTINGS_COUNT)]
+
+
+def list_pass(items: list[ItemOnSale]):
+    """ Previous set_user_price_for_all_items: linear search of every item by its id. """
+    for item in items:
+        for itm in items:
+            if itm.item_id == item.item_id:
+                break
+
+
+def store_pass(store: ItemStore):
+    for item in store:
+        store.get(item.item_id)
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    items = make_items()
+    store = ItemStore(make_items())
+
+    print(f'{LISTINGS_COUNT} listings')
+    print(f'pricing pass lookups, list scan: {timed(list_pass, items) * 1000:.1f} ms')
+    print(f'pricing pass lookups, ItemStore: {timed(store_pass, store) * 1000:.1f} ms')
+    print(f'merge of fresh items into ItemStore: {timed(store.merge, make_items()) * 1000:.1f} ms')
+    print(f'hash name lookup: {timed(store.get_by_hash_name, "Item name 7") * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+""" GUI items table refresh, without Tk: formatting every row into one text (previous refresh_item_list)
+vs incremental model update and visible lines diff. 1% of items change between refreshes.
+Run from the repository root: python -m benchmarks.bench_item_table """
+import random
+import time
+
+from data_structures import ItemOnSale
+from item_table import ItemTableModel, TableViewport, FRAME_BUDGET_SECONDS, ROW_FORMAT, get_row_values
+
+SIZES = (100, 1000, 10_000)
+REFRESHES = 50
+VISIBLE_ROWS = 17
+
+
+def full_rebuild(items: list[ItemOnSale]) -> str:
+    return '\n'.join(ROW_FORMAT.format(*get_row_values(idx, item)) for idx, item in enumerate(items, 1))
+
+
+def run(listings_count: int) -> (float, float):
+    rng = random.Random(0)
+    items = [ItemOnSale(str(4_000_000_000 + i), i % 20, 1000 + i, 'USD', f'Item name {i}')
+             for i in range(listings_count)]
+    model = ItemTableModel()
+    viewport = TableViewport(model, VISIBLE_ROWS)
+    model.update(items)
+    viewport.get_line_updates()
+
+    full_seconds = incremental_seconds = 0.
+    for _ in range(REFRESHES):
+        for item in rng.sample(items, max(1, listings_count // 100)):
+            item.price += 1
+        start = time.perf_counter()
+        full_rebuild(items)
+        full_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        model.update(list(items))
+        viewport.get_line_updates()
+        incremental_seconds += time.perf_counter() - start
+    return full_seconds / REFRESHES, incremental_seconds / REFRESHES
+
+
+def main():
+    print(f'frame budget {FRAME_BUDGET_SECONDS * 1000:.1f} ms, Tk text widget time not included')
+    print(f'{"listings":>8} {"full rebuild, ms":>17} {"incremental, ms":>16}')
+    for listings_count in SIZES:
+        full_seconds, incremental_seconds = run(listings_count)
+        print(f'{listings_count:>8} {full_seconds * 1000:>17.2f} {incremental_seconds * 1000:>16.2f}')
+
+
+if __name__ == '__main__':
+    main()
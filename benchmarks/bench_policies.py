@@ -0,0 +1,70 @@
+""" Price policy over 100k items: scalar price_update_policy per item vs batch_price_update_policy.
+Run from the repository root: python -m benchmarks.bench_policies """
+import random
+import time
+
+import numpy as np
+
+from policies import price_update_policy, batch_price_update_policy, get_changed_indices
+
+ITEMS_COUNT = 100_000
+RUNS = 5
+
+
+def make_inventory() -> list[tuple[int, int, int, int, int]]:
+    rng = random.Random(0)
+    inventory = []
+    for _ in range(ITEMS_COUNT):
+        min_price = rng.randint(100, 50_000)
+        inventory.append((min_price + rng.randint(0, 5000), min_price + rng.randint(-2000, 5000),
+                          min_price, min_price + rng.randint(-100, 10_000), rng.randint(1, 20)))
+    return inventory
+
+
+def scalar_pass(inventory) -> list[tuple[int, int]]:
+    """ Checks of MarketBot.get_new_price_for_item, one item at a time. """
+    changes = []
+    for idx, (current_price, lowest_price, min_price, target_price, position) in enumerate(inventory):
+        if min_price == 0 or target_price == 0 or position <= 1:
+            continue
+        new_price = price_update_policy(current_price, lowest_price, min_price, target_price)
+        if new_price == current_price or new_price < min_price or target_price < min_price:
+            continue
+        changes.append((idx, new_price))
+    return changes
+
+
+def batch_pass(columns) -> list[tuple[int, int]]:
+    new_prices, skip_reasons = batch_price_update_policy(*columns)
+    changed_indices = get_changed_indices(skip_reasons)
+    return list(zip(changed_indices.tolist(), new_prices[changed_indices].tolist()))
+
+
+def measure(function, *args) -> (float, list):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    inventory = make_inventory()
+    columns = [np.array(column, dtype=np.int64) for column in zip(*inventory)]
+
+    scalar_seconds, scalar_changes = measure(scalar_pass, inventory)
+    batch_seconds, batch_changes = measure(batch_pass, columns)
+    kernel_seconds, _ = measure(batch_price_update_policy, *columns)
+    build_seconds, _ = measure(lambda: [np.array(column, dtype=np.int64) for column in zip(*inventory)])
+    assert scalar_changes == batch_changes
+
+    print(f'{ITEMS_COUNT} items, {len(batch_changes)} need a set-price call')
+    print(f'scalar:                   {scalar_seconds * 1000:8.2f} ms')
+    print(f'batch policy only:        {kernel_seconds * 1000:8.2f} ms ({scalar_seconds / kernel_seconds:.0f}x)')
+    print(f'batch to list of changes: {batch_seconds * 1000:8.2f} ms ({scalar_seconds / batch_seconds:.0f}x)')
+    print(f'batch + arrays from rows: {(batch_seconds + build_seconds) * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
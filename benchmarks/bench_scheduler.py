@@ -0,0 +1,97 @@
+""" Simulate a mixed inventory under competitor undercuts and compare mean time-to-first-position
+of full sweeps (every pass reads prices of all items and walks them in API order) with the urgency
+scheduler (every pass reads prices of and reprices only the most urgent items) at the same request rate.
+Run from the repository root: python -m benchmarks.bench_scheduler """
+import random
+from math import ceil
+from statistics import mean
+
+from data_structures import ItemOnSale
+from scheduler import RepriceScheduler
+
+ITEMS_COUNT = 600
+SIMULATION_SECONDS = 3600
+REQUESTS_PER_SECOND = 5
+NAMES_PER_PRICES_REQUEST = 50
+COOL_DOWN_SECONDS = 9
+SCHEDULER_ITEMS_PER_PASS = 50
+# (inventory class, share of inventory, probability per second that a competitor undercuts the item)
+INVENTORY_MIX = [('hot', 0.1, 0.05), ('warm', 0.3, 0.01), ('quiet', 0.6, 0.001)]
+
+
+class Market:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.now = 0.
+        self.items, self.item_classes, self.undercut_chances = [], {}, {}
+        for class_name, share, chance in INVENTORY_MIX:
+            for _ in range(int(ITEMS_COUNT * share)):
+                item_id = str(len(self.items))
+                self.items.append(ItemOnSale(item_id, 1, 10_000, 'USD', f'name {item_id}'))
+                self.item_classes[item_id], self.undercut_chances[item_id] = class_name, chance
+        self.rng.shuffle(self.items)
+        self.lowest_prices = {item.market_hash_name: item.price for item in self.items}
+        self.lost_first_time = {}
+        self.times_to_first = {class_name: [] for class_name, _, _ in INVENTORY_MIX}
+
+    def spend_request(self):
+        """ One request slot passes, competitors may undercut meanwhile. """
+        step = 1 / REQUESTS_PER_SECOND
+        for item in self.items:
+            if self.rng.random() < self.undercut_chances[item.item_id] * step:
+                gap = self.rng.uniform(0.001, 0.2)
+                self.lowest_prices[item.market_hash_name] = int(item.price * (1 - gap))
+                item.position = self.rng.randint(2, 20)
+                self.lost_first_time.setdefault(item.item_id, self.now)
+        self.now += step
+
+    def read_lowest_prices(self, hash_names: list[str]) -> dict[str, int]:
+        for _ in range(ceil(len(hash_names) / NAMES_PER_PRICES_REQUEST)):
+            self.spend_request()
+        return {hash_name: self.lowest_prices[hash_name] for hash_name in hash_names}
+
+    def set_price(self, item: ItemOnSale, new_price: int):
+        self.spend_request()
+        if new_price >= self.lowest_prices[item.market_hash_name]:
+            return  # undercut again while waiting, price is stale
+        item.price = new_price
+        item.position = 1
+        item.last_update_time = self.now
+        self.lowest_prices[item.market_hash_name] = new_price
+        lost_time = self.lost_first_time.pop(item.item_id, None)
+        if lost_time is not None:
+            self.times_to_first[self.item_classes[item.item_id]].append(self.now - lost_time)
+
+    def get_items_to_update(self) -> list[ItemOnSale]:
+        self.spend_request()  # items request tells positions
+        return [item for item in self.items
+                if item.position > 1 and self.now - item.last_update_time >= COOL_DOWN_SECONDS]
+
+
+def simulate(use_scheduler: bool, seed=7) -> dict[str, list[float]]:
+    market = Market(seed)
+    scheduler = RepriceScheduler(COOL_DOWN_SECONDS, max_items_per_pass=SCHEDULER_ITEMS_PER_PASS)
+    while market.now < SIMULATION_SECONDS:
+        if use_scheduler:
+            items_to_update = scheduler.select(market.get_items_to_update(), now=market.now)
+            lowest_prices = market.read_lowest_prices([item.market_hash_name for item in items_to_update])
+            scheduler.observe_lowest_prices(lowest_prices)
+        else:
+            lowest_prices = market.read_lowest_prices([item.market_hash_name for item in market.items])
+            items_to_update = market.get_items_to_update()
+        for item in items_to_update:
+            market.set_price(item, lowest_prices[item.market_hash_name] - 1)
+    return market.times_to_first
+
+
+def main():
+    print(f'{ITEMS_COUNT} items, {REQUESTS_PER_SECOND} requests/sec, {SIMULATION_SECONDS} s simulated')
+    for name, use_scheduler in (('full sweep', False), ('urgency scheduler', True)):
+        times_to_first = simulate(use_scheduler)
+        all_times = sum(times_to_first.values(), [])
+        by_class = ', '.join(f'{class_name} {mean(times):.1f} s' for class_name, times in times_to_first.items())
+        print(f'{name:>18}: mean time-to-first-position {mean(all_times):.1f} s ({by_class})')
+
+
+if __name__ == '__main__':
+    main()
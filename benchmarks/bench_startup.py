@@ -0,0 +1,27 @@
+""" Time to import the headless entry point in a fresh interpreter, i.e. restart cost after a deploy.
+Run from the repository root: python -m benchmarks.bench_startup """
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 10
+MODULES = ('daemon', 'bot', 'requests')
+
+
+def measure(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    baseline = statistics.median(measure('sys') for _ in range(RUNS))
+    print(f'interpreter startup: {baseline * 1000:.0f} ms')
+    for module in MODULES:
+        seconds = statistics.median(measure(module) for _ in range(RUNS))
+        print(f'import {module}: {(seconds - baseline) * 1000:.0f} ms on top of interpreter startup')
+
+
+if __name__ == '__main__':
+    main()
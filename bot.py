@@ -1,60 +1,74 @@
 from api_requests import get_items_on_sale_and_pending_api
-from api_requests import set_price_api
 from api_requests import get_dict_of_items_lowest_prices_api
-from api_requests import send_telegram_message
+from api_requests import lowest_prices_cache
+from api_requests import REQUEST_CONNECT_TIMEOUT, REQUEST_READ_TIMEOUT
 from policies import price_update_policy
+from pending_sales import PendingSalesTracker
+from data_structures import ItemStore
+from storage import BotStorage
+from dispatcher import SetPriceDispatcher, PriceChange
+from scheduler import RepriceScheduler
+from cadence import CadenceController
+from price_feed import PriceFeed
+from price_history import PriceHistory
+from notifier import SaleNotifier
+from snapshots import InventorySnapshot, take_snapshot
+from commands import CommandQueue, SetUserPrices
+from metrics import reprice_outcomes_total, loop_iterations_total, loop_iteration_seconds
+from metrics import start_metrics_server
+from cancellation import set_cancel_event, is_cancelled
 from threading import Event, Thread
-from sqlite3 import connect
 from pathlib import Path
 from logging import getLogger
+from os import getenv
 import time
 
 logger = getLogger('market_bot')
 
+PRICE_FEED_ENABLED = getenv('PRICE_FEED_ENABLED', '0') == '1'
+# Upper bound of the time from stop_event to finish_event: a request in flight, then flush of the price history
+MAX_STOP_SECONDS = REQUEST_CONNECT_TIMEOUT + REQUEST_READ_TIMEOUT + 2
+
 
 class MarketBot:
-    def __init__(self):
-        self.items = []
-        self.db_path = Path(__file__).parent.resolve() / 'bot_data.db'
+    def __init__(self, db_path: Path = None, shared_lowest_prices=None):
+        self.items = ItemStore()
+        self.db_path = db_path or Path(__file__).parent.resolve() / 'bot_data.db'
         self.ITEM_UPDATE_COOL_DOWN_SECONDS = 9
+        self.dispatcher = SetPriceDispatcher()
+        self.scheduler = RepriceScheduler(self.ITEM_UPDATE_COOL_DOWN_SECONDS)
+        self.cadence = CadenceController()  # wait between loop passes, grows while nothing changes
+        # Optional push feed of lowest prices, polling is used while it is not connected
+        self.price_feed = PriceFeed() if PRICE_FEED_ENABLED and PriceFeed.is_available() else None
+        self._feed_changed_names = set()
+        # Lowest prices shared between accounts run by the supervisor, has get_many(names) and update(prices)
+        self.shared_lowest_prices = shared_lowest_prices
+        self._storage = None
+        self.price_history: PriceHistory or None = None  # set up by the price update loop
+        self.notifier: SaleNotifier or None = None  # set up by the price update loop
+        self._user_prices = {}
+        self._user_prices_data_version = None
+        self._user_prices_applied = False  # loaded user prices are set on the current items
+        # Items are changed by one thread only, others read published snapshots and submit commands
+        self.snapshot = InventorySnapshot()
+        self.commands = CommandQueue()
 
     def update_items(self, items_from_api):
-        fresh_items_dict = {item.item_id: item for item in items_from_api}
-        if not self.items:
-            self.items = list(fresh_items_dict.values())
-            return
-
-        updated_items = []
-        for old_item in self.items:
-            new_item = fresh_items_dict.pop(old_item.item_id, None)
-            # if new item exists in items list, save min, target price and update time
-            # but if there is no old items in the new list, then don't save it
-            if new_item is not None:
-                new_item.user_min_price = old_item.user_min_price
-                new_item.user_target_price = old_item.user_target_price
-                new_item.last_update_time = old_item.last_update_time
-                updated_items.append(new_item)
-        # add items that were newly added and weren't in list
-        for new_item in fresh_items_dict.values():
-            updated_items.append(new_item)
-
-        self.items = updated_items
-
-    def set_user_price_for_item(self, item_id, min_price, target_price, lowest_price):
-        if not self.items:
-            logger.info('FAIL - item list empty')
-            return
-
-        item = None
-        for itm in self.items:
-            if itm.item_id == item_id:
-                item = itm
-                break
-        if item is None:
-            logger.info('FAIL - no item with given id')
-            return
-        if time.time() - item.last_update_time < self.ITEM_UPDATE_COOL_DOWN_SECONDS:
+        # Known items are updated in place, so user min, target prices and update time are kept
+        self.items.merge(items_from_api)
+        if not self.cadence.observe_inventory(items_from_api):
+            return  # same items as in the previous pass, nothing to forget, subscribe to or set user prices on
+        self._user_prices_applied = False
+        self.scheduler.retain(self.items)
+        self.cadence.retain(set(self.items.hash_names()))
+        if self.price_feed is not None:
+            self.price_feed.subscribe(self.items.hash_names())
+
+    def get_new_price_for_item(self, item, min_price, target_price, lowest_price) -> int or None:
+        """ Apply price policy to the item. Return new price or None if the price should stay. """
+        if self.is_cooling_down(item):
             logger.info(f'PASS (cool-down) - {item}')
+            reprice_outcomes_total.inc(outcome='pass_cool_down')
             return
 
         if item.position > 1:
@@ -70,96 +84,189 @@ class MarketBot:
 
         if new_price == item.price:
             logger.info(f'PASS - {item}')
+            reprice_outcomes_total.inc(outcome='pass')
             return
         if new_price < min_price:
             logger.info(f'Policy Error - {item}')
+            reprice_outcomes_total.inc(outcome='policy_error')
             return
         if target_price < min_price:
             logger.info(f'User input Error - {item}')
+            reprice_outcomes_total.inc(outcome='user_input_error')
             return
 
-        is_set = set_price_api(item.item_id, new_price)
-        if is_set:
-            item.price = new_price
-            item.last_update_time = time.time()
-            logger.info(f'OK - {item}')
-        else:
-            logger.info(f'FAIL - {item}')
+        return new_price
+
+    def set_user_price_for_item(self, item_id, min_price, target_price, lowest_price):
+        if not self.items:
+            logger.info('FAIL - item list empty')
+            return
+
+        item = self.items.get(item_id)
+        if item is None:
+            logger.info('FAIL - no item with given id')
+            reprice_outcomes_total.inc(outcome='no_item')
+            return
+
+        new_price = self.get_new_price_for_item(item, min_price, target_price, lowest_price)
+        if new_price is not None:
+            self.dispatch_price_changes([PriceChange(item, new_price)])
 
     def set_user_price_for_all_items(self):
         if not self.items:
             logger.info('FAIL - item list empty')
             return
 
-        lowest_prices_dict = get_dict_of_items_lowest_prices_api(self.get_hash_names())
+        items_to_update = []
         for item in self.items:
             if item.user_target_price == 0 or item.user_min_price == 0:
                 logger.info(f'PASS (unset) - {item}')
+                reprice_outcomes_total.inc(outcome='pass_unset')
                 continue
+            if self.is_cooling_down(item):
+                logger.info(f'PASS (cool-down) - {item}')
+                reprice_outcomes_total.inc(outcome='pass_cool_down')
+                continue
+            if item.position <= 1:
+                # if item already first or not listed, then leave it with current price
+                logger.info(f'PASS - {item}')
+                reprice_outcomes_total.inc(outcome='pass')
+                continue
+            items_to_update.append(item)
+
+        use_price_feed = self.price_feed is not None and self.price_feed.connected
+        if use_price_feed:
+            # Items are repriced only if their lowest price changed or is not known from the feed yet
+            self._feed_changed_names |= self.price_feed.pop_changed_names()
+            feed_prices = self.price_feed.get_lowest_prices(self.items.hash_names())
+            items_to_update = [item for item in items_to_update if item.market_hash_name in self._feed_changed_names
+                               or item.market_hash_name not in feed_prices]
+
+        # Most urgent items go first, the rest waits for the next passes
+        items_to_update_now = self.scheduler.select(items_to_update)
+        deferred_count = len(items_to_update) - len(items_to_update_now)
+        if deferred_count:
+            logger.info(f'DEFER - {deferred_count} items to the next pass')
+            reprice_outcomes_total.inc(deferred_count, outcome='defer')
+
+        # Prices are fetched only for items that are repriced in this pass
+        lowest_prices_dict = self.get_lowest_prices([item.market_hash_name for item in items_to_update_now])
+        self.scheduler.observe_lowest_prices(lowest_prices_dict)
+        self.cadence.observe_lowest_prices(lowest_prices_dict)
+        if self.price_history is not None:
+            self.price_history.record_lowest_prices(lowest_prices_dict)
+        if is_cancelled():
+            # Prices of the missing items were not requested, the pass is repeated after restart
+            logger.info('Reprice pass cancelled')
+            return
+        logger.debug(f'lowest prices cache: {lowest_prices_cache.stats()}')
+
+        price_changes = []
+        unsettled_names = set()  # repriced again on the next pass even if the feed reports no change
+        for item in items_to_update_now:
             if item.market_hash_name not in lowest_prices_dict:
                 logger.info('FAIL - could not get lowest price for item')
+                reprice_outcomes_total.inc(outcome='no_lowest_price')
+                unsettled_names.add(item.market_hash_name)
                 continue
 
             lowest_price = lowest_prices_dict[item.market_hash_name]
-            self.set_user_price_for_item(item.item_id, item.user_min_price, item.user_target_price, lowest_price)
+            new_price = self.get_new_price_for_item(item, item.user_min_price, item.user_target_price, lowest_price)
+            if new_price is not None:
+                price_changes.append(PriceChange(item, new_price))
+
+        statuses = self.dispatch_price_changes(price_changes)
+        self.cadence.observe_pass(sum(statuses), deferred_count)
+        if use_price_feed:
+            unsettled_names |= {change.item.market_hash_name for change, is_set in zip(price_changes, statuses)
+                                if not is_set}
+            selected_ids = {item.item_id for item in items_to_update_now}
+            unsettled_names |= {item.market_hash_name for item in items_to_update if item.item_id not in selected_ids}
+            self._feed_changed_names -= {item.market_hash_name for item in items_to_update_now} - unsettled_names
+
+    def dispatch_price_changes(self, price_changes: list[PriceChange]) -> list[bool]:
+        statuses = self.dispatcher.dispatch(price_changes)
+        if self.price_history is not None:
+            self.price_history.record_own_prices({change.item.market_hash_name: change.new_price
+                                                  for change, is_set in zip(price_changes, statuses) if is_set})
+        return statuses
+
+    def get_lowest_prices(self, hash_names: list[str]) -> dict[str, int]:
+        """ Take lowest prices from the push feed when it is connected, then from prices recently fetched
+        by other accounts, poll the API for the rest. """
+        lowest_prices = {}
+        if self.price_feed is not None and self.price_feed.connected:
+            lowest_prices = self.price_feed.get_lowest_prices(hash_names)
+        missing_hash_names = [hash_name for hash_name in hash_names if hash_name not in lowest_prices]
+        if missing_hash_names and self.shared_lowest_prices is not None:
+            lowest_prices.update(self.shared_lowest_prices.get_many(missing_hash_names))
+            missing_hash_names = [hash_name for hash_name in missing_hash_names if hash_name not in lowest_prices]
+        if missing_hash_names:
+            polled_prices = get_dict_of_items_lowest_prices_api(missing_hash_names)
+            lowest_prices.update(polled_prices)
+            if self.shared_lowest_prices is not None and polled_prices:
+                self.shared_lowest_prices.update(polled_prices)
+        return lowest_prices
 
     def set_target_price_for_items(self):
         if not self.items:
             logger.info('FAIL - item list empty')
             return
+        price_changes = []
         for item in self.items:
             if item.user_target_price == 0 or item.user_min_price == 0:
                 logger.info(f'PASS (unset) - {item}')
                 continue
-            if time.time() - item.last_update_time < self.ITEM_UPDATE_COOL_DOWN_SECONDS:
+            if self.is_cooling_down(item):
                 logger.info(f'PASS (cool-down) - the item had been already'
                             f' updated within {self.ITEM_UPDATE_COOL_DOWN_SECONDS} secs')
                 continue
 
-            status = set_price_api(item.item_id, item.user_target_price)
-            if status:
-                item.price = item.user_target_price
-                item.last_update_time = time.time()
-                logger.info(f'OK - {item}')
-            else:
-                logger.info(f'FAIL - {item}')
+            price_changes.append(PriceChange(item, item.user_target_price))
+
+        self.dispatch_price_changes(price_changes)
+
+    @property
+    def storage(self) -> BotStorage:
+        # Opened on first use, so bots which never touch the database don't create it
+        if self._storage is None:
+            self._storage = BotStorage(self.db_path)
+        return self._storage
 
     def initialize_db(self):
-        connection = connect(self.db_path)
-        cursor = connection.cursor()
-        cursor.execute('CREATE TABLE IF NOT EXISTS ItemsOnSale('
-                       'item_id INTEGER PRIMARY KEY, '
-                       'market_hash_name TEXT, '
-                       'min_price INTEGER, target_price INTEGER)')
-        connection.close()
+        self.storage.initialize()
 
     def save_item_user_prices_to_db(self, item_id: str, min_price: int, target_price: int):
-        connection = connect(self.db_path)
-        cursor = connection.cursor()
-        cursor.execute(
-            'REPLACE INTO ItemsOnSale (item_id, min_price, target_price)'
-            f'VALUES({int(item_id)}, {min_price}, {target_price})'
-        )
-        connection.commit()
-        connection.close()
+        self.storage.save_user_prices([(item_id, min_price, target_price)])
+
+    def save_items_user_prices_to_db(self, user_prices: list[tuple[str, int, int]]):
+        self.storage.save_user_prices(user_prices)
 
     def get_items_user_prices_from_db(self, item_ids: list[str]) -> dict[str, tuple[int, int]] or None:
         if not item_ids:
             return
-        connection = connect(self.db_path)
-        cursor = connection.cursor()
-        query = cursor.execute(
-            'SELECT item_id, min_price, target_price FROM ItemsOnSale '
-            f'WHERE item_id IN ({",".join(item_ids)})'
-        )
         # Create a dictionary where keys are item_ids and values are tuples of user prices
-        return {str(result[0]): (result[1], result[2]) for result in query.fetchall()}
+        return self.storage.get_user_prices(item_ids)
+
+    def update_user_prices_from_db(self):
+        """ Reload user prices only if the database has changed since the last load. Apply them only if
+        they or the items changed since the last apply. """
+        data_version = self.storage.get_data_version()
+        if data_version != self._user_prices_data_version:
+            self._user_prices = self.storage.get_all_user_prices()
+            self._user_prices_data_version = data_version
+            self._user_prices_applied = False
+            logger.debug('reloaded user prices from db')
+        if self._user_prices_applied:
+            return
+        self.update_from_db_user_prices_for_all_items(self._user_prices)
+        self._user_prices_applied = True
 
     def get_item_ids(self) -> list[str]:
         if not self.items:
             return []
 
-        return [item.item_id for item in self.items]
+        return self.items.ids()
 
     def get_hash_names(self) -> list[str]:
         if not self.items:
@@ -167,53 +274,122 @@ class MarketBot:
 
         return [item.market_hash_name for item in self.items]
 
+    def is_cooling_down(self, item) -> bool:
+        return time.time() - item.last_update_time < self.ITEM_UPDATE_COOL_DOWN_SECONDS
+
+    def publish_snapshot(self) -> InventorySnapshot:
+        """ Publish current items state for other threads. Replacing the reference is atomic. """
+        self.snapshot = take_snapshot(self.items, self.snapshot)
+        return self.snapshot
+
+    def submit_user_prices(self, item_id: str, min_price: int = None, target_price: int = None):
+        """ Thread-safe. Prices are set when the owner thread applies commands. """
+        self.commands.submit(SetUserPrices(item_id, min_price, target_price))
+
+    def apply_commands(self) -> int:
+        """ Apply submitted commands, save changed user prices and publish a snapshot.
+        Must be called by the thread which changes the items. Return number of applied commands. """
+        commands = self.commands.drain()
+        if not commands:
+            return 0
+        changed_items = {}
+        for command in commands:
+            item = self.items.get(command.item_id)
+            if item is None:
+                logger.info(f'FAIL - no item with id {command.item_id} to set user prices')
+                continue
+            if command.min_price is not None:
+                item.user_min_price = command.min_price
+            if command.target_price is not None:
+                item.user_target_price = command.target_price
+            changed_items[item.item_id] = item
+        self.save_items_user_prices_to_db([(item.item_id, item.user_min_price, item.user_target_price)
+                                           for item in changed_items.values()])
+        self.publish_snapshot()
+        return len(commands)
+
     def update_from_db_user_prices_for_all_items(self, user_prices_dict: dict[str, tuple[int, int]]):
         if user_prices_dict is None:
             return
 
-        for item in self.items:
-            if item.item_id in user_prices_dict:
-                user_prices = user_prices_dict[item.item_id]
+        for item_id, user_prices in user_prices_dict.items():
+            item = self.items.get(item_id)
+            if item is not None:
                 item.user_min_price = user_prices[0]
                 item.user_target_price = user_prices[1]
         logger.debug('updated user prices from db')
 
 
-def price_update_loop(market_bot: MarketBot, stop_event: Event, finish_event: Event):
-    pending_items = []
+def price_update_loop(market_bot: MarketBot, stop_event: Event, finish_event: Event, max_iterations: int = None):
+    """ Update prices until stop_event is set. The event is checked between the phases of an iteration and
+    cancels waits of the API layer, so stopping takes at most about one request timeout.
+    Passes are paced by market_bot.cadence: back to back while prices move, rarer while the market is quiet. """
+    set_cancel_event(stop_event)
+    pending_sales = PendingSalesTracker(market_bot.storage)
+    market_bot.price_history = PriceHistory(market_bot.storage)
+    market_bot.price_history.start()
+    market_bot.notifier = SaleNotifier(market_bot.storage)
+    market_bot.notifier.start()
+    if market_bot.price_feed is not None:
+        market_bot.price_feed.start()
     timer = 0
-    while True:
-        items_from_api, new_pending_items = get_items_on_sale_and_pending_api()
-        market_bot.update_items(items_from_api)
-
-        for item in new_pending_items:
-            if item not in pending_items:
-                pending_items.append(item)
-                is_sent = send_telegram_message(f"An Item was bought from you on MarketCSGO. "
-                                                f"To receive *{item.price / 1000:.3f} "
-                                                f"{item.currency}* transfer _{item.market_hash_name}_ to the buyer.")
-                if not is_sent:
-                    logger.info("Telegram message was not sent")
-
-        item_ids = market_bot.get_item_ids()
-        items_user_prices = market_bot.get_items_user_prices_from_db(item_ids)
-        market_bot.update_from_db_user_prices_for_all_items(items_user_prices)
+    iterations_count = 0
 
-        market_bot.set_user_price_for_all_items()
+    def should_wake() -> bool:
+        # User edits and pushed price changes are handled without waiting for the interval
+        feed_changed = market_bot.price_feed is not None and market_bot.price_feed.has_changes()
+        return feed_changed or len(market_bot.commands) > 0
 
-        if timer == 100:
-            market_bot.set_target_price_for_items()  # every n iterations reset prices to the target prices
-            timer = 0
-        timer += 1
+    try:
+        while not stop_event.is_set() and (max_iterations is None or iterations_count < max_iterations):
+            if iterations_count and not market_bot.cadence.wait(stop_event, should_wake):
+                break
+            iteration_start = time.perf_counter()
+            items_from_api, pending_items = get_items_on_sale_and_pending_api()
+            if stop_event.is_set():
+                break  # cancelled request returns empty lists, they must not replace the items
+
+            market_bot.update_items(items_from_api)
+
+            # Saved for the notifier thread, Telegram never holds up repricing
+            new_sales = pending_sales.select_new(pending_items)
+            market_bot.notifier.notify_sales(new_sales)
+            pending_sales.mark_notified([item.item_id for item in new_sales])
+            # Empty lists are also returned on request failure, then completed sales can't be told apart
+            if items_from_api or pending_items:
+                pending_sales.expire([item.item_id for item in pending_items])
+
+            market_bot.apply_commands()
+            market_bot.update_user_prices_from_db()
+            market_bot.publish_snapshot()
+            if stop_event.is_set():
+                break
 
-        if stop_event.is_set():
-            stop_event.clear()
-            finish_event.set()
-            logger.info('Stopping price update loop...')
-            break
+            market_bot.set_user_price_for_all_items()
+
+            if timer == 100 and not stop_event.is_set():
+                market_bot.set_target_price_for_items()  # every n iterations reset prices to the target prices
+                timer = 0
+            timer += 1
+            market_bot.publish_snapshot()
+            market_bot.cadence.end_pass()
+            loop_iteration_seconds.observe(time.perf_counter() - iteration_start)
+            loop_iterations_total.inc()
+            iterations_count += 1
+    finally:
+        logger.info('Stopping price update loop...')
+        market_bot.notifier.stop()
+        if market_bot.price_feed is not None:
+            market_bot.price_feed.stop()
+        market_bot.price_history.stop()
+        market_bot.publish_snapshot()
+        set_cancel_event(None)
+        stop_event.clear()
+        finish_event.set()
 
 
 def main():
+    start_metrics_server()
     bot = MarketBot()
     stop_event = Event()
     finish_event = Event()
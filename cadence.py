@@ -0,0 +1,96 @@
+import time
+from logging import getLogger
+from threading import Event
+from data_structures import ItemOnSale
+from metrics import loop_interval_seconds, loop_quiet_passes_total
+
+logger = getLogger('market_bot')
+
+# Wait between passes of the price update loop. While the market moves passes run back to back,
+# every quiet pass doubles the wait, starting from the first step, up to the max.
+MIN_LOOP_INTERVAL_SECONDS = 0.
+FIRST_BACKOFF_SECONDS = 1.
+MAX_LOOP_INTERVAL_SECONDS = 30.
+BACKOFF_FACTOR = 2.
+# How often a waiting loop checks whether it should wake up early
+WAKE_CHECK_INTERVAL_SECONDS = 0.25
+
+
+def fingerprint_items(items: list[ItemOnSale]) -> int:
+    """ Hash of what the market reports about the items, independent of their order. """
+    return hash(frozenset((item.item_id, item.price, item.position, item.currency) for item in items))
+
+
+class CadenceController:
+    """ Paces the price update loop. A pass is active if the inventory fingerprint changed, a lowest price
+    changed, a price was set or items were deferred, then the next pass starts right away.
+    Otherwise the wait grows, so a quiet market costs few requests and little CPU. """
+
+    def __init__(self, min_interval=MIN_LOOP_INTERVAL_SECONDS, max_interval=MAX_LOOP_INTERVAL_SECONDS,
+                 first_backoff=FIRST_BACKOFF_SECONDS, backoff_factor=BACKOFF_FACTOR):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.first_backoff = first_backoff
+        self.backoff_factor = backoff_factor
+        self.interval = min_interval
+        self._activity: set[str] = set()  # reasons the current pass is active
+        self._inventory_fingerprint = None
+        self._lowest_prices: dict[str, int] = {}  # last seen lowest price by hash name
+
+    def observe_inventory(self, items: list[ItemOnSale]) -> bool:
+        """ Return True if the items changed since the previous call. """
+        fingerprint = fingerprint_items(items)
+        if fingerprint == self._inventory_fingerprint:
+            return False
+        self._inventory_fingerprint = fingerprint
+        self._activity.add('inventory')
+        return True
+
+    def observe_lowest_prices(self, lowest_prices: dict[str, int]):
+        for hash_name, price in lowest_prices.items():
+            last_price = self._lowest_prices.get(hash_name)
+            if last_price == price:
+                continue
+            if last_price is not None and price < last_price:
+                self._activity.add('undercut')
+            else:
+                self._activity.add('lowest_price')
+            self._lowest_prices[hash_name] = price
+
+    def observe_pass(self, set_prices_count: int, deferred_count: int):
+        if set_prices_count:
+            self._activity.add('repriced')
+        if deferred_count:
+            self._activity.add('deferred')
+
+    def retain(self, hash_names: set[str]):
+        """ Forget lowest prices of names which are not on sale anymore. """
+        for hash_name in [hash_name for hash_name in self._lowest_prices if hash_name not in hash_names]:
+            del self._lowest_prices[hash_name]
+
+    def end_pass(self) -> float:
+        """ Choose the wait before the next pass from what the pass observed. """
+        if self._activity:
+            self.interval = self.min_interval
+            logger.debug(f'active pass ({", ".join(sorted(self._activity))}), next pass in {self.interval:.1f} s')
+        else:
+            self.interval = min(self.max_interval, max(self.first_backoff, self.interval * self.backoff_factor))
+            loop_quiet_passes_total.inc()
+            logger.debug(f'quiet pass, next pass in {self.interval:.1f} s')
+        self._activity.clear()
+        loop_interval_seconds.set(self.interval)
+        return self.interval
+
+    def wait(self, stop_event: Event, should_wake=None, clock=time.monotonic) -> bool:
+        """ Wait the current interval. `should_wake()` returning True ends the wait early, the next pass
+        is then active. Return False if stop_event was set. """
+        deadline = clock() + self.interval
+        while True:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                return not stop_event.is_set()
+            if stop_event.wait(min(remaining, WAKE_CHECK_INTERVAL_SECONDS)):
+                return False
+            if should_wake is not None and should_wake():
+                self.interval = self.min_interval
+                return True
@@ -0,0 +1,26 @@
+import time
+from threading import Event
+
+# Stop event of the running price update loop. Waits of the API layer end early when it is set,
+# so stopping the loop does not wait for retry pauses of requests still in flight.
+_cancel_event = None
+
+
+def set_cancel_event(event: Event or None):
+    """ Register the event which cancels waits, None makes waits plain sleeps again. """
+    global _cancel_event
+    _cancel_event = event
+
+
+def is_cancelled() -> bool:
+    event = _cancel_event
+    return event is not None and event.is_set()
+
+
+def wait(seconds: float) -> bool:
+    """ Sleep unless cancelled. Return False if cancelled before or during the wait. """
+    event = _cancel_event
+    if event is None:
+        time.sleep(seconds)
+        return True
+    return not event.wait(seconds)
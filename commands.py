@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+from queue import SimpleQueue, Empty
+
+
+@dataclass(frozen=True)
+class SetUserPrices:
+    """ User edit of an item's min and target prices, None keeps the current value. """
+    item_id: str
+    min_price: int or None = None
+    target_price: int or None = None
+
+
+class CommandQueue:
+    """ User edits submitted from any thread, applied by the thread that owns the items. """
+
+    def __init__(self):
+        self._queue = SimpleQueue()
+
+    def submit(self, command):
+        self._queue.put(command)
+
+    def drain(self) -> list:
+        """ Return all waiting commands in submission order. """
+        commands = []
+        while True:
+            try:
+                commands.append(self._queue.get_nowait())
+            except Empty:
+                return commands
+
+    def __len__(self):
+        return self._queue.qsize()
@@ -0,0 +1,129 @@
+""" Headless entry point: runs the price update loop without GUI, for servers.
+Config is taken from env (.env is loaded too) and can be overridden by command line flags. """
+import time
+
+_import_start = time.perf_counter()
+
+import argparse
+import json
+import logging
+import signal
+import sys
+from os import getenv
+from pathlib import Path
+from threading import Event, Thread
+from bot import MarketBot, price_update_loop
+from metrics import start_metrics_server, METRICS_HOST, METRICS_PORT
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
+
+logger = logging.getLogger('market_bot')
+
+LOG_LEVEL = getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = getenv('LOG_FORMAT', 'json')  # json or text
+BOT_DB_PATH = getenv('BOT_DB_PATH')
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line, so logs can be parsed by collectors without regexes. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if hasattr(record, 'account'):
+            entry['account'] = record.account
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class AccountFilter(logging.Filter):
+    """ Tags records with the market account name, when several accounts log to the same output. """
+
+    def __init__(self, account: str):
+        super().__init__()
+        self.account = account
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.account = self.account
+        return True
+
+
+def setup_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, account: str = None):
+    handler = logging.StreamHandler()
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        account_prefix = '%(account)s - ' if account else ''
+        handler.setFormatter(logging.Formatter(f'%(asctime)s - {account_prefix}%(message)s',
+                                               datefmt='%y-%m-%d %H:%M:%S'))
+    if account:
+        handler.addFilter(AccountFilter(account))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run MarketCSGO price bot without GUI.')
+    parser.add_argument('--log-level', default=LOG_LEVEL, help='DEBUG, INFO, WARNING, ... (env LOG_LEVEL)')
+    parser.add_argument('--log-format', default=LOG_FORMAT, choices=('json', 'text'), help='(env LOG_FORMAT)')
+    parser.add_argument('--db-path', type=Path, default=BOT_DB_PATH, help='sqlite database path (env BOT_DB_PATH)')
+    parser.add_argument('--metrics-host', default=METRICS_HOST, help='(env METRICS_HOST)')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help='serve /metrics on this port, off if not set (env METRICS_PORT)')
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> int:
+    """ Run the loop until SIGINT or SIGTERM. Return process exit code. """
+    if not getenv('SECRET_KEY'):
+        logger.error('SECRET_KEY is not set')
+        return 2
+
+    start_metrics_server(args.metrics_port, args.metrics_host)
+    bot = MarketBot(db_path=args.db_path)
+    bot.initialize_db()
+
+    stop_event, finish_event = Event(), Event()
+    stop_requested_times = []
+
+    def request_stop(signum, frame):
+        logger.info(f'Received {signal.Signals(signum).name}, stopping...')
+        stop_requested_times.append(time.perf_counter())
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    worker_thread = Thread(target=price_update_loop, args=(bot, stop_event, finish_event), name='price-update-loop')
+    worker_thread.start()
+    logger.info(f'Price update loop started, imports took {IMPORT_SECONDS:.3f} s')
+    # Short waits keep the main thread responsive to signals
+    while not finish_event.wait(0.5):
+        if not worker_thread.is_alive():
+            logger.error('Price update loop exited unexpectedly')
+            return 1
+    worker_thread.join()
+    if not stop_requested_times:
+        logger.error('Price update loop exited unexpectedly')
+        return 1
+    logger.info(f'Price update loop stopped in {time.perf_counter() - stop_requested_times[0]:.2f} s')
+    bot.dispatcher.shutdown()
+    bot.storage.close()
+    logger.info('Stopped')
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    args = parse_args(argv)
+    setup_logging(args.log_level, args.log_format)
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
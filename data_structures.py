@@ -1,16 +1,24 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class ItemOnSale:
+    """ Slotted to keep big inventories compact. Hash names and currencies repeat a lot, so they are interned
+    and all items share one string object per name. User prices and update time are bot state,
+    they are not compared. """
     item_id: str
     position: int
     price: int
     currency: str
     market_hash_name: str
-    user_min_price = 0
-    user_target_price = 0
-    last_update_time = 0.
+    user_min_price: int = field(default=0, compare=False)
+    user_target_price: int = field(default=0, compare=False)
+    last_update_time: float = field(default=0., compare=False)
+
+    def __post_init__(self):
+        self.market_hash_name = sys.intern(self.market_hash_name)
+        self.currency = sys.intern(self.currency)
 
     def __repr__(self):
         name = self.market_hash_name[:12] + '...' if len(self.market_hash_name) > 15 else self.market_hash_name
@@ -18,3 +26,88 @@ class ItemOnSale:
                f'{self.price/1000:.3f}, pos:{self.position}, ' \
                f'm/t:{self.user_min_price}/{self.user_target_price}' \
                # f'upd time: {self.last_update_time:.1f})'
+
+
+class ItemStore:
+    """ Items on sale in insertion order with O(1) lookup by item_id and by market hash name.
+    Iterates, compares, indexes and checks membership like a list of ItemOnSale, use get() to look up an id. """
+
+    def __init__(self, items=()):
+        self._items: dict[str, ItemOnSale] = {}
+        self._ids_by_hash_name: dict[str, dict[str, None]] = {}  # dict is used as an ordered set
+        self._items_list: list[ItemOnSale] or None = None  # for positional access, rebuilt after items change
+        for item in items:
+            self.add(item)
+
+    def add(self, item: ItemOnSale):
+        self.remove(item.item_id)
+        self._items[item.item_id] = item
+        self._items_list = None
+        self._ids_by_hash_name.setdefault(item.market_hash_name, {})[item.item_id] = None
+
+    def remove(self, item_id: str) -> ItemOnSale or None:
+        item = self._items.pop(item_id, None)
+        if item is not None:
+            self._items_list = None
+            same_name_ids = self._ids_by_hash_name[item.market_hash_name]
+            del same_name_ids[item_id]
+            if not same_name_ids:
+                del self._ids_by_hash_name[item.market_hash_name]
+        return item
+
+    def merge(self, fresh_items: list[ItemOnSale]):
+        """ Update known items in place (user prices and update time are kept), add new items
+        to the end and remove items which are not in the fresh list anymore. """
+        fresh_items_dict = {item.item_id: item for item in fresh_items}
+        for item_id in [item_id for item_id in self._items if item_id not in fresh_items_dict]:
+            self.remove(item_id)
+
+        for item_id, fresh_item in fresh_items_dict.items():
+            item = self._items.get(item_id)
+            if item is None:
+                self.add(fresh_item)
+                continue
+            if item.market_hash_name != fresh_item.market_hash_name:
+                self.remove(item_id)
+                item.market_hash_name = fresh_item.market_hash_name
+                self.add(item)
+            item.position = fresh_item.position
+            item.price = fresh_item.price
+            item.currency = fresh_item.currency
+
+    def get(self, item_id: str) -> ItemOnSale or None:
+        return self._items.get(item_id)
+
+    def get_by_hash_name(self, market_hash_name: str) -> list[ItemOnSale]:
+        return [self._items[item_id] for item_id in self._ids_by_hash_name.get(market_hash_name, ())]
+
+    def ids(self) -> list[str]:
+        return list(self._items)
+
+    def hash_names(self) -> list[str]:
+        """ Distinct hash names in order of first appearance. """
+        return list(self._ids_by_hash_name)
+
+    def __contains__(self, item):
+        return isinstance(item, ItemOnSale) and self._items.get(item.item_id) == item
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        if self._items_list is None:
+            self._items_list = list(self._items.values())
+        return self._items_list[index]
+
+    def __eq__(self, other):
+        if isinstance(other, ItemStore):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f'ItemStore({list(self._items.values())})'
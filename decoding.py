@@ -0,0 +1,147 @@
+""" Decoding of market API payloads into typed records with prices in int format (1 USD = 1000).
+Records are checked one by one, a malformed record is rejected alone and the rest of the payload is kept. """
+import json
+from logging import getLogger
+from data_structures import ItemOnSale
+from metrics import decode_rejected_total
+
+try:
+    import orjson  # optional, several times faster than json on big payloads
+except ImportError:
+    orjson = None
+
+logger = getLogger('market_bot')
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+PRICE_DECIMALS = 3  # USD prices have at most 3 decimal digits, so int format is exact
+# Float prices are converted exactly well below 2 ** 53 / 1000
+MAX_USD_PRICE = 10 ** 9
+
+ITEM_STATUS_ON_SALE = '1'
+ITEM_STATUSES_PENDING = ('2', '3', '4')  # need to transfer, waiting for transfer, ready to receive
+
+
+class DecodeError(ValueError):
+    """ Record does not match the schema of its endpoint. """
+
+
+def loads(data: bytes or str):
+    """ Parse JSON with the fastest available backend. Raises json.JSONDecodeError on invalid documents,
+    orjson's error is its subclass. """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_usd_price(value) -> int:
+    """ Convert USD price, a JSON number or a decimal string, to int format exactly. A float is accepted only
+    if it is the float of a decimal literal with at most 3 decimals: then the scaled value rounded to int,
+    divided back, gives the very same float, otherwise it does not. """
+    if type(value) is float:
+        if 0 <= value < MAX_USD_PRICE:
+            price = round(value * 1000)
+            if price / 1000 == value:
+                return price
+        raise DecodeError(f'price must be a non-negative decimal with at most {PRICE_DECIMALS} decimals, '
+                          f'got {value!r}')
+    if type(value) is int:
+        text = str(value)
+    elif type(value) is str:
+        text = value.strip()
+    else:
+        raise DecodeError(f'price must be a number, got {value!r}')
+    whole, _, fraction = text.partition('.')
+    if not text.isascii() or not whole.isdigit() or (fraction and not fraction.isdigit()):
+        raise DecodeError(f'price must be a non-negative decimal, got {value!r}')
+    fraction = fraction.rstrip('0')
+    if len(fraction) > PRICE_DECIMALS:
+        raise DecodeError(f'price has more than {PRICE_DECIMALS} decimals, got {value!r}')
+    return int(whole) * 10 ** PRICE_DECIMALS + int(fraction.ljust(PRICE_DECIMALS, '0'))
+
+
+def parse_int_price(value) -> int:
+    """ Price which the API already gives in int format, as a JSON integer or a string of digits. """
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    if isinstance(value, str) and value.isdigit() and value.isascii():
+        return int(value)
+    raise DecodeError(f'price must be a non-negative integer, got {value!r}')
+
+
+def reject(endpoint: str, key, error: Exception):
+    decode_rejected_total.inc(endpoint=endpoint)
+    logger.info(f'Rejected {key!r} from {endpoint} response: {error}')
+
+
+def decode_item(item: dict) -> (ItemOnSale, str):
+    """ Return the item and its status. """
+    try:
+        item_id, position, status = item['item_id'], item['position'], item['status']
+        currency, market_hash_name, price = item['currency'], item['market_hash_name'], item['price']
+    except (TypeError, KeyError) as e:
+        raise DecodeError(f'missing or invalid field {e}') from None
+    if type(item_id) is not str:
+        if type(item_id) is not int:
+            raise DecodeError(f'item_id must be a string, got {item_id!r}')
+        item_id = str(item_id)
+    if type(position) is not int:
+        raise DecodeError(f'position must be an integer, got {position!r}')
+    # Common case of parse_usd_price() inlined, it is the hot path of big inventories
+    scaled_price = round(price * 1000) if type(price) is float and 0 <= price < MAX_USD_PRICE else None
+    if scaled_price is not None and scaled_price / 1000 == price:
+        price = scaled_price
+    else:
+        price = parse_usd_price(price)
+    if type(currency) is not str or type(market_hash_name) is not str or type(status) is not str:
+        raise DecodeError('currency, market_hash_name and status must be strings')
+    return ItemOnSale(item_id, position, price, currency, market_hash_name), status
+
+
+def decode_items(payload: dict) -> (list[ItemOnSale], list[ItemOnSale]):
+    """ Items of the `items` endpoint split into on sale and pending (sold, waiting for transfer). """
+    items_on_sale, items_pending = [], []
+    items = payload.get('items') or []
+    if not isinstance(items, list):
+        reject('items', 'items', DecodeError('items must be an array'))
+        return items_on_sale, items_pending
+    for item in items:
+        try:
+            new_item, status = decode_item(item)
+        except DecodeError as e:
+            reject('items', item.get('item_id') if isinstance(item, dict) else item, e)
+            continue
+        if status == ITEM_STATUS_ON_SALE:
+            items_on_sale.append(new_item)
+        elif status in ITEM_STATUSES_PENDING:
+            items_pending.append(new_item)
+    return items_on_sale, items_pending
+
+
+def decode_lowest_prices(payload: dict) -> dict[str, int]:
+    """ Lowest price by hash name of the `search-list-items-by-hash-name-all` endpoint. Data maps names to
+    offers, the first offer is the cheapest. Names without offers are missing from the result. """
+    data = payload.get('data') or {}
+    if not isinstance(data, dict):
+        reject('search-list-items-by-hash-name-all', 'data', DecodeError('data must be an object'))
+        return {}
+    lowest_prices = {}
+    for hash_name, offers in data.items():
+        if not offers:
+            continue
+        try:
+            lowest_prices[hash_name] = parse_int_price(offers[0]['price'])
+        except (DecodeError, TypeError, KeyError, IndexError) as e:
+            reject('search-list-items-by-hash-name-all', hash_name, e)
+    return lowest_prices
+
+
+def decode_specific_lowest_price(payload: dict) -> int:
+    """ Lowest price of the `search-item-by-hash-name-specific` endpoint, 0 if there are no offers. """
+    data = payload.get('data')
+    if not data:
+        return 0
+    try:
+        return parse_int_price(data[0]['price'])
+    except (DecodeError, TypeError, KeyError, IndexError) as e:
+        reject('search-item-by-hash-name-specific', 'data', e)
+        return 0
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from logging import getLogger
+from api_requests import set_price_api
+from data_structures import ItemOnSale
+from metrics import reprice_outcomes_total
+from cancellation import is_cancelled
+
+logger = getLogger('market_bot')
+
+# Requests are still limited by the shared rate limiter, workers only hide network latency
+SET_PRICE_MAX_WORKERS = 4
+
+
+@dataclass
+class PriceChange:
+    item: ItemOnSale
+    new_price: int
+
+
+class SetPriceDispatcher:
+    """ Sends set-price requests from a bounded pool of worker threads.
+    Results are applied to the items in the calling thread, after all requests of a pass are done. """
+
+    def __init__(self, max_workers=SET_PRICE_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.last_pass_seconds = 0.
+        self.last_pass_size = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='set-price')
+
+    def dispatch(self, price_changes: list[PriceChange]) -> list[bool]:
+        """ Set new prices concurrently. Return list of statuses in the order of changes. """
+        if not price_changes:
+            return []
+
+        start = time.perf_counter()
+        futures = [self._executor.submit(set_price_api, change.item.item_id, change.new_price)
+                   for change in price_changes]
+        statuses = []
+        for change, future in zip(price_changes, futures):
+            is_set = future.result()
+            if is_set:
+                change.item.price = change.new_price
+                change.item.last_update_time = time.time()
+                logger.info(f'OK - {change.item}')
+                reprice_outcomes_total.inc(outcome='ok')
+            elif is_cancelled():
+                logger.info(f'CANCELLED - {change.item}')
+                reprice_outcomes_total.inc(outcome='cancelled')
+            else:
+                logger.info(f'FAIL - {change.item}')
+                reprice_outcomes_total.inc(outcome='fail')
+            statuses.append(is_set)
+
+        self.last_pass_seconds = time.perf_counter() - start
+        self.last_pass_size = len(price_changes)
+        logger.info(f'Reprice pass: {sum(statuses)}/{len(price_changes)} prices set '
+                    f'in {self.last_pass_seconds:.2f} s')
+        return statuses
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
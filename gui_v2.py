@@ -1,12 +1,17 @@
 import customtkinter as ctk
 from bot import MarketBot, price_update_loop
-from threading import Thread, Event, Lock
-from prettytable import PrettyTable
+from threading import Thread, Event
+from item_table import ItemTableModel, TableViewport, FrameTimer, TABLE_HEADER
 import time
 from logging import getLogger
 
 logger = getLogger('market_bot')
 
+AUTO_REFRESH_INTERVAL_MS = 500
+# Stop of the loop is awaited by polling, the window keeps responding meanwhile
+STOP_POLL_INTERVAL_MS = 50
+TABLE_HEIGHT_ROWS = 17  # rows under the header that fit into the textbox
+
 
 class MarketCSGOBotApp(ctk.CTk):
     def __init__(self):
@@ -15,8 +20,28 @@ class MarketCSGOBotApp(ctk.CTk):
         self.geometry(f'{910}x{380}')
         self.protocol('WM_DELETE_WINDOW', self.on_closing)  # call on_closing() when app gets closed
 
-        self.items_textbox = ctk.CTkTextbox(self, width=700, height=300, font=('Consolas', 12), undo=False)
-        self.items_textbox.grid(row=0, column=0, columnspan=3, padx=10, pady=(10, 0))
+        # ----- Items table, only visible rows are in the textbox -----
+        self.table_frame = ctk.CTkFrame(self, width=700, height=300, fg_color='transparent')
+        self.table_frame.grid(row=0, column=0, columnspan=3, padx=10, pady=(10, 0))
+
+        self.items_textbox = ctk.CTkTextbox(self.table_frame, width=684, height=300, font=('Consolas', 12),
+                                            undo=False, wrap='none')
+        self.items_textbox.grid(row=0, column=0)
+        self.items_textbox.insert('0.0', TABLE_HEADER + '\n' * TABLE_HEIGHT_ROWS)
+        self.items_textbox.bind('<MouseWheel>', self.on_table_mouse_wheel)
+        self.items_textbox.bind('<Button-4>', self.on_table_mouse_wheel)  # wheel on Linux
+        self.items_textbox.bind('<Button-5>', self.on_table_mouse_wheel)
+        self.items_textbox.bind('<Button-1>', self.on_table_click)
+
+        self.items_scrollbar = ctk.CTkScrollbar(self.table_frame, height=300, command=self.on_table_scroll)
+        self.items_scrollbar.grid(row=0, column=1)
+
+        self.table_model = ItemTableModel()
+        self.table_viewport = TableViewport(self.table_model, TABLE_HEIGHT_ROWS)
+        self.frame_timer = FrameTimer()
+        self._menu_item_ids = []
+        self._shown_snapshot = None
+        # ---------------------------------------------------------------
 
         # ----- Control frame -----
         self.control_frame = ctk.CTkFrame(self, width=180, height=300)
@@ -26,7 +51,7 @@ class MarketCSGOBotApp(ctk.CTk):
         self.bot = MarketBot()  # initialize bot for items menu
 
         self.item_menu = ctk.CTkOptionMenu(self.control_frame, width=160,
-                                           values=self.bot.items, command=self.item_menu_callback)
+                                           values=[], command=self.item_menu_callback)
         self.item_menu.grid(row=0, column=0, padx=10, pady=(10, 0))
         self.item_menu.set('Select item by id')
 
@@ -42,7 +67,7 @@ class MarketCSGOBotApp(ctk.CTk):
         self.target_price_entry = ctk.CTkEntry(self.control_frame, width=160, placeholder_text='target')
         self.target_price_entry.grid(row=4, column=0, padx=10, pady=0)
 
-        self.save_user_prices_button = ctk.CTkButton(self.control_frame, text='Save and refresh list', width=160,
+        self.save_user_prices_button = ctk.CTkButton(self.control_frame, text='Save', width=160,
                                                      command=self.save_input_prices)
         self.save_user_prices_button.grid(row=5, column=0, padx=10, pady=(10, 10), sticky='ns')
         # -------------------------
@@ -62,10 +87,6 @@ class MarketCSGOBotApp(ctk.CTk):
 
         self.loop_progressbar = ctk.CTkProgressBar(self.updater_frame, width=200, height=10, mode='indeterminate')
         self.loop_progressbar.grid(row=0, column=2, padx=0, pady=0)
-
-        self.update_menu_and_list_button = ctk.CTkButton(self.updater_frame, command=self.update_item_menu_and_list,
-                                                         text='Refresh list')
-        self.update_menu_and_list_button.grid(row=0, column=3, padx=20, pady=10)
         # --------------------------
 
         self.appearance_mode_switch_var = ctk.StringVar(value=self._get_appearance_mode())
@@ -77,11 +98,15 @@ class MarketCSGOBotApp(ctk.CTk):
 
         self.stop_event = Event()
         self.finish_event = Event()
-        self.stopping_thread = None
+        self.stop_requested_time = None
+        self.is_closing = False
 
         self.bot.initialize_db()
         self.finish_event.set()  # On app start update loop inactive, so finish is possible
 
+        # Table and menu follow the loop updates, no manual refresh needed
+        self.refresh_job = self.after(0, self.auto_refresh)
+
     def start_loop_thread(self):
         self.start_loop_button.configure(state='disabled')
         self.stop_loop_button.configure(state='normal')
@@ -93,39 +118,50 @@ class MarketCSGOBotApp(ctk.CTk):
             target=price_update_loop, args=(self.bot, self.stop_event, self.finish_event))
         worker_thread.start()
 
-    def stop_update_loop_and_toggle_buttons(self):
+    def stop_loop_thread(self):
         self.stop_event.set()
+        self.stop_requested_time = time.perf_counter()
         self.stop_loop_button.configure(state='disabled')
-        self.update()
-        self.finish_event.wait()
-        self.start_loop_button.configure(state='normal')
-        self.loop_progressbar.stop()
-        logger.debug('stopping thread finished')
+        self.after(STOP_POLL_INTERVAL_MS, self.wait_loop_stopped)
 
-    def stop_loop_thread(self):
-        self.stopping_thread = Thread(target=self.stop_update_loop_and_toggle_buttons)
-        self.stopping_thread.start()
+    def wait_loop_stopped(self):
+        if not self.finish_event.is_set():
+            self.after(STOP_POLL_INTERVAL_MS, self.wait_loop_stopped)
+            return
+        logger.debug(f'price update loop stopped in {time.perf_counter() - self.stop_requested_time:.2f} s')
+        self.stop_requested_time = None
+        self.loop_progressbar.stop()
+        if self.is_closing:
+            self.destroy()
+        else:
+            self.start_loop_button.configure(state='normal')
 
     def update_item_menu_and_list(self):
         self.refresh_item_list()
         self.refresh_item_menu()
 
-    # Wait until current iteration is completed, then destroy all widgets
+    def auto_refresh(self):
+        if self.finish_event.is_set():
+            # Loop is not running, so this thread owns the items and applies user edits itself
+            self.bot.apply_commands()
+        self.update_item_menu_and_list()
+        self.refresh_job = self.after(AUTO_REFRESH_INTERVAL_MS, self.auto_refresh)
+
     def on_closing(self):
-        if self.stopping_thread is None or not self.stopping_thread.is_alive():
-            self.stop_event.set()
-            self.finish_event.wait()
+        """ Stop the loop, the window is destroyed once it finished. Stopping takes up to MAX_STOP_SECONDS. """
+        if self.is_closing:
+            return
+        self.is_closing = True
+        self.after_cancel(self.refresh_job)
+        if self.finish_event.is_set():
             self.destroy()
+        elif self.stop_requested_time is not None:
+            pass  # already stopping, wait_loop_stopped() destroys the window
         else:
-            # If stopper thread is currently working then wait for it to finish
-            while self.stopping_thread.is_alive():
-                self.update_idletasks()
-                self.update()
-                time.sleep(0.04)
-            self.destroy()
+            self.stop_loop_thread()
 
     def save_input_prices(self):
-        if not self.bot.items:
+        if not self.bot.snapshot:
             return
 
         select_text = self.item_menu.get()
@@ -133,57 +169,79 @@ class MarketCSGOBotApp(ctk.CTk):
             return
 
         selected_item_id = select_text.split(':')[1]
-        for item in self.bot.items:
-            if item.item_id == selected_item_id:
-                entry_min_text = self.min_price_entry.get().strip()
-                if entry_min_text.isdigit():
-                    item.user_min_price = int(float(entry_min_text))
-
-                entry_target_text = self.target_price_entry.get().strip()
-                if entry_target_text.isdigit():
-                    item.user_target_price = int(float(entry_target_text))
-
-                # Save new user prices
-                self.bot.save_item_user_prices_to_db(
-                    item.item_id, item.user_min_price, item.user_target_price
-                )
-                break
+        if self.bot.snapshot.get(selected_item_id) is not None:
+            entry_min_text = self.min_price_entry.get().strip()
+            entry_target_text = self.target_price_entry.get().strip()
+            # Applied and saved by the price update loop, or right here if the loop is not running
+            self.bot.submit_user_prices(
+                selected_item_id,
+                min_price=int(float(entry_min_text)) if entry_min_text.isdigit() else None,
+                target_price=int(float(entry_target_text)) if entry_target_text.isdigit() else None,
+            )
+            if self.finish_event.is_set():
+                self.bot.apply_commands()
 
         self.refresh_item_list()
 
     def refresh_item_list(self):
-        if not self.bot.items:
-            self.items_textbox.delete('0.0', ctk.END)
-            self.items_textbox.insert('0.0', 'Items list empty or no internet connection \n'
-                                             'Start updating prices to get items list if available')
-            return
-
-        item_table = [['#', 'item_id', 'item title', 'current p.', 'pos', 'minimum', 'target']]
-        for idx, item in enumerate(self.bot.items, 1):
-            title = str(item.market_hash_name[:32]).replace('★', '*') + ' '
-            position = f'n/l' if item.position == 0 else item.position
-            item_table.append([
-                idx, item.item_id, title, f'{item.price/1000:.3f} {item.currency}',
-                position, item.user_min_price, item.user_target_price
-            ])
-        pretty_table = PrettyTable(item_table[0])
-        pretty_table.add_rows(item_table[1:])
-
-        self.items_textbox.delete('0.0', ctk.END)
-        self.items_textbox.insert('0.0', pretty_table.get_string())
+        """ Rewrite only the visible lines which changed. Duration is checked against the frame budget. """
+        start = time.perf_counter()
+        snapshot = self.bot.snapshot
+        if snapshot is not self._shown_snapshot:
+            self.table_model.update(snapshot.items)
+            self._shown_snapshot = snapshot
+        self.apply_table_line_updates()
+        self.items_scrollbar.set(*self.table_viewport.get_scroll_fractions())
+
+        frame_seconds = time.perf_counter() - start
+        if not self.frame_timer.record(frame_seconds):
+            logger.debug(f'Items table refresh took {frame_seconds * 1000:.1f} ms, '
+                         f'over budget {self.frame_timer.over_budget_count} times')
+
+    def apply_table_line_updates(self):
+        for line, text in self.table_viewport.get_line_updates():
+            textbox_line = line + 2  # textbox lines start from 1 and the first one is the header
+            self.items_textbox.delete(f'{textbox_line}.0', f'{textbox_line}.end')
+            self.items_textbox.insert(f'{textbox_line}.0', text)
+
+    def on_table_scroll(self, command, *args):
+        if command == 'moveto':
+            self.table_viewport.scroll_to(round(float(args[0]) * len(self.table_model)))
+        elif command == 'scroll':
+            step = self.table_viewport.height if args[1] == 'pages' else 1
+            self.table_viewport.scroll_by(int(args[0]) * step)
+        self.apply_table_line_updates()
+        self.items_scrollbar.set(*self.table_viewport.get_scroll_fractions())
+
+    def on_table_mouse_wheel(self, event):
+        rows = -3 if event.num == 4 or event.delta > 0 else 3
+        self.on_table_scroll('scroll', rows, 'units')
+        return 'break'
+
+    def on_table_click(self, event):
+        textbox_line = int(self.items_textbox.index(f'@{event.x},{event.y}').split('.')[0])
+        row = self.table_viewport.get_row_at_line(textbox_line - 2)
+        if row is not None:
+            choice = f'#{row + 1} id:{self.table_model.item_ids[row]}'
+            self.item_menu.set(choice)
+            self.item_menu_callback(choice)
 
     def refresh_item_menu(self):
-        choices = (f'#{idx} id:{item.item_id}' for idx, item in enumerate(self.bot.items, 1))
+        # Menu values are rebuilt only when the list of items changed
+        if self.table_model.item_ids == self._menu_item_ids:
+            return
+        self._menu_item_ids = list(self.table_model.item_ids)
+        choices = (f'#{idx} id:{item_id}' for idx, item_id in enumerate(self._menu_item_ids, 1))
         self.item_menu.configure(values=tuple(choices))
 
     def item_menu_callback(self, choice):
         selected_item_id = choice.split(':')[1]
-        for item in self.bot.items:
-            if item.item_id == selected_item_id:
-                self.min_price_entry.delete(0, ctk.END)
-                self.target_price_entry.delete(0, ctk.END)
-                self.min_price_entry.insert(0, item.user_min_price)
-                self.target_price_entry.insert(0, item.user_target_price)
+        item = self.bot.snapshot.get(selected_item_id)
+        if item is not None:
+            self.min_price_entry.delete(0, ctk.END)
+            self.target_price_entry.delete(0, ctk.END)
+            self.min_price_entry.insert(0, item.user_min_price)
+            self.target_price_entry.insert(0, item.user_target_price)
 
     def change_appearance_mode_event(self):
         ctk.set_appearance_mode(self.appearance_mode_switch_var.get())
@@ -0,0 +1,57 @@
+from threading import Lock
+from os import getenv
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+# Number of per-host connection pools kept alive (market.csgo.com, api.telegram.org, ...)
+HTTP_POOL_CONNECTIONS = int(getenv('HTTP_POOL_CONNECTIONS', 4))
+# Max simultaneous keep-alive connections to a single host
+HTTP_POOL_MAXSIZE = int(getenv('HTTP_POOL_MAXSIZE', 8))
+# Block instead of opening extra throw-away connections when a host pool is exhausted
+HTTP_POOL_BLOCK = getenv('HTTP_POOL_BLOCK', '1') == '1'
+
+_session = None
+_session_lock = Lock()
+
+
+def create_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                   pool_block=HTTP_POOL_BLOCK) -> Session:
+    """ Create a session which reuses TCP/TLS connections between requests (keep-alive). """
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> Session:
+    """ Return process-wide shared session, create it on first use. """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def configure_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                      pool_block=HTTP_POOL_BLOCK) -> Session:
+    """ Replace shared session with a new one using given pool limits. """
+    global _session
+    with _session_lock:
+        old_session = _session
+        _session = create_session(pool_connections, pool_maxsize, pool_block)
+    if old_session is not None:
+        old_session.close()
+    return _session
+
+
+def close_session():
+    """ Close all pooled connections of the shared session. """
+    global _session
+    with _session_lock:
+        old_session = _session
+        _session = None
+    if old_session is not None:
+        old_session.close()
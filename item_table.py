@@ -0,0 +1,117 @@
+from collections import deque
+from data_structures import ItemOnSale
+
+# Fixed width columns, so a row is one text line and can be replaced alone
+ROW_FORMAT = '{:>5} {:<12} {:<33} {:>14} {:>4} {:>8} {:>8}'
+TABLE_HEADER = ROW_FORMAT.format('#', 'item_id', 'item title', 'current p.', 'pos', 'minimum', 'target')
+EMPTY_TABLE_TEXT = 'Items list empty or no internet connection \n' \
+                   'Start updating prices to get items list if available'
+# Refresh of the visible table should fit into one frame at 60 fps
+FRAME_BUDGET_SECONDS = 1 / 60
+
+
+def get_row_values(idx: int, item: ItemOnSale) -> tuple:
+    title = str(item.market_hash_name[:32]).replace('★', '*')
+    position = 'n/l' if item.position == 0 else item.position
+    return (idx, item.item_id, title, f'{item.price / 1000:.3f} {item.currency}',
+            position, item.user_min_price, item.user_target_price)
+
+
+class ItemTableModel:
+    """ Text rows of the items table. Only rows whose items changed are formatted again. """
+
+    def __init__(self):
+        self._row_keys: list[tuple] = []
+        self._rows: list[str] = []
+        self.item_ids: list[str] = []
+
+    def update(self, items: list[ItemOnSale]) -> int:
+        """ Return the number of rows that changed, added or removed. """
+        changed_count = max(0, len(self._rows) - len(items))  # removed rows
+        del self._row_keys[len(items):], self._rows[len(items):], self.item_ids[len(items):]
+        row_keys = self._row_keys
+        for idx, item in enumerate(items):
+            # Shown fields are compared, that is much cheaper than formatting the row
+            key = (item.item_id, item.market_hash_name, item.price, item.currency, item.position,
+                   item.user_min_price, item.user_target_price)
+            if idx < len(row_keys):
+                if row_keys[idx] == key:
+                    continue
+                row_keys[idx], self.item_ids[idx] = key, item.item_id
+                self._rows[idx] = ROW_FORMAT.format(*get_row_values(idx + 1, item))
+            else:
+                row_keys.append(key)
+                self.item_ids.append(item.item_id)
+                self._rows.append(ROW_FORMAT.format(*get_row_values(idx + 1, item)))
+            changed_count += 1
+        return changed_count
+
+    def get_rows(self, first_row: int, count: int) -> list[str]:
+        return self._rows[first_row:first_row + count]
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class TableViewport:
+    """ Window of `height` rows over the model. Tracks what the widget shows, so only lines that differ
+    are rewritten. Line 0 is the first row under the header. """
+
+    def __init__(self, model: ItemTableModel, height: int, empty_text=EMPTY_TABLE_TEXT):
+        self.model = model
+        self.height = height
+        self.empty_lines = empty_text.split('\n')  # shown instead of rows when the model is empty
+        self.first_row = 0
+        self._shown_lines: list[str] = [''] * height
+
+    def scroll_to(self, first_row: int):
+        self.first_row = max(0, min(first_row, len(self.model) - self.height))
+
+    def scroll_by(self, rows: int):
+        self.scroll_to(self.first_row + rows)
+
+    def get_line_updates(self) -> list[tuple[int, str]]:
+        """ Return (line, text) pairs to write, and consider them shown. """
+        self.scroll_to(self.first_row)  # the model could shrink
+        if len(self.model):
+            lines = self.model.get_rows(self.first_row, self.height)
+        else:
+            lines = self.empty_lines[:self.height]
+        lines += [''] * (self.height - len(lines))
+        updates = [(line, text) for line, (text, shown_text) in enumerate(zip(lines, self._shown_lines))
+                   if text != shown_text]
+        self._shown_lines = lines
+        return updates
+
+    def get_row_at_line(self, line: int) -> int or None:
+        row = self.first_row + line
+        return row if 0 <= line < self.height and row < len(self.model) else None
+
+    def get_scroll_fractions(self) -> (float, float):
+        """ Position of the visible rows for a scrollbar. """
+        if not len(self.model):
+            return 0., 1.
+        return self.first_row / len(self.model), min(1., (self.first_row + self.height) / len(self.model))
+
+
+class FrameTimer:
+    """ Durations of GUI refreshes against the frame budget. """
+
+    def __init__(self, budget_seconds=FRAME_BUDGET_SECONDS, history_size=300):
+        self.budget_seconds = budget_seconds
+        self.frame_times = deque(maxlen=history_size)
+        self.over_budget_count = 0
+
+    def record(self, seconds: float) -> bool:
+        """ Return True if the frame fit into the budget. """
+        self.frame_times.append(seconds)
+        if seconds > self.budget_seconds:
+            self.over_budget_count += 1
+            return False
+        return True
+
+    def percentile(self, share: float) -> float:
+        if not self.frame_times:
+            return 0.
+        frame_times = sorted(self.frame_times)
+        return frame_times[min(len(frame_times) - 1, int(len(frame_times) * share))]
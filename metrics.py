@@ -0,0 +1,277 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from logging import getLogger
+from os import getenv
+from threading import Lock, Thread
+from urllib.parse import urlsplit
+
+logger = getLogger('market_bot')
+
+
+def parse_port(value: str or None, name: str) -> int or None:
+    """ Port from an environment setting, None if it is not set or invalid. """
+    if not value:
+        return None
+    if value.isdigit() and 0 < int(value) < 65536:
+        return int(value)
+    logger.warning(f'{name}={value!r} is not a port number, ignored')
+    return None
+
+
+# Local scrape endpoint (Prometheus text format), disabled when the port is not set
+METRICS_HOST = getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = parse_port(getenv('METRICS_PORT'), 'METRICS_PORT')
+
+REQUEST_SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+ITERATION_SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30., 60., 120.)
+
+
+def format_labels(labelnames: tuple, labelvalues: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _labelvalues(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def clear(self):
+        """ Forget all values. """
+
+    def render(self) -> list[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+
+
+class Counter(Metric):
+    """ Monotonically increasing value per label set. """
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._labelvalues(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._labelvalues(labels), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{format_labels(self.labelnames, key)} {format_number(value)}')
+        return lines
+
+
+class Gauge(Counter):
+    """ Value which can go up and down, per label set. """
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._labelvalues(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """ Count of observations per upper bound bucket, with their sum. """
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets=REQUEST_SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts: dict[tuple, list[int]] = {}  # per bucket, not cumulative
+        self._sums: dict[tuple, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._labelvalues(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._sums[key] = self._sums.get(key, 0.) + value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._labelvalues(labels), []))
+
+    def sum(self, **labels) -> float:
+        with self._lock:
+            return self._sums.get(self._labelvalues(labels), 0.)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for upper_bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = format_labels(self.labelnames, key, f'le="{format_number(upper_bound)}"')
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {format_number(self._sums[key])}')
+                lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """ Process-wide set of metrics, rendered together for the scrape endpoint. """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets=REQUEST_SECONDS_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def _get_or_create(self, metric_class, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not metric_class or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'Metric {name} is already registered with another type or labels')
+            return metric
+
+    def get(self, name: str) -> Metric or None:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """ Drop collected values, registered metrics stay. """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+registry = MetricsRegistry()
+
+http_request_seconds = registry.histogram(
+    'market_bot_http_request_seconds', 'HTTP request latency by endpoint and status.', ('endpoint', 'status'))
+http_retries_total = registry.counter(
+    'market_bot_http_retries_total', 'HTTP request retries by endpoint and reason.', ('endpoint', 'reason'))
+http_failures_total = registry.counter(
+    'market_bot_http_failures_total', 'HTTP requests that failed after all retries.', ('endpoint',))
+http_errors_total = registry.counter(
+    'market_bot_http_errors_total', 'HTTP errors by endpoint and kind (timeout, connection, server, rate_limit, json).',
+    ('endpoint', 'kind'))
+circuit_breaker_state = registry.gauge(
+    'market_bot_circuit_breaker_state', 'Circuit breaker state by endpoint: 0 closed, 1 half-open, 2 open.',
+    ('endpoint',))
+circuit_breaker_rejected_total = registry.counter(
+    'market_bot_circuit_breaker_rejected_total', 'Requests not sent because the breaker was open.', ('endpoint',))
+json_decode_errors_total = registry.counter(
+    'market_bot_json_decode_errors_total', 'Responses with invalid JSON body.', ('endpoint',))
+decode_rejected_total = registry.counter(
+    'market_bot_decode_rejected_total', 'Records of valid responses rejected as malformed.', ('endpoint',))
+reprice_outcomes_total = registry.counter(
+    'market_bot_reprice_outcomes_total', 'Reprice decisions and set-price results by outcome.', ('outcome',))
+loop_iterations_total = registry.counter(
+    'market_bot_loop_iterations_total', 'Completed price update loop iterations.')
+loop_iteration_seconds = registry.histogram(
+    'market_bot_loop_iteration_seconds', 'Price update loop iteration duration.', buckets=ITERATION_SECONDS_BUCKETS)
+notification_messages_total = registry.counter(
+    'market_bot_notification_messages_total', 'Telegram notification messages by status (sent, failed, dropped).',
+    ('status',))
+notifications_pending = registry.gauge(
+    'market_bot_notifications_pending', 'Sales whose notification is not delivered yet.')
+loop_interval_seconds = registry.gauge(
+    'market_bot_loop_interval_seconds', 'Current wait between price update loop passes.')
+loop_quiet_passes_total = registry.counter(
+    'market_bot_loop_quiet_passes_total', 'Loop passes which saw no change, each lengthens the wait.')
+
+
+def get_endpoint_name(request_url: str or None) -> str:
+    """ Last path segment of the url (items, set-price, sendMessage, ...), keys and tokens are left out. """
+    return urlsplit(request_url or '').path.rstrip('/').rsplit('/', 1)[-1] or '/'
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST,
+                         metrics_registry: MetricsRegistry = registry):
+    """ Serve metrics at http://host:port/metrics from a daemon thread. Return the server or None if disabled.
+    Port 0 picks a free port. """
+    if port is None:
+        return
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # only needed when the endpoint is on
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if urlsplit(self.path).path != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics_registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f'Metrics are served at http://{host}:{server.server_address[1]}/metrics')
+    return server
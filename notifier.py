@@ -0,0 +1,151 @@
+import re
+import time
+from logging import getLogger
+from threading import Event, Thread
+from api_requests import post_telegram_message, TELEGRAM_SENT, TELEGRAM_REJECTED
+from cancellation import is_cancelled
+from data_structures import ItemOnSale
+from metrics import notification_messages_total, notifications_pending
+from rate_limiter import TokenBucket
+from resilience import get_backoff_delay
+from storage import BotStorage
+
+logger = getLogger('market_bot')
+
+# Sales of a burst that arrive within this window after the first one are sent as one summary message
+NOTIFY_COALESCE_SECONDS = 5.
+# Longer summaries are split, a Telegram message is limited to 4096 characters
+MAX_SALES_PER_MESSAGE = 20
+# Telegram allows about one message per second to a chat
+TELEGRAM_RATE_PER_SECOND = 1.
+# Undelivered messages are retried after a growing pause
+NOTIFY_RETRY_SECONDS = 5.
+NOTIFY_RETRY_MAX_SECONDS = 5 * 60
+# Attempts of one send, the notifier retries itself later
+NOTIFY_MAX_RETRIES = 1
+# Characters which must be escaped anywhere in MarkdownV2 text, entities included
+MARKDOWN_V2_SPECIAL_CHARACTERS = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+
+
+def escape_markdown(text: str) -> str:
+    return MARKDOWN_V2_SPECIAL_CHARACTERS.sub(r'\\\1', text)
+
+
+def format_sales_message(sales: list[tuple[str, str, int, str, float]], markdown=True) -> str:
+    """ Message about (item_id, market_hash_name, price, currency, created_at) sales, in MarkdownV2
+    or in plain text. """
+    if markdown:
+        escape, bold, italic = escape_markdown, '*', '_'
+    else:
+        escape, bold, italic = str, '', ''
+
+    def describe_price(price: int, currency: str) -> str:
+        return f'{bold}{escape(f"{price / 1000:.3f} {currency}")}{bold}'
+
+    if len(sales) == 1:
+        _, market_hash_name, price, currency, _ = sales[0]
+        return f'{escape("An Item was bought from you on MarketCSGO.")} To receive {describe_price(price, currency)} ' \
+               f'transfer {italic}{escape(market_hash_name)}{italic} {escape("to the buyer.")}'
+    lines = [escape(f'{len(sales)} items were bought from you on MarketCSGO. Transfer them to the buyers:')]
+    lines.extend(f'{escape("-")} {italic}{escape(market_hash_name)}{italic} for {describe_price(price, currency)}'
+                 for _, market_hash_name, price, currency, _ in sales)
+    return '\n'.join(lines)
+
+
+class SaleNotifier:
+    """ Sends Telegram notifications about sales from a background thread, so the price update loop never
+    waits for Telegram. Sales are saved in the bot database first and deleted once delivered,
+    so undelivered notifications survive restarts. """
+
+    def __init__(self, storage: BotStorage, coalesce_seconds=NOTIFY_COALESCE_SECONDS,
+                 rate_limiter: TokenBucket = None):
+        self.storage = storage
+        self.coalesce_seconds = coalesce_seconds
+        self.rate_limiter = rate_limiter or TokenBucket(TELEGRAM_RATE_PER_SECOND, 1)
+        self._failures_count = 0
+        self._new_sales_event = Event()
+        self._stop_event = Event()
+        self._thread = None
+
+    def notify_sales(self, items: list[ItemOnSale]):
+        """ Save sales for delivery and return at once. """
+        if not items:
+            return
+        now = time.time()
+        self.storage.save_pending_notifications(
+            [(item.item_id, item.market_hash_name, item.price, item.currency, now) for item in items])
+        self._new_sales_event.set()
+
+    def start(self):
+        self._stop_event.clear()
+        self._new_sales_event.set()  # deliver what is left from the previous run
+        self._thread = Thread(target=self._run, name='sale-notifier', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the thread. Pending notifications are delivered first, unless the loop is being stopped,
+        then they wait in the database for the next start. """
+        self._stop_event.set()
+        self._new_sales_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def deliver_pending(self) -> bool:
+        """ Send pending sales, several in one message. Return False if some are left undelivered.
+        A message Telegram rejects is sent again as plain text, and dropped if it is rejected again,
+        so one bad hash name does not hold up the queue. """
+        sales = self.storage.get_pending_notifications()
+        notifications_pending.set(len(sales))
+        for start in range(0, len(sales), MAX_SALES_PER_MESSAGE):
+            batch = sales[start:start + MAX_SALES_PER_MESSAGE]
+            status = None
+            for markdown in (True, False):
+                while not self.rate_limiter.acquire(timeout=0.1):
+                    if is_cancelled():
+                        return False
+                parse_mode = 'MarkdownV2' if markdown else None
+                status = post_telegram_message(format_sales_message(batch, markdown), NOTIFY_MAX_RETRIES, parse_mode)
+                if status != TELEGRAM_REJECTED:
+                    break
+            if status == TELEGRAM_REJECTED:
+                logger.info(f'Telegram rejected notification about {len(batch)} sales, dropped')
+                notification_messages_total.inc(status='dropped')
+            elif status != TELEGRAM_SENT:
+                notification_messages_total.inc(status='failed')
+                return False
+            else:
+                notification_messages_total.inc(status='sent')
+            self.storage.delete_pending_notifications([item_id for item_id, *_ in batch])
+            notifications_pending.set(len(sales) - start - len(batch))
+        return True
+
+    def _run(self):
+        retry_delay = None  # waiting for new sales only
+        while not self._stop_event.is_set():
+            self._new_sales_event.wait(retry_delay)
+            if self._new_sales_event.is_set() and not self._stop_event.is_set():
+                # More sales of the same burst join this message
+                self._stop_event.wait(self.coalesce_seconds)
+            if self._stop_event.is_set():
+                break
+            self._new_sales_event.clear()
+            retry_delay = self._deliver()
+        if not is_cancelled():
+            self._deliver()
+
+    def _deliver(self) -> float or None:
+        """ Return pause before the next attempt, None if everything was delivered. """
+        try:
+            is_delivered = self.deliver_pending()
+        except Exception as e:
+            logger.info(f'Failed on delivering notifications: {e}')
+            is_delivered = False
+        if is_delivered:
+            self._failures_count = 0
+            return None
+        retry_delay = get_backoff_delay(self._failures_count, NOTIFY_RETRY_SECONDS, NOTIFY_RETRY_MAX_SECONDS)
+        retry_delay = max(1., retry_delay)
+        self._failures_count += 1
+        logger.info(f'Telegram notifications not delivered, retrying in {retry_delay:.0f} s')
+        return retry_delay
@@ -0,0 +1,50 @@
+import time
+from logging import getLogger
+from data_structures import ItemOnSale
+from storage import BotStorage
+
+logger = getLogger('market_bot')
+
+
+class PendingSalesTracker:
+    """ Remembers item_ids of pending sales that were already notified.
+    State is kept in the bot database, so restarts don't repeat notifications. """
+
+    def __init__(self, storage: BotStorage):
+        self.storage = storage
+        self._notified: dict[str, float] = storage.get_notified_sales()  # item_id -> notification time
+
+    def select_new(self, pending_items: list[ItemOnSale]) -> list[ItemOnSale]:
+        """ Return pending items which were not notified yet, each item_id once. """
+        new_items = {}
+        for item in pending_items:
+            if item.item_id not in self._notified and item.item_id not in new_items:
+                new_items[item.item_id] = item
+        return list(new_items.values())
+
+    def mark_notified(self, item_ids: list[str]):
+        if not item_ids:
+            return
+        now = time.time()
+        for item_id in item_ids:
+            self._notified[item_id] = now
+        self.storage.save_notified_sales(item_ids, now)
+
+    def expire(self, pending_item_ids: list[str]):
+        """ Forget sales which are not pending anymore (trade completed or cancelled). A sale stays remembered
+        for as long as it is pending, however long that takes, so it is notified once.
+        Call only with a successfully fetched pending list, otherwise every sale would be notified again. """
+        pending_item_ids = set(pending_item_ids)
+        expired_ids = [item_id for item_id in self._notified if item_id not in pending_item_ids]
+        if not expired_ids:
+            return
+        for item_id in expired_ids:
+            del self._notified[item_id]
+        self.storage.delete_notified_sales(expired_ids)
+        logger.debug(f'forgot {len(expired_ids)} completed sales')
+
+    def __contains__(self, item_id: str):
+        return item_id in self._notified
+
+    def __len__(self):
+        return len(self._notified)
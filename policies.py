@@ -14,3 +14,47 @@ def price_update_policy(
 
     return lowest_market_price - 1
 
+
+# Reasons of batch_price_update_policy to leave a price as it is
+PRICE_CHANGE = 0
+SKIP_UNSET = 1  # user min or target price is not set
+SKIP_FIRST_IN_QUEUE = 2
+SKIP_SAME_PRICE = 3
+SKIP_POLICY_ERROR = 4  # new price is below the min price
+SKIP_USER_INPUT_ERROR = 5  # target price is below the min price
+
+
+def batch_price_update_policy(current_prices, lowest_market_prices, min_prices, target_prices, positions):
+    """ Evaluate price_update_policy and the checks done before a set-price call for all items at once.
+    Take equal length arrays (or sequences) of ints. Return (new prices, skip reasons) int64 arrays,
+    items to set a new price for have PRICE_CHANGE reason, see get_changed_indices(). """
+    import numpy as np  # needed for batch evaluation only
+
+    current_prices = np.asarray(current_prices, dtype=np.int64)
+    lowest_market_prices = np.asarray(lowest_market_prices, dtype=np.int64)
+    min_prices = np.asarray(min_prices, dtype=np.int64)
+    target_prices = np.asarray(target_prices, dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.int64)
+
+    # Same rules as price_update_policy, applied to items which are not first in a queue
+    new_prices = np.where(target_prices < lowest_market_prices, target_prices, lowest_market_prices - 1)
+    new_prices = np.where(min_prices >= lowest_market_prices, current_prices, new_prices)
+    new_prices = np.where(positions > 1, new_prices, current_prices)
+
+    skip_reasons = np.select(
+        [(min_prices == 0) | (target_prices == 0),
+         positions <= 1,
+         new_prices == current_prices,
+         new_prices < min_prices,
+         target_prices < min_prices],
+        [SKIP_UNSET, SKIP_FIRST_IN_QUEUE, SKIP_SAME_PRICE, SKIP_POLICY_ERROR, SKIP_USER_INPUT_ERROR],
+        default=PRICE_CHANGE,
+    )
+    return new_prices, skip_reasons
+
+
+def get_changed_indices(skip_reasons):
+    """ Indices of items which need a set-price call. """
+    import numpy as np
+
+    return np.flatnonzero(np.asarray(skip_reasons) == PRICE_CHANGE)
@@ -0,0 +1,163 @@
+import json
+from importlib.util import find_spec
+from os import getenv
+from threading import Event, Lock, Thread
+from logging import getLogger
+
+logger = getLogger('market_bot')
+
+# The market does not document a public lowest-price feed. The default URL, the subscribe message
+# {"action": "subscribe", "hash_names": [...]} and the offer format below are assumptions, not a known protocol:
+# check them against the real endpoint, or point PRICE_FEED_URL to a feed that speaks them, before enabling the feed.
+PRICE_FEED_URL = getenv('PRICE_FEED_URL', 'wss://wsprice.csgo.com/connection/websocket')
+PRICE_FEED_CONNECT_TIMEOUT = 5
+PRICE_FEED_RECONNECT_DELAY = 5
+
+
+def parse_feed_message(message: str) -> list[tuple[str, int]]:
+    """ Return (market_hash_name, lowest price) pairs from a feed message. The payload is either one offer
+    or {"data": [offers]}, where offer is {"market_hash_name": ..., "price": ...} with int format price. """
+    try:
+        payload = json.loads(message)
+    except ValueError:
+        return []
+    if isinstance(payload, dict) and 'data' in payload:
+        payload = payload['data']
+    offers = payload if isinstance(payload, list) else [payload]
+
+    prices = []
+    for offer in offers:
+        try:
+            prices.append((offer['market_hash_name'], int(offer['price'])))
+        except (TypeError, KeyError, ValueError):
+            continue
+    return prices
+
+
+def websocket_connect(url: str):
+    import websocket  # websocket-client, optional and imported on first connect to keep startup fast
+    connection = websocket.create_connection(url, timeout=PRICE_FEED_CONNECT_TIMEOUT)
+    connection.settimeout(None)  # a quiet market is not a dropped connection
+    return connection
+
+
+class PriceFeed:
+    """ Keeps lowest prices of subscribed hash names up to date from the market websocket.
+    Runs in its own thread and reconnects when the socket drops. While it is not connected,
+    callers should fall back to polling. """
+
+    def __init__(self, url=PRICE_FEED_URL, connect=None, reconnect_delay=PRICE_FEED_RECONNECT_DELAY):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self._connect = connect or websocket_connect
+        self._lowest_prices: dict[str, int] = {}
+        self._changed_names: set[str] = set()
+        self._subscribed_names: set[str] = set()
+        self._lock = Lock()
+        self._connected = Event()
+        self._stop_event = Event()
+        self._connection = None
+        self._thread = None
+
+    @staticmethod
+    def is_available() -> bool:
+        return find_spec('websocket') is not None
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='price-feed', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        connection = self._connection
+        if connection is not None:
+            connection.close()  # interrupts blocking recv()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wait_connected(self, timeout: float = None) -> bool:
+        return self._connected.wait(timeout)
+
+    def subscribe(self, hash_names: list[str]):
+        """ Follow lowest prices of given names, stop following the others. """
+        hash_names = set(hash_names)
+        with self._lock:
+            new_names = hash_names - self._subscribed_names
+            self._subscribed_names = hash_names
+            for hash_name in [hash_name for hash_name in self._lowest_prices if hash_name not in hash_names]:
+                del self._lowest_prices[hash_name]
+            self._changed_names &= hash_names
+        if new_names and self.connected:
+            self._send_subscribe(new_names)
+
+    def get_lowest_prices(self, hash_names: list[str]) -> dict[str, int]:
+        """ Return known lowest prices. Names without a price from the feed yet are missing. """
+        with self._lock:
+            return {hash_name: self._lowest_prices[hash_name]
+                    for hash_name in hash_names if hash_name in self._lowest_prices}
+
+    def pop_changed_names(self) -> set[str]:
+        """ Names whose lowest price changed since the previous call. """
+        with self._lock:
+            changed_names, self._changed_names = self._changed_names, set()
+            return changed_names
+
+    def has_changes(self) -> bool:
+        with self._lock:
+            return bool(self._changed_names)
+
+    def apply_message(self, message: str):
+        with self._lock:
+            for hash_name, price in parse_feed_message(message):
+                if hash_name not in self._subscribed_names:
+                    continue
+                if self._lowest_prices.get(hash_name) != price:
+                    self._lowest_prices[hash_name] = price
+                    self._changed_names.add(hash_name)
+
+    def _send_subscribe(self, hash_names):
+        connection = self._connection
+        if connection is None:
+            return
+        try:
+            connection.send(json.dumps({'action': 'subscribe', 'hash_names': sorted(hash_names)}))
+        except Exception as e:
+            logger.debug(f'Failed on subscribing to price feed: {e}')
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._connection = self._connect(self.url)
+            except Exception as e:
+                logger.info(f'Price feed is not available, polling is used. Error: {e}')
+                self._stop_event.wait(self.reconnect_delay)
+                continue
+
+            self._connected.set()  # names subscribed from now on are sent by subscribe()
+            with self._lock:
+                subscribed_names = set(self._subscribed_names)
+                # Prices could be missed while disconnected
+                self._lowest_prices.clear()
+            self._send_subscribe(subscribed_names)
+            logger.info('Price feed connected')
+            try:
+                while not self._stop_event.is_set():
+                    message = self._connection.recv()
+                    if not message:  # closed by server
+                        break
+                    self.apply_message(message)
+            except Exception as e:
+                logger.debug(f'Price feed connection error: {e}')
+            finally:
+                self._connected.clear()
+                self._connection.close()
+                self._connection = None
+
+            if not self._stop_event.is_set():
+                logger.info('Price feed disconnected, polling is used until it reconnects')
+                self._stop_event.wait(self.reconnect_delay)
@@ -0,0 +1,175 @@
+import sys
+import time
+from array import array
+from logging import getLogger
+from threading import Event, Lock, Thread
+from storage import BotStorage
+
+logger = getLogger('market_bot')
+
+# Series kinds
+LOWEST_PRICE_SERIES = 'lowest'  # lowest market price observed by the bot
+OWN_PRICE_SERIES = 'own'  # price the bot set for its item
+
+CHUNK_MAX_POINTS = 512
+FLUSH_INTERVAL_SECONDS = 30
+# Chunks not appended to for this long are dropped from memory after they are flushed
+CHUNK_IDLE_SECONDS = 60 * 60
+# Raw points are kept for a week, then one point per 5 minutes, everything older than 90 days is deleted
+RAW_RETENTION_SECONDS = 7 * 24 * 60 * 60
+DOWNSAMPLED_RESOLUTION_SECONDS = 5 * 60
+RETENTION_SECONDS = 90 * 24 * 60 * 60
+MAINTENANCE_INTERVAL_SECONDS = 60 * 60
+
+
+def pack(values: array) -> bytes:
+    """ Arrays are stored little-endian whatever the platform is. """
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def downsample_points(times: array, prices: array, resolution: float) -> (array, array):
+    """ Keep the last point of every `resolution` seconds long bucket. """
+    sampled_times, sampled_prices = array('d'), array('q')
+    for idx, point_time in enumerate(times):
+        is_last_in_bucket = idx + 1 == len(times) or times[idx + 1] // resolution != point_time // resolution
+        if is_last_in_bucket:
+            sampled_times.append(point_time)
+            sampled_prices.append(prices[idx])
+    return sampled_times, sampled_prices
+
+
+class OpenChunk:
+    """ Chunk of one series being appended to. Times are unix seconds, prices are in int format. """
+    __slots__ = ('start_time', 'times', 'prices')
+
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.times = array('d')
+        self.prices = array('q')
+
+    def to_row(self, series: str, market_hash_name: str) -> tuple:
+        return (series, market_hash_name, self.start_time, self.times[-1], 0., pack(self.times), pack(self.prices))
+
+
+class PriceHistory:
+    """ Append-only history of lowest market prices and own prices per hash name, stored in the bot database.
+    A series is a step function: a point is appended only when the price changes. Points are collected
+    in memory and written in batches by a background thread, so recording costs no database access. """
+
+    def __init__(self, storage: BotStorage, flush_interval=FLUSH_INTERVAL_SECONDS, clock=time.time):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._open_chunks: dict[tuple[str, str], OpenChunk] = {}
+        self._dirty_keys: set[tuple[str, str]] = set()
+        self._sealed_rows: list[tuple] = []  # full chunks waiting for flush
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+        self._last_maintenance_time = 0.
+
+    # ----- Recording, called from the price update loop -----
+    def record_lowest_prices(self, lowest_prices: dict[str, int], now: float = None):
+        self.record(LOWEST_PRICE_SERIES, lowest_prices, now)
+
+    def record_own_prices(self, own_prices: dict[str, int], now: float = None):
+        self.record(OWN_PRICE_SERIES, own_prices, now)
+
+    def record(self, series: str, prices: dict[str, int], now: float = None):
+        now = self._clock() if now is None else now
+        with self._lock:
+            for market_hash_name, price in prices.items():
+                key = (series, market_hash_name)
+                chunk = self._open_chunks.get(key)
+                if chunk is not None and chunk.prices[-1] == price:
+                    continue
+                if chunk is None or len(chunk.times) >= CHUNK_MAX_POINTS:
+                    if chunk is not None:
+                        self._sealed_rows.append(chunk.to_row(series, market_hash_name))
+                    chunk = OpenChunk(now)
+                    self._open_chunks[key] = chunk
+                chunk.times.append(now)
+                chunk.prices.append(price)
+                self._dirty_keys.add(key)
+
+    # ----- Writing -----
+    def flush(self):
+        """ Write changed chunks in one transaction, forget chunks idle for long. """
+        now = self._clock()
+        with self._lock:
+            rows, self._sealed_rows = self._sealed_rows, []
+            rows.extend(self._open_chunks[key].to_row(*key) for key in self._dirty_keys)
+            self._dirty_keys.clear()
+            # Written already, a new point will start a new chunk
+            for key in [key for key, chunk in self._open_chunks.items() if now - chunk.times[-1] > CHUNK_IDLE_SECONDS]:
+                del self._open_chunks[key]
+        self.storage.save_price_chunks(rows)
+
+    def maintain(self, now: float = None):
+        """ Downsample old raw chunks and delete chunks past retention. """
+        now = self._clock() if now is None else now
+        deleted_count = self.storage.delete_price_chunks_before(now - RETENTION_SECONDS)
+        rows = []
+        for series, market_hash_name, start_time, end_time, _, times, prices in \
+                self.storage.get_price_chunks_to_downsample(now - RAW_RETENTION_SECONDS,
+                                                            DOWNSAMPLED_RESOLUTION_SECONDS):
+            sampled_times, sampled_prices = downsample_points(
+                unpack('d', times), unpack('q', prices), DOWNSAMPLED_RESOLUTION_SECONDS)
+            rows.append((series, market_hash_name, start_time, end_time, DOWNSAMPLED_RESOLUTION_SECONDS,
+                         pack(sampled_times), pack(sampled_prices)))
+        self.storage.save_price_chunks(rows)
+        self._last_maintenance_time = now
+        logger.debug(f'price history: {len(rows)} chunks downsampled, {deleted_count} deleted')
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='price-history', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop background writes and flush what is left. """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self._clock() - self._last_maintenance_time >= MAINTENANCE_INTERVAL_SECONDS:
+                    self.maintain()
+            except Exception as e:
+                logger.info(f'Failed on writing price history: {e}')
+
+    # ----- Queries -----
+    def query(self, market_hash_name: str, series=LOWEST_PRICE_SERIES, start_time: float = 0.,
+              end_time: float = float('inf')):
+        """ Return (times, prices) NumPy arrays of float64 unix seconds and int64 prices in int format. """
+        import numpy as np  # only analysis needs NumPy, the bot itself starts without it
+
+        self.flush()
+        chunks = self.storage.get_price_chunks(series, market_hash_name, start_time, end_time)
+        times = np.concatenate([np.frombuffer(row[5], dtype='<f8') for row in chunks] or [np.empty(0, '<f8')])
+        prices = np.concatenate([np.frombuffer(row[6], dtype='<i8') for row in chunks] or [np.empty(0, '<i8')])
+        mask = (times >= start_time) & (times <= end_time)
+        return times[mask].astype(np.float64), prices[mask].astype(np.int64)
+
+    def count_undercuts(self, market_hash_name: str, start_time: float = 0., end_time: float = float('inf')) -> int:
+        """ How many times the lowest market price went down in the period. """
+        import numpy as np
+
+        _, prices = self.query(market_hash_name, LOWEST_PRICE_SERIES, start_time, end_time)
+        return int(np.count_nonzero(np.diff(prices) < 0))
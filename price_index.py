@@ -0,0 +1,235 @@
+import codecs
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from decimal import Decimal, InvalidOperation
+from hashlib import blake2b
+from json import JSONDecoder, JSONDecodeError
+from pathlib import Path
+from threading import Lock
+from typing import Iterable, Iterator
+
+# Index file layout: header | open addressing slot table | names region
+# slot = (name hash, name offset + 1 or 0 if slot is empty, price)
+INDEX_MAGIC = b'MPIX'
+INDEX_VERSION = 1
+HEADER_FORMAT = struct.Struct('<4sIQQd')  # magic, version, slots count, entries count, build time
+SLOT_FORMAT = struct.Struct('<QQq')
+NAME_LENGTH_FORMAT = struct.Struct('<H')
+
+
+def hash_name_key(market_hash_name: str) -> int:
+    """ Stable 64-bit hash of a name (builtin hash() is randomized per process). """
+    return int.from_bytes(blake2b(market_hash_name.encode(), digest_size=8).digest(), 'little')
+
+
+def dump_price_to_int(price) -> int:
+    """ Convert dump price in USD ('0.123' or 0.123) into int format (1 USD = 1000). Return 0 if invalid. """
+    try:
+        return int(Decimal(str(price)) * 1000)
+    except (InvalidOperation, ValueError):
+        return 0
+
+
+def iter_dump_items(chunks: Iterable[bytes], items_key='items') -> Iterator[dict]:
+    """ Incrementally parse a {..., "items": [{...}, {...}]} dump from byte chunks.
+    Only one item object is decoded at a time, the whole document is never loaded.
+    Raises ValueError if the chunks end before the items array is closed, e.g. on a dropped connection. """
+    decoder = JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    key_marker = f'"{items_key}"'
+    buffer = ''
+    position = 0
+    in_items = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        if not in_items:
+            key_position = buffer.find(key_marker)
+            if key_position == -1:
+                continue
+            array_position = buffer.find('[', key_position + len(key_marker))
+            if array_position == -1:
+                continue
+            position = array_position + 1
+            in_items = True
+
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except JSONDecodeError:
+                break  # item is not complete yet, wait for the next chunk
+            yield item
+        # Drop already parsed text to keep the buffer small
+        buffer = buffer[position:]
+        position = 0
+    if in_items:
+        raise ValueError(f'dump ended before the end of the "{items_key}" array')
+
+
+def build_index(items: Iterable[dict], index_path: Path) -> int:
+    """ Write hash_name -> lowest price index file. Return number of entries. """
+    index_path = Path(index_path)
+    entry_positions: dict[int, int] = {}
+    name_hashes = array('Q')
+    name_offsets = array('Q')
+    prices = array('q')
+
+    with tempfile.TemporaryFile() as names_file:
+        names_size = 0
+        for item in items:
+            market_hash_name = item.get('market_hash_name')
+            price = dump_price_to_int(item.get('price'))
+            if not market_hash_name or price <= 0:
+                continue
+            name_hash = hash_name_key(market_hash_name)
+            entry_position = entry_positions.get(name_hash)
+            if entry_position is not None:
+                prices[entry_position] = min(prices[entry_position], price)
+                continue
+            encoded_name = market_hash_name.encode()[:0xFFFF]
+            names_file.write(NAME_LENGTH_FORMAT.pack(len(encoded_name)))
+            names_file.write(encoded_name)
+            entry_positions[name_hash] = len(prices)
+            name_hashes.append(name_hash)
+            name_offsets.append(names_size)
+            prices.append(price)
+            names_size += NAME_LENGTH_FORMAT.size + len(encoded_name)
+
+        entries_count = len(prices)
+        slots_count = 1
+        while slots_count < entries_count * 2:
+            slots_count *= 2
+        slots = bytearray(SLOT_FORMAT.size * slots_count)
+        for name_hash, name_offset, price in zip(name_hashes, name_offsets, prices):
+            slot = name_hash & (slots_count - 1)
+            while SLOT_FORMAT.unpack_from(slots, slot * SLOT_FORMAT.size)[1]:
+                slot = (slot + 1) & (slots_count - 1)
+            SLOT_FORMAT.pack_into(slots, slot * SLOT_FORMAT.size, name_hash, name_offset + 1, price)
+
+        # Write next to the target and replace it at once, so readers never see a partial file
+        tmp_path = index_path.with_suffix(index_path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as index_file:
+            index_file.write(HEADER_FORMAT.pack(INDEX_MAGIC, INDEX_VERSION, slots_count, entries_count, time.time()))
+            index_file.write(slots)
+            names_file.seek(0)
+            while True:
+                data = names_file.read(1 << 20)
+                if not data:
+                    break
+                index_file.write(data)
+    os.replace(tmp_path, index_path)
+    return entries_count
+
+
+class PriceDumpIndex:
+    """ Read-only memory-mapped hash_name -> lowest price index with O(1) lookups. """
+
+    def __init__(self, index_path: Path):
+        self.index_path = Path(index_path)
+        self.build_time = 0.
+        self.entries_count = 0
+        self._slots_count = 0
+        self._names_base = 0
+        self._file = None
+        self._mmap = None
+        self._lock = Lock()
+        self.open()
+
+    def open(self) -> bool:
+        """ Map index file into memory if it exists and is valid. Return False otherwise. """
+        with self._lock:
+            self._close()
+            if not self.index_path.exists():
+                return False
+            index_file = open(self.index_path, 'rb')
+            try:
+                index_mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file can't be mapped
+                index_file.close()
+                return False
+            # A truncated file, e.g. left by a crash or a full disk, is treated as missing
+            is_valid = len(index_mmap) >= HEADER_FORMAT.size
+            if is_valid:
+                magic, version, slots_count, entries_count, build_time = HEADER_FORMAT.unpack_from(index_mmap)
+                is_valid = magic == INDEX_MAGIC and version == INDEX_VERSION \
+                    and len(index_mmap) >= HEADER_FORMAT.size + SLOT_FORMAT.size * slots_count
+            if not is_valid:
+                index_mmap.close()
+                index_file.close()
+                return False
+            self._file, self._mmap = index_file, index_mmap
+            self._slots_count = slots_count
+            self._names_base = HEADER_FORMAT.size + SLOT_FORMAT.size * slots_count
+            self.entries_count = entries_count
+            self.build_time = build_time
+            return True
+
+    def _close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._file, self._mmap = None, None
+        self._slots_count = self.entries_count = 0
+        self.build_time = 0.
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def replace(self, items: Iterable[dict]) -> int:
+        """ Build a new index from parsed items and switch lookups to it. Return number of entries. """
+        tmp_index_path = self.index_path.with_suffix(self.index_path.suffix + '.new')
+        entries_count = build_index(items, tmp_index_path)
+        if not entries_count:  # keep the old index if the dump had no items
+            os.remove(tmp_index_path)
+            return 0
+        with self._lock:
+            self._close()  # the mapped file must be closed before it can be replaced on Windows
+            os.replace(tmp_index_path, self.index_path)
+        self.open()
+        return entries_count
+
+    def is_stale(self, max_age: float) -> bool:
+        return time.time() - self.build_time > max_age
+
+    def lookup(self, market_hash_name: str) -> int:
+        """ Return lowest price by name or 0 if name is not in the index. """
+        name_hash = hash_name_key(market_hash_name)
+        encoded_name = market_hash_name.encode()
+        with self._lock:
+            if not self._slots_count:
+                return 0
+            slot = name_hash & (self._slots_count - 1)
+            while True:
+                slot_hash, name_offset, price = SLOT_FORMAT.unpack_from(
+                    self._mmap, HEADER_FORMAT.size + slot * SLOT_FORMAT.size)
+                if not name_offset:
+                    return 0
+                if slot_hash == name_hash:
+                    name_position = self._names_base + name_offset - 1
+                    name_length, = NAME_LENGTH_FORMAT.unpack_from(self._mmap, name_position)
+                    name_position += NAME_LENGTH_FORMAT.size
+                    if self._mmap[name_position:name_position + name_length] == encoded_name:
+                        return price
+                slot = (slot + 1) & (self._slots_count - 1)
+
+    def lookup_many(self, market_hash_names: Iterable[str]) -> dict[str, int]:
+        """ Return prices of names found in the index. """
+        lowest_prices = {}
+        for market_hash_name in market_hash_names:
+            price = self.lookup(market_hash_name)
+            if price:
+                lowest_prices[market_hash_name] = price
+        return lowest_prices
+
+    def __len__(self):
+        return self.entries_count
@@ -0,0 +1,97 @@
+import time
+from threading import Condition, Lock
+from urllib.parse import urlsplit, parse_qs
+
+# The market API allows 5 requests/sec per API key
+MARKET_RATE_PER_SECOND = 5.
+MARKET_BURST = 5
+# Rate is divided by this factor on every rate-limit error reported by the server
+RATE_LIMIT_BACKOFF_FACTOR = 2.
+MIN_RATE_PER_SECOND = 0.5
+# Seconds of error-free work needed to restore the rate by one backoff step
+RATE_RECOVERY_SECONDS = 10.
+
+
+class TokenBucket:
+    """ Thread-safe token bucket. Tokens refill at `rate` per second up to `burst`,
+    every request takes one token. On rate-limit errors the rate is temporarily lowered. """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self._last_refill = clock()
+        self._last_penalty = None
+        self._condition = Condition(Lock())
+
+    def _refill(self, now: float):
+        if self._last_penalty is not None and now - self._last_penalty >= RATE_RECOVERY_SECONDS:
+            self.rate = min(self.max_rate, self.rate * RATE_LIMIT_BACKOFF_FACTOR)
+            self._last_penalty = None if self.rate == self.max_rate else now
+        self.tokens = min(float(self.burst), self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def try_acquire(self) -> bool:
+        """ Take a token if one is available right now. """
+        with self._condition:
+            self._refill(self._clock())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout: float = None) -> bool:
+        """ Block until a token is available. Return False if timeout expired first. """
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._condition:
+            while True:
+                now = self._clock()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_time = (1 - self.tokens) / self.rate
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wait_time = min(wait_time, deadline - now)
+                self._condition.wait(wait_time)
+
+    def penalize(self):
+        """ Server reported too many requests: slow down and drop accumulated burst. """
+        with self._condition:
+            now = self._clock()
+            self._refill(now)
+            self.rate = max(MIN_RATE_PER_SECOND, self.rate / RATE_LIMIT_BACKOFF_FACTOR)
+            self.tokens = min(self.tokens, 0.)
+            self._last_penalty = now
+
+
+_limiters: dict[tuple[str, str], TokenBucket] = {}
+_limiters_lock = Lock()
+
+
+def get_rate_limiter(host: str, api_key: str = '', rate: float = MARKET_RATE_PER_SECOND,
+                     burst: int = MARKET_BURST) -> TokenBucket:
+    """ Return process-wide limiter shared by all threads using the same host and API key. """
+    key = (host, api_key or '')
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucket(rate, burst)
+            _limiters[key] = limiter
+        return limiter
+
+
+def get_rate_limiter_for_url(request_url: str) -> TokenBucket:
+    """ Key limiter by request host and `key` query parameter (market API key). """
+    url_parts = urlsplit(request_url)
+    api_key = parse_qs(url_parts.query).get('key', [''])[0]
+    return get_rate_limiter(url_parts.hostname or '', api_key)
+
+
+def reset_rate_limiters():
+    with _limiters_lock:
+        _limiters.clear()
@@ -0,0 +1,122 @@
+import random
+import time
+from threading import Lock
+from requests import RequestException, Response, Timeout
+from metrics import circuit_breaker_state, circuit_breaker_rejected_total
+
+# Error kinds
+ERROR_TIMEOUT = 'timeout'
+ERROR_CONNECTION = 'connection'  # refused, reset, DNS and other transport errors
+ERROR_SERVER = 'server'  # HTTP 5xx
+ERROR_RATE_LIMIT = 'rate_limit'  # HTTP 429, handled by the rate limiter, not a sign of an outage
+ERROR_JSON = 'json'  # body is not valid JSON
+HTTP_TOO_MANY_REQUESTS = 429
+
+# Retry pauses grow as base * 2 ** attempt up to the max, the pause is a random part of that (full jitter)
+BACKOFF_MAX_SECONDS = 8.
+# Breaker opens after this many failures in a row and lets one probe request through after recovery time
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RECOVERY_SECONDS = 10.
+
+# Breaker states, values of the state gauge
+STATE_CLOSED = 'closed'
+STATE_HALF_OPEN = 'half_open'
+STATE_OPEN = 'open'
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+def classify_exception(exception: RequestException) -> str:
+    return ERROR_TIMEOUT if isinstance(exception, Timeout) else ERROR_CONNECTION
+
+
+def classify_response(response: Response) -> str or None:
+    """ Return error kind of the response or None if the server handled the request. """
+    if response.status_code == HTTP_TOO_MANY_REQUESTS:
+        return ERROR_RATE_LIMIT
+    if response.status_code >= 500:
+        return ERROR_SERVER
+    return None
+
+
+def get_backoff_delay(attempt: int, base: float, max_delay=BACKOFF_MAX_SECONDS, rng=random.random) -> float:
+    """ Pause before retry number `attempt` + 1. Random pauses keep threads and accounts from retrying
+    all at once. """
+    return rng() * min(max_delay, base * 2 ** attempt)
+
+
+class CircuitBreaker:
+    """ Fails requests to an endpoint fast while it is down. Closed: requests go through, failures in a row
+    are counted. Open: requests are rejected until recovery time passes. Half-open: one probe request
+    goes through, its success closes the breaker, its failure opens it again. """
+
+    def __init__(self, endpoint: str, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 recovery_seconds=BREAKER_RECOVERY_SECONDS, clock=time.monotonic):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.failures_count = 0
+        self._state = STATE_CLOSED
+        self._clock = clock
+        self._opened_time = 0.
+        self._probe_time = None  # start of the probe request in flight
+        self._lock = Lock()
+        circuit_breaker_state.set(STATE_VALUES[STATE_CLOSED], endpoint=endpoint)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            if self._state == STATE_OPEN and now - self._opened_time >= self.recovery_seconds:
+                self._set_state(STATE_HALF_OPEN)
+            if self._state == STATE_HALF_OPEN:
+                # A probe whose outcome was never reported does not block the endpoint forever
+                if self._probe_time is None or now - self._probe_time >= self.recovery_seconds:
+                    self._probe_time = now
+                    return True
+            elif self._state == STATE_CLOSED:
+                return True
+        circuit_breaker_rejected_total.inc(endpoint=self.endpoint)
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures_count = 0
+            self._probe_time = None
+            if self._state != STATE_CLOSED:
+                self._set_state(STATE_CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures_count += 1
+            self._probe_time = None
+            if self._state == STATE_HALF_OPEN or self.failures_count >= self.failure_threshold:
+                self._opened_time = self._clock()
+                if self._state != STATE_OPEN:
+                    self._set_state(STATE_OPEN)
+
+    def _set_state(self, state: str):
+        self._state = state
+        circuit_breaker_state.set(STATE_VALUES[state], endpoint=self.endpoint)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = Lock()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    """ Return breaker shared by all threads requesting the endpoint. """
+    with _breakers_lock:
+        breaker = _breakers.get(endpoint)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint)
+            _breakers[endpoint] = breaker
+        return breaker
+
+
+def reset_circuit_breakers():
+    with _breakers_lock:
+        _breakers.clear()
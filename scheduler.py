@@ -0,0 +1,67 @@
+import heapq
+import time
+from data_structures import ItemOnSale
+
+# At most this many items are repriced in one pass (one lowest prices request), the rest waits for the next passes
+MAX_ITEMS_PER_PASS = 50
+# Urgency weights
+POSITION_WEIGHT = 1.  # per place behind the first one
+MAX_POSITION_PENALTY = 10
+PRICE_GAP_WEIGHT = 20.  # per relative gap to the lowest offer (5% above lowest -> +1)
+WAIT_WEIGHT = 0.2  # per second waited since cool-down expired and since the last check
+MAX_WAIT_SECONDS = 60.
+
+
+def get_urgency(position: int, price: int, lowest_price: int,
+                seconds_since_ready: float, seconds_since_check: float) -> float:
+    """ The higher the value, the sooner the item should be repriced. """
+    urgency = 0.
+    if position > 1:
+        urgency += POSITION_WEIGHT * min(position - 1, MAX_POSITION_PENALTY)
+    if lowest_price > 0 and price > lowest_price:
+        urgency += PRICE_GAP_WEIGHT * (price - lowest_price) / lowest_price
+    # Waiting starts when cool-down expires and starts over after every check
+    waited = min(max(min(seconds_since_ready, seconds_since_check), 0.), MAX_WAIT_SECONDS)
+    urgency += WAIT_WEIGHT * waited
+    return urgency
+
+
+class RepriceScheduler:
+    """ Picks the most urgent items to reprice, so a pass spends its requests where they move sales.
+    Items left out get more urgent with time, so no item is starved. """
+
+    def __init__(self, cool_down_seconds: float, max_items_per_pass=MAX_ITEMS_PER_PASS):
+        self.cool_down_seconds = cool_down_seconds
+        self.max_items_per_pass = max_items_per_pass
+        self._last_check_time: dict[str, float] = {}
+        self._last_lowest_prices: dict[str, int] = {}  # last seen lowest price by hash name
+
+    def get_item_urgency(self, item: ItemOnSale, now: float) -> float:
+        ready_time = item.last_update_time + self.cool_down_seconds
+        last_check_time = self._last_check_time.get(item.item_id, ready_time)
+        lowest_price = self._last_lowest_prices.get(item.market_hash_name, 0)
+        return get_urgency(item.position, item.price, lowest_price, now - ready_time, now - last_check_time)
+
+    def select(self, items: list[ItemOnSale], now: float = None) -> list[ItemOnSale]:
+        """ Return the most urgent items, most urgent first. """
+        now = time.time() if now is None else now
+        heap = [(-self.get_item_urgency(item, now), idx, item) for idx, item in enumerate(items)]
+        heapq.heapify(heap)
+        selected = []
+        while heap and len(selected) < self.max_items_per_pass:
+            item = heapq.heappop(heap)[2]
+            self._last_check_time[item.item_id] = now
+            selected.append(item)
+        return selected
+
+    def observe_lowest_prices(self, lowest_prices: dict[str, int]):
+        self._last_lowest_prices.update(lowest_prices)
+
+    def retain(self, items: list[ItemOnSale]):
+        """ Forget items which are not on sale anymore. """
+        item_ids = {item.item_id for item in items}
+        hash_names = {item.market_hash_name for item in items}
+        for item_id in [item_id for item_id in self._last_check_time if item_id not in item_ids]:
+            del self._last_check_time[item_id]
+        for hash_name in [hash_name for hash_name in self._last_lowest_prices if hash_name not in hash_names]:
+            del self._last_lowest_prices[hash_name]
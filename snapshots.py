@@ -0,0 +1,59 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import NamedTuple
+from data_structures import ItemOnSale
+
+
+class ItemSnapshot(NamedTuple):
+    """ Read-only copy of ItemOnSale state. A tuple, so comparing it with the item state is cheap. """
+    item_id: str
+    position: int
+    price: int
+    currency: str
+    market_hash_name: str
+    user_min_price: int
+    user_target_price: int
+    last_update_time: float
+
+
+@dataclass(frozen=True)
+class InventorySnapshot:
+    """ Immutable state of all items, published by the thread that owns the items. Readers take
+    the current snapshot by reference, without locks, and never see a half-applied change. """
+    version: int = 0
+    items: tuple[ItemSnapshot, ...] = ()
+    _items_by_id: MappingProxyType = field(default_factory=lambda: MappingProxyType({}), repr=False, compare=False)
+
+    def get(self, item_id: str) -> ItemSnapshot or None:
+        return self._items_by_id.get(item_id)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def get_item_state(item: ItemOnSale) -> tuple:
+    return (item.item_id, item.position, item.price, item.currency, item.market_hash_name,
+            item.user_min_price, item.user_target_price, item.last_update_time)
+
+
+def take_snapshot(items, previous: InventorySnapshot) -> InventorySnapshot:
+    """ Copy-on-write: snapshots of unchanged items are shared with the previous snapshot.
+    Return the previous snapshot itself if nothing changed. """
+    item_snapshots = []
+    changed = len(items) != len(previous.items)
+    for idx, item in enumerate(items):
+        item_snapshot = previous.get(item.item_id)
+        state = get_item_state(item)
+        if item_snapshot is None or item_snapshot != state:
+            item_snapshot = ItemSnapshot(*state)
+            changed = True
+        elif not changed and previous.items[idx] is not item_snapshot:
+            changed = True  # order changed
+        item_snapshots.append(item_snapshot)
+    if not changed:
+        return previous
+    return InventorySnapshot(previous.version + 1, tuple(item_snapshots),
+                             MappingProxyType({item.item_id: item for item in item_snapshots}))
@@ -0,0 +1,152 @@
+from pathlib import Path
+from sqlite3 import connect
+from threading import Lock
+
+# SQLite limits the number of host parameters in one statement
+MAX_QUERY_PARAMETERS = 900
+
+
+class BotStorage:
+    """ Bot database. Keeps one connection open in WAL mode, shared by the GUI and loop threads. """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._connection = connect(db_path, check_same_thread=False)
+        self._lock = Lock()
+        self._local_version = 0  # own commits are not counted by PRAGMA data_version
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+        self.initialize()
+
+    def initialize(self):
+        with self._lock, self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS ItemsOnSale('
+                                     'item_id INTEGER PRIMARY KEY, '
+                                     'market_hash_name TEXT, '
+                                     'min_price INTEGER, target_price INTEGER)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS NotifiedSales('
+                                     'item_id TEXT PRIMARY KEY, notified_at REAL)')
+            # Sales whose Telegram notification is not delivered yet, see notifier.py
+            self._connection.execute('CREATE TABLE IF NOT EXISTS PendingNotifications('
+                                     'item_id TEXT PRIMARY KEY, market_hash_name TEXT, price INTEGER, '
+                                     'currency TEXT, created_at REAL)')
+            # Price series stored as chunks of packed arrays, see price_history.py
+            self._connection.execute('CREATE TABLE IF NOT EXISTS PriceHistory('
+                                     'series TEXT, market_hash_name TEXT, start_time REAL, end_time REAL, '
+                                     'resolution REAL, times BLOB, prices BLOB, '
+                                     'PRIMARY KEY (series, market_hash_name, start_time))')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS PriceHistoryEndTime ON PriceHistory(end_time)')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # ----- User prices -----
+    def save_user_prices(self, user_prices: list[tuple[str, int, int]]):
+        """ Save (item_id, min_price, target_price) rows in one transaction. """
+        if not user_prices:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'REPLACE INTO ItemsOnSale (item_id, min_price, target_price) VALUES (?, ?, ?)',
+                [(int(item_id), min_price, target_price) for item_id, min_price, target_price in user_prices]
+            )
+            self._local_version += 1
+
+    def get_user_prices(self, item_ids: list[str]) -> dict[str, tuple[int, int]]:
+        """ Return user prices of given items as {item_id: (min_price, target_price)}. """
+        user_prices = {}
+        with self._lock:
+            for start in range(0, len(item_ids), MAX_QUERY_PARAMETERS):
+                ids_chunk = [int(item_id) for item_id in item_ids[start:start + MAX_QUERY_PARAMETERS]]
+                query = self._connection.execute(
+                    'SELECT item_id, min_price, target_price FROM ItemsOnSale '
+                    f'WHERE item_id IN ({",".join("?" * len(ids_chunk))})', ids_chunk
+                )
+                user_prices.update({str(row[0]): (row[1], row[2]) for row in query.fetchall()})
+        return user_prices
+
+    def get_all_user_prices(self) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            query = self._connection.execute('SELECT item_id, min_price, target_price FROM ItemsOnSale')
+            return {str(row[0]): (row[1], row[2]) for row in query.fetchall()}
+
+    def get_data_version(self) -> tuple[int, int]:
+        """ Changes whenever this or any other connection commits to the database. """
+        with self._lock:
+            data_version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+            return data_version, self._local_version
+
+    # ----- Notified sales -----
+    def get_notified_sales(self) -> dict[str, float]:
+        with self._lock:
+            query = self._connection.execute('SELECT item_id, notified_at FROM NotifiedSales')
+            return {item_id: notified_at for item_id, notified_at in query.fetchall()}
+
+    def save_notified_sales(self, item_ids: list[str], notified_at: float):
+        with self._lock, self._connection:
+            self._connection.executemany('REPLACE INTO NotifiedSales (item_id, notified_at) VALUES (?, ?)',
+                                         [(item_id, notified_at) for item_id in item_ids])
+
+    def delete_notified_sales(self, item_ids: list[str]):
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM NotifiedSales WHERE item_id = ?',
+                                         [(item_id,) for item_id in item_ids])
+
+    # ----- Undelivered notifications -----
+    def save_pending_notifications(self, sales: list[tuple[str, str, int, str, float]]):
+        """ Save (item_id, market_hash_name, price, currency, created_at) rows in one transaction. """
+        if not sales:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'REPLACE INTO PendingNotifications (item_id, market_hash_name, price, currency, created_at) '
+                'VALUES (?, ?, ?, ?, ?)', sales)
+
+    def get_pending_notifications(self) -> list[tuple[str, str, int, str, float]]:
+        """ Oldest first. """
+        with self._lock:
+            query = self._connection.execute('SELECT item_id, market_hash_name, price, currency, created_at '
+                                             'FROM PendingNotifications ORDER BY created_at, item_id')
+            return query.fetchall()
+
+    def delete_pending_notifications(self, item_ids: list[str]):
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM PendingNotifications WHERE item_id = ?',
+                                         [(item_id,) for item_id in item_ids])
+
+    # ----- Price history chunks -----
+    def save_price_chunks(self, chunks: list[tuple]):
+        """ Insert or replace (series, market_hash_name, start_time, end_time, resolution, times, prices) rows. """
+        if not chunks:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'REPLACE INTO PriceHistory (series, market_hash_name, start_time, end_time, resolution, times, prices) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', chunks
+            )
+
+    def get_price_chunks(self, series: str, market_hash_name: str, start_time: float, end_time: float) -> list[tuple]:
+        """ Return chunks overlapping [start_time, end_time] ordered by time. """
+        with self._lock:
+            query = self._connection.execute(
+                'SELECT series, market_hash_name, start_time, end_time, resolution, times, prices FROM PriceHistory '
+                'WHERE series = ? AND market_hash_name = ? AND end_time >= ? AND start_time <= ? '
+                'ORDER BY start_time', (series, market_hash_name, start_time, end_time)
+            )
+            return query.fetchall()
+
+    def get_price_chunks_to_downsample(self, end_time: float, resolution: float) -> list[tuple]:
+        """ Return chunks which ended before end_time and are stored at a finer resolution than given. """
+        with self._lock:
+            query = self._connection.execute(
+                'SELECT series, market_hash_name, start_time, end_time, resolution, times, prices FROM PriceHistory '
+                'WHERE end_time < ? AND resolution < ?', (end_time, resolution)
+            )
+            return query.fetchall()
+
+    def delete_price_chunks_before(self, end_time: float) -> int:
+        """ Delete chunks which ended before end_time. Return number of deleted chunks. """
+        with self._lock, self._connection:
+            return self._connection.execute('DELETE FROM PriceHistory WHERE end_time < ?', (end_time,)).rowcount
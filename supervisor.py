@@ -0,0 +1,222 @@
+""" Runs one MarketBot worker process per market account.
+Every worker has its own SECRET_KEY (so its own rate budget), its own database file, and takes
+lowest prices fetched by other workers from a shared store instead of requesting them again. """
+import argparse
+import multiprocessing
+import re
+import signal
+import sys
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from multiprocessing.managers import BaseManager
+from os import environ, getenv
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+logger = getLogger('market_bot')
+
+# Accounts as comma separated name=secret_key pairs
+MARKET_ACCOUNTS = getenv('MARKET_ACCOUNTS', '')
+# Names become part of database file names, so path separators and '..' are not allowed
+ACCOUNT_NAME_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+BOT_DB_DIR = getenv('BOT_DB_DIR', str(Path(__file__).parent.resolve()))
+# Lowest prices fetched by one account are reused by the others for this long
+SHARED_LOWEST_PRICES_TTL = 3.
+WORKER_RESTART_DELAY = 5
+WORKER_STOP_TIMEOUT = 30
+
+
+@dataclass(frozen=True)
+class Account:
+    name: str
+    secret_key: str
+
+    def __repr__(self):
+        return f'Account({self.name})'  # keep the key out of logs
+
+
+def parse_accounts(accounts: str) -> list[Account]:
+    """ Parse `name=key,name=key`, names must be unique and consist of letters, digits, '_' and '-'. """
+    parsed = []
+    for pair in filter(None, (pair.strip() for pair in accounts.split(','))):
+        name, separator, secret_key = pair.partition('=')
+        if not separator or not name or not secret_key:
+            raise ValueError(f'Account must be given as name=secret_key, got {name or pair!r}')
+        name = name.strip()
+        if not ACCOUNT_NAME_PATTERN.fullmatch(name):
+            raise ValueError(f'Account name may contain only letters, digits, _ and -, got {name!r}')
+        parsed.append(Account(name, secret_key.strip()))
+    names = [account.name for account in parsed]
+    if len(names) != len(set(names)):
+        raise ValueError('Account names must be unique')
+    return parsed
+
+
+class LowestPricesStore:
+    """ Lowest prices by hash name, kept in the supervisor's manager process and used by all workers.
+    Methods take and return whole batches, so a pass costs one round trip. """
+
+    def __init__(self, ttl=SHARED_LOWEST_PRICES_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._prices: dict[str, tuple[int, float]] = {}  # hash name -> (price, expire time)
+        self._lock = Lock()
+
+    def get_many(self, hash_names: list[str]) -> dict[str, int]:
+        """ Return prices that did not expire yet. """
+        now = self._clock()
+        with self._lock:
+            found = {}
+            for hash_name in hash_names:
+                entry = self._prices.get(hash_name)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._prices[hash_name]
+                    continue
+                found[hash_name] = entry[0]
+            return found
+
+    def update(self, lowest_prices: dict[str, int]):
+        expire_time = self._clock() + self.ttl
+        with self._lock:
+            for hash_name, price in lowest_prices.items():
+                self._prices[hash_name] = (price, expire_time)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._prices)
+
+
+class SharedPricesManager(BaseManager):
+    pass
+
+
+SharedPricesManager.register('LowestPricesStore', LowestPricesStore, exposed=('get_many', 'update', '__len__'))
+
+
+def get_db_path(db_dir: Path, account: Account) -> Path:
+    return Path(db_dir) / f'bot_data_{account.name}.db'
+
+
+def ignore_sigint():
+    # Ctrl+C goes to the whole process group, the supervisor stops its children itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_worker(account: Account, db_path: Path, shared_lowest_prices, stop_event, log_level: str, log_format: str):
+    """ Worker process: price update loop of one account until the supervisor sets stop_event. """
+    ignore_sigint()
+    environ['SECRET_KEY'] = account.secret_key  # read by api_requests on every request
+    # Imported here, so the key is in the env before any module reads it
+    from bot import MarketBot, price_update_loop
+    from daemon import setup_logging
+
+    setup_logging(log_level, log_format, account=account.name)
+    bot = MarketBot(db_path=db_path, shared_lowest_prices=shared_lowest_prices)
+    bot.initialize_db()
+
+    loop_stop_event, finish_event = Event(), Event()
+    loop_thread = Thread(target=price_update_loop, args=(bot, loop_stop_event, finish_event),
+                         name='price-update-loop')
+    loop_thread.start()
+    while not stop_event.wait(0.5):
+        if not loop_thread.is_alive():
+            logger.error('Price update loop exited unexpectedly')
+            sys.exit(1)
+    loop_stop_event.set()
+    loop_thread.join()
+    bot.dispatcher.shutdown()
+    bot.storage.close()
+
+
+class Supervisor:
+    """ Starts a worker process per account, restarts crashed ones, stops all of them together. """
+
+    def __init__(self, accounts: list[Account], db_dir: Path = Path(BOT_DB_DIR),
+                 log_level='INFO', log_format='json', restart_delay=WORKER_RESTART_DELAY):
+        self.accounts = accounts
+        self.db_dir = Path(db_dir)
+        self.log_level = log_level
+        self.log_format = log_format
+        self.restart_delay = restart_delay
+        # Spawned workers do not inherit threads and locks of the supervisor
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+        self._manager = None
+        self.shared_lowest_prices = None
+        self.processes: dict[str, multiprocessing.Process] = {}
+
+    def start(self):
+        self._manager = SharedPricesManager(ctx=self._context)
+        self._manager.start(initializer=ignore_sigint)
+        self.shared_lowest_prices = self._manager.LowestPricesStore()
+        for account in self.accounts:
+            self._start_worker(account)
+
+    def _start_worker(self, account: Account):
+        process = self._context.Process(
+            target=run_worker, name=f'market-bot-{account.name}',
+            args=(account, get_db_path(self.db_dir, account), self.shared_lowest_prices, self._stop_event,
+                  self.log_level, self.log_format))
+        process.start()
+        self.processes[account.name] = process
+        logger.info(f'Started worker of account {account.name}, pid {process.pid}')
+
+    def restart_dead_workers(self):
+        for account in self.accounts:
+            process = self.processes[account.name]
+            if not process.is_alive() and not self._stop_event.is_set():
+                logger.error(f'Worker of account {account.name} exited with code {process.exitcode}, restarting')
+                self._start_worker(account)
+
+    def run(self, stop_event: Event):
+        """ Supervise workers until stop_event is set, then stop them. """
+        self.start()
+        try:
+            while not stop_event.wait(self.restart_delay):
+                self.restart_dead_workers()
+        finally:
+            self.stop()
+
+    def stop(self, timeout=WORKER_STOP_TIMEOUT):
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for name, process in self.processes.items():
+            process.join(max(0., deadline - time.monotonic()))
+            if process.is_alive():
+                logger.error(f'Worker of account {name} did not stop in time, terminating')
+                process.terminate()
+                process.join()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+        logger.info('All workers stopped')
+
+
+def main(argv: list[str] = None) -> int:
+    from daemon import LOG_FORMAT, LOG_LEVEL, setup_logging
+
+    parser = argparse.ArgumentParser(description='Run MarketCSGO price bot for several accounts.')
+    parser.add_argument('--accounts', default=MARKET_ACCOUNTS, help='name=secret_key,... (env MARKET_ACCOUNTS)')
+    parser.add_argument('--db-dir', type=Path, default=Path(BOT_DB_DIR), help='(env BOT_DB_DIR)')
+    parser.add_argument('--log-level', default=LOG_LEVEL)
+    parser.add_argument('--log-format', default=LOG_FORMAT, choices=('json', 'text'))
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level, args.log_format, account='supervisor')
+
+    accounts = parse_accounts(args.accounts)
+    if not accounts:
+        logger.error('No accounts given, set MARKET_ACCOUNTS or --accounts')
+        return 2
+
+    stop_event = Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    Supervisor(accounts, args.db_dir, args.log_level, args.log_format).run(stop_event)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
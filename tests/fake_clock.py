@@ -0,0 +1,8 @@
+class FakeClock:
+    """ Clock for time-dependent classes in tests, moved by setting `now`. """
+
+    def __init__(self, now=0.):
+        self.now = now
+
+    def __call__(self):
+        return self.now
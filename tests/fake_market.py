@@ -0,0 +1,181 @@
+import json
+import random
+import re
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+from urllib.parse import urlsplit, parse_qs
+
+ON_SALE_STATUS = '1'
+
+
+def is_valid_markdown_v2(text: str) -> bool:
+    """ Rough check of Telegram's parser: special characters are escaped, bold and italic entities are closed. """
+    text = re.sub(r'\\.', '', text)
+    if re.search(r'[\[\]()~`>#+\-=|{}.!\\]', text):
+        return False
+    return text.count('*') % 2 == 0 and text.count('_') % 2 == 0
+
+
+class FakeMarket:
+    """ Local stand-in of market.csgo.com API v2 and Telegram bot API.
+    Latency, error rate and rate limit (requests/sec per key) are configurable. """
+
+    def __init__(self, latency=0., error_rate=0., rate_limit: float = None, undercut_chance=0., seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.undercut_chance = undercut_chance  # chance per items request that a name gets undercut
+        self.items: dict[str, dict] = {}  # item_id -> our listing
+        self.competitor_prices: dict[str, int] = {}  # hash name -> lowest competitor price in int format
+        self.telegram_messages: list[str] = []
+        self.truncate_prices_dump = False  # cut the dump in the middle of the last item, as a dropped connection
+        self.reject_telegram_messages = False  # answer every message with ok: false, as for a blocked bot
+        self.price_changes_count = 0
+        self.requests_count = Counter()
+        self.items_requests_times: list[float] = []
+        self._rng = random.Random(seed)
+        self._lock = Lock()
+        self._rate_window: dict[str, list[float]] = {}
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+        self.api_url = f'{self.url}/api/v2'
+
+    def start(self):
+        Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_item(self, item_id: str, market_hash_name: str, price: int, competitor_price: int,
+                 status=ON_SALE_STATUS):
+        with self._lock:
+            self.items[item_id] = {'item_id': item_id, 'market_hash_name': market_hash_name,
+                                   'price': price, 'currency': 'USD', 'status': status}
+            self.competitor_prices[market_hash_name] = competitor_price
+
+    def get_lowest_price(self, market_hash_name: str) -> int:
+        own_prices = [item['price'] for item in self.items.values() if item['market_hash_name'] == market_hash_name]
+        return min(own_prices + [self.competitor_prices.get(market_hash_name, 10 ** 9)])
+
+    def get_position(self, item: dict) -> int:
+        competitor_price = self.competitor_prices.get(item['market_hash_name'])
+        if competitor_price is None or item['price'] < competitor_price:
+            return 1
+        return 2 + self._rng.randint(0, 10)
+
+    # ----- Endpoints, return (status code, json payload) -----
+    def items_endpoint(self, query):
+        with self._lock:
+            self.items_requests_times.append(time.perf_counter())
+            for name in self.competitor_prices:
+                if self._rng.random() < self.undercut_chance:
+                    self.competitor_prices[name] = int(self.get_lowest_price(name) * 0.99)
+            items = [{**item, 'price': item['price'] / 1000, 'position': self.get_position(item)}
+                     for item in self.items.values()]
+        return 200, {'success': True, 'items': items or None}
+
+    def set_price_endpoint(self, query):
+        item_id, price = query.get('item_id', [''])[0], query.get('price', ['0'])[0]
+        with self._lock:
+            item = self.items.get(item_id)
+            if item is None or not price.isdigit():
+                return 200, {'success': False, 'error': 'bad_request'}
+            if item['price'] != int(price):
+                item['price'] = int(price)
+                self.price_changes_count += 1
+        return 200, {'success': True}
+
+    def search_list_endpoint(self, query):
+        with self._lock:
+            data = {name: [{'market_hash_name': name, 'price': str(self.get_lowest_price(name)), 'count': 1}]
+                    for name in query.get('list_hash_name[]', []) if name in self.competitor_prices}
+        return 200, {'success': True, 'currency': 'USD', 'data': data}
+
+    def search_specific_endpoint(self, query):
+        name = query.get('hash_name', [''])[0]
+        with self._lock:
+            data = [{'market_hash_name': name, 'price': self.get_lowest_price(name)}] \
+                if name in self.competitor_prices else []
+        return 200, {'success': True, 'currency': 'USD', 'data': data}
+
+    def prices_dump_endpoint(self, query):
+        with self._lock:
+            items = [{'market_hash_name': name, 'volume': '1', 'price': f'{self.get_lowest_price(name) / 1000:.3f}'}
+                     for name in self.competitor_prices]
+        dump = {'success': True, 'time': int(time.time()), 'currency': 'USD', 'items': items}
+        if self.truncate_prices_dump:
+            body = json.dumps(dump)
+            return 200, body[:body.rindex('"price"')]
+        return 200, dump
+
+    def telegram_endpoint(self, query):
+        text = query.get('text', [''])[0]
+        if self.reject_telegram_messages or (query.get('parse_mode') == ['MarkdownV2']
+                                             and not is_valid_markdown_v2(text)):
+            return 400, {'ok': False, 'error_code': 400, 'description': "Bad Request: can't parse entities"}
+        with self._lock:
+            self.telegram_messages.append(text)
+        return 200, {'ok': True, 'result': {}}
+
+    def handle(self, path: str, query: dict) -> (int, dict or str):
+        endpoints = {
+            '/api/v2/items': self.items_endpoint,
+            '/api/v2/set-price': self.set_price_endpoint,
+            '/api/v2/search-list-items-by-hash-name-all': self.search_list_endpoint,
+            '/api/v2/search-item-by-hash-name-specific': self.search_specific_endpoint,
+            '/api/v2/prices/USD.json': self.prices_dump_endpoint,
+        }
+        endpoint = endpoints.get(path)
+        if endpoint is None and path.endswith('/sendMessage'):
+            endpoint = self.telegram_endpoint
+            path = '/sendMessage'  # do not count bot tokens as different endpoints
+        if endpoint is None:
+            return 404, {'success': False, 'error': 'not_found'}
+        self.requests_count[path] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.is_rate_limited(query.get('key', [''])[0]):
+            return 429, {'success': False, 'error': 'too_many_requests'}
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return 502, '<html>Bad Gateway</html>'
+        return endpoint(query)
+
+    def is_rate_limited(self, key: str) -> bool:
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            window = [request_time for request_time in self._rate_window.get(key, []) if now - request_time < 1]
+            limited = len(window) >= self.rate_limit
+            if not limited:
+                window.append(now)
+            self._rate_window[key] = window
+        return limited
+
+    def _make_handler(self):
+        market = self
+
+        class FakeMarketHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url_parts = urlsplit(self.path)
+                status_code, payload = market.handle(url_parts.path, parse_qs(url_parts.query))
+                body = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return FakeMarketHandler
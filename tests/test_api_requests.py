@@ -1,9 +1,13 @@
 import unittest
+from unittest.mock import patch
 from api_requests import get_response_with_retries
 from api_requests import get_items_on_sale_and_pending_api
 from api_requests import set_price_api
 from api_requests import get_item_lowest_price_api
 from api_requests import get_item_lowest_price_v2_api
+from api_requests import split_hash_names_into_chunks
+from api_requests import get_lowest_prices_with_failures_api
+from api_requests import lowest_prices_cache
 from data_structures import ItemOnSale
 
 
@@ -33,5 +37,41 @@ class TestApi(unittest.TestCase):
         self.assertEqual(type(lowest_price), int)
 
 
+class TestLowestPricesBatching(unittest.TestCase):
+    def setUp(self):
+        lowest_prices_cache.clear()
+
+    def test_split_hash_names_dedupes_and_chunks(self):
+        names = [f'name {i % 7}' for i in range(30)]
+        chunks = split_hash_names_into_chunks(names, chunk_size=3)
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(sum(chunks, []), [f'name {i}' for i in range(7)], msg='Duplicates or order broken')
+
+    def test_split_hash_names_by_query_length(self):
+        names = ['★ Driver Gloves | Racing Green (Field-Tested)', '★ Hand Wraps | CAUTION! (Field-Tested)']
+        chunks = split_hash_names_into_chunks(names, chunk_size=50, max_query_length=100)
+        self.assertEqual(chunks, [[names[0]], [names[1]]], msg='Query length limit is ignored')
+
+    def test_partial_failure_is_reported(self):
+        def fake_chunk_fetch(chunk):
+            if 'bad' in chunk:
+                return None
+            return {name: 1000 for name in chunk}
+
+        names = ['good', 'bad', 'other'] * 2
+        with patch('api_requests.get_chunk_of_items_lowest_prices_api', side_effect=fake_chunk_fetch):
+            prices, failed = get_lowest_prices_with_failures_api(names, chunk_size=1)
+        self.assertEqual(prices, {'good': 1000, 'other': 1000})
+        self.assertEqual(failed, ['bad'])
+
+    def test_cached_prices_are_not_requested(self):
+        lowest_prices_cache.set('cached', 500)
+        with patch('api_requests.get_chunk_of_items_lowest_prices_api', return_value={'fresh': 700}) as fetch:
+            prices, failed = get_lowest_prices_with_failures_api(['cached', 'fresh'])
+        fetch.assert_called_once_with(['fresh'])
+        self.assertEqual(prices, {'cached': 500, 'fresh': 700})
+        self.assertEqual(lowest_prices_cache.get('fresh'), 700, msg='Fetched price is not cached')
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,4 +1,6 @@
+import time
 import unittest
+from unittest.mock import patch
 from bot import MarketBot
 from data_structures import ItemOnSale
 
@@ -35,3 +37,30 @@ class TestMarketBot(unittest.TestCase):
 
         self.assertEqual(len(bot.items), len(another_data_from_api),
                          msg='Not both old and items')
+
+    def test_lowest_prices_requested_only_for_items_to_update(self):
+        bot = MarketBot()
+        bot.update_items([ItemOnSale(f'item_id_{i}', 2, 500, 'USD', f'name {i % 3}') for i in range(6)])
+        for item in bot.items:
+            item.user_min_price, item.user_target_price = 100, 900
+        bot.items[0].last_update_time = time.time()  # second 'name 0' item is still ready
+        bot.items[1].last_update_time = time.time()
+        bot.items[4].last_update_time = time.time()  # both 'name 1' items are cooling down
+        bot.items[2].user_min_price = 0
+        bot.items[5].position = 1  # both 'name 2' items are either unset or already first
+        with patch('bot.get_dict_of_items_lowest_prices_api', return_value={}) as get_lowest_prices:
+            bot.set_user_price_for_all_items()
+        get_lowest_prices.assert_called_once_with(['name 0'])
+
+    def test_set_user_price_for_all_items(self):
+        bot = MarketBot()
+        bot.update_items([ItemOnSale(f'item_id_{i}', 2, 1200, 'USD', f'name {i}') for i in range(3)])
+        for item in bot.items:
+            item.user_min_price, item.user_target_price = 900, 1300
+        bot.items[2].user_min_price = 0
+        lowest_prices = {'name 0': 1100, 'name 1': 800, 'name 2': 1000}
+        with patch('bot.get_dict_of_items_lowest_prices_api', return_value=lowest_prices), \
+                patch('dispatcher.set_price_api', return_value=True) as set_price:
+            bot.set_user_price_for_all_items()
+        set_price.assert_called_once_with('item_id_0', 1099)
+        self.assertEqual([item.price for item in bot.items], [1099, 1200, 1200])
@@ -0,0 +1,38 @@
+import unittest
+from cache import TTLCache
+from tests.fake_clock import FakeClock
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_entry_expires_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+        cache.set('Spectrum 2 Case', 1234)
+        self.assertEqual(cache.get('Spectrum 2 Case'), 1234)
+
+        clock.now += 5
+        self.assertIsNone(cache.get('Spectrum 2 Case'), msg='Expired entry is returned')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'), msg='Recently used entry was evicted instead of the oldest one')
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_get_many(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('a', 1)
+        found, missing = cache.get_many(['a', 'b'])
+        self.assertEqual(found, {'a': 1})
+        self.assertEqual(missing, ['b'])
+        self.assertEqual(cache.stats(), {'size': 1, 'maxsize': 10, 'hits': 1, 'misses': 1, 'evictions': 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
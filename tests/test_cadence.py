@@ -0,0 +1,56 @@
+import unittest
+from threading import Event, Timer
+from cadence import CadenceController, fingerprint_items
+from data_structures import ItemOnSale
+
+
+def make_items(*prices):
+    return [ItemOnSale(str(idx), 2, price, 'USD', f'name {idx}') for idx, price in enumerate(prices)]
+
+
+class TestCadenceController(unittest.TestCase):
+    def setUp(self):
+        self.cadence = CadenceController(min_interval=0., max_interval=8., first_backoff=1., backoff_factor=2.)
+
+    def test_fingerprint_ignores_order(self):
+        items = make_items(100, 200)
+        self.assertEqual(fingerprint_items(items), fingerprint_items(items[::-1]))
+        self.assertNotEqual(fingerprint_items(items), fingerprint_items(make_items(100, 199)))
+
+    def test_quiet_passes_back_off_up_to_max(self):
+        items = make_items(100, 200)
+        intervals = []
+        for _ in range(6):
+            self.cadence.observe_inventory(items)
+            self.cadence.observe_lowest_prices({'name 0': 90})
+            intervals.append(self.cadence.end_pass())
+        self.assertEqual(intervals, [0., 1., 2., 4., 8., 8.])
+
+    def test_undercut_resets_interval(self):
+        self.cadence.observe_lowest_prices({'name 0': 90})
+        for _ in range(4):
+            self.cadence.end_pass()
+        self.assertEqual(self.cadence.interval, 4.)
+        self.cadence.observe_lowest_prices({'name 0': 89})
+        self.assertEqual(self.cadence.end_pass(), 0., msg='Undercut did not speed the loop up')
+
+    def test_set_prices_and_deferred_items_keep_loop_active(self):
+        self.cadence.end_pass()
+        self.cadence.observe_pass(set_prices_count=1, deferred_count=0)
+        self.assertEqual(self.cadence.end_pass(), 0.)
+        self.cadence.observe_pass(set_prices_count=0, deferred_count=3)
+        self.assertEqual(self.cadence.end_pass(), 0.)
+
+    def test_wait_wakes_early_and_stops(self):
+        self.cadence.interval = 10.
+        self.assertTrue(self.cadence.wait(Event(), should_wake=lambda: True))
+        self.assertEqual(self.cadence.interval, 0.)
+
+        self.cadence.interval = 10.
+        stop_event = Event()
+        Timer(0.05, stop_event.set).start()
+        self.assertFalse(self.cadence.wait(stop_event), msg='Wait did not end on stop')
+
+
+if __name__ == "__main__":
+    unittest.main()
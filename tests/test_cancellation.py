@@ -0,0 +1,27 @@
+import time
+import unittest
+from threading import Event, Timer
+from cancellation import set_cancel_event, is_cancelled, wait
+
+
+class TestCancellation(unittest.TestCase):
+    def tearDown(self):
+        set_cancel_event(None)
+
+    def test_wait_without_event_sleeps(self):
+        self.assertFalse(is_cancelled())
+        self.assertTrue(wait(0.01))
+
+    def test_wait_ends_on_cancel(self):
+        cancel_event = Event()
+        set_cancel_event(cancel_event)
+        Timer(0.05, cancel_event.set).start()
+        start = time.perf_counter()
+        self.assertFalse(wait(10), msg='Cancelled wait must return False')
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertTrue(is_cancelled())
+        self.assertFalse(wait(10), msg='Wait after cancel must return at once')
+
+
+if __name__ == "__main__":
+    unittest.main()
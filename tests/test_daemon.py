@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from daemon import JsonFormatter, parse_args
+from tests.fake_market import FakeMarket
+
+REPO_ROOT = Path(__file__).parent.parent.resolve()
+
+
+class TestDaemon(unittest.TestCase):
+    def test_no_gui_modules_are_imported(self):
+        code = ('import sys, daemon; '
+                'print(sorted(m for m in ("tkinter", "customtkinter", "prettytable", "websocket") if m in sys.modules))')
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), '[]', msg='Headless entry point loads GUI or optional modules')
+
+    def test_json_log_format(self):
+        record = logging.LogRecord('market_bot', logging.INFO, __file__, 1, 'OK - %s', ('item',), None)
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual((entry['level'], entry['message']), ('INFO', 'OK - item'))
+
+    def test_flags_override_env(self):
+        args = parse_args(['--log-format', 'text', '--metrics-port', '9100', '--db-path', 'bot.db'])
+        self.assertEqual((args.log_format, args.metrics_port, args.db_path), ('text', 9100, Path('bot.db')))
+
+    def test_sigterm_stops_loop(self):
+        market = FakeMarket().start()
+        market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = {**os.environ, 'SECRET_KEY': 'test-key', 'MARKET_API_URL': market.api_url,
+                   'TELEGRAM_API_URL': market.url}
+            process = subprocess.Popen(
+                [sys.executable, 'daemon.py', '--db-path', str(Path(tmp_dir) / 'bot_data.db')],
+                cwd=REPO_ROOT, env=env, stderr=subprocess.PIPE, text=True)
+            try:
+                deadline = time.monotonic() + 10
+                while not market.items_requests_times and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                process.send_signal(signal.SIGTERM)
+                _, stderr = process.communicate(timeout=15)
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                market.stop()
+        self.assertEqual(process.returncode, 0)
+        messages = [json.loads(line)['message'] for line in stderr.splitlines()]
+        self.assertIn('Stopped', messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
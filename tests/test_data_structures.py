@@ -0,0 +1,45 @@
+import unittest
+from data_structures import ItemOnSale, ItemStore
+
+
+class TestItemStore(unittest.TestCase):
+    def test_lookup_by_id_and_hash_name(self):
+        store = ItemStore([ItemOnSale(f'{i}', 2, 500, 'USD', f'name {i % 2}') for i in range(4)])
+        self.assertEqual(store.get('2').item_id, '2')
+        self.assertIsNone(store.get('missing'))
+        self.assertEqual([item.item_id for item in store.get_by_hash_name('name 1')], ['1', '3'])
+        self.assertEqual(store.hash_names(), ['name 0', 'name 1'])
+        self.assertEqual(store.ids(), ['0', '1', '2', '3'], msg='Insertion order is not kept')
+
+    def test_merge_updates_in_place(self):
+        store = ItemStore([ItemOnSale(f'{i}', 2, 500, 'USD', 'name') for i in range(3)])
+        kept_item = store.get('1')
+        kept_item.user_min_price, kept_item.user_target_price, kept_item.last_update_time = 100, 900, 5.
+
+        store.merge([ItemOnSale('1', 1, 450, 'USD', 'name'), ItemOnSale('5', 3, 700, 'USD', 'other')])
+        self.assertEqual(store.ids(), ['1', '5'])
+        self.assertIs(store.get('1'), kept_item, msg='Known item was reallocated')
+        self.assertEqual((kept_item.position, kept_item.price), (1, 450))
+        self.assertEqual((kept_item.user_min_price, kept_item.user_target_price, kept_item.last_update_time),
+                         (100, 900, 5.))
+        self.assertEqual(store.get_by_hash_name('name'), [kept_item], msg='Removed item is still indexed')
+
+    def test_behaves_like_list(self):
+        store = ItemStore()
+        self.assertEqual(store, [])
+        self.assertFalse(store)
+        store.add(ItemOnSale('1', 2, 500, 'USD', 'name'))
+        self.assertEqual(store[0], ItemOnSale('1', 2, 500, 'USD', 'name'))
+        self.assertIn(ItemOnSale('1', 2, 500, 'USD', 'name'), store)
+        self.assertNotIn(ItemOnSale('1', 2, 450, 'USD', 'name'), store)
+        self.assertNotIn('1', store, msg='Membership is checked by item_id, not by item')
+        self.assertEqual(len(store), 1)
+
+        store.add(ItemOnSale('2', 3, 500, 'USD', 'name'))
+        self.assertEqual(store[-1].item_id, '2', msg='Index is not updated after add')
+        store.remove('1')
+        self.assertEqual([store[0].item_id], ['2'], msg='Index is not updated after remove')
+
+
+if __name__ == "__main__":
+    unittest.main()
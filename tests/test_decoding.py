@@ -0,0 +1,82 @@
+import json
+import unittest
+from unittest.mock import patch
+import decoding
+from decoding import (DecodeError, loads, parse_usd_price, parse_int_price, decode_items, decode_lowest_prices,
+                      decode_specific_lowest_price)
+from metrics import decode_rejected_total
+
+
+def make_item(item_id='101', price=1.199, status='1', **fields):
+    return {'item_id': item_id, 'market_hash_name': 'Spectrum 2 Case', 'price': price, 'currency': 'USD',
+            'position': 2, 'status': status, **fields}
+
+
+class TestPriceParsing(unittest.TestCase):
+    def test_usd_price_is_exact(self):
+        self.assertEqual(int(2.01 * 1000), 2009, msg='Float arithmetic is no longer off, the test is moot')
+        self.assertEqual(parse_usd_price(2.01), 2010)
+        self.assertEqual(parse_usd_price(loads(b'[1.005]')[0]), 1005)
+        self.assertEqual(parse_usd_price('12345.678'), 12345678)
+        self.assertEqual(parse_usd_price(2), 2000)
+        self.assertEqual(parse_usd_price(1.5), 1500)
+
+    def test_invalid_usd_prices(self):
+        for value in ('-1.5', '1.2345', 'abc', '', None, True, '1e3', '١٢'):
+            with self.assertRaises(DecodeError, msg=f'{value!r} is accepted'):
+                parse_usd_price(value)
+
+    def test_int_price(self):
+        self.assertEqual(parse_int_price('1199'), 1199)
+        self.assertEqual(parse_int_price(1199), 1199)
+        for value in ('11.99', '-1', 1.5, None, False):
+            with self.assertRaises(DecodeError, msg=f'{value!r} is accepted'):
+                parse_int_price(value)
+
+
+class TestPayloadDecoding(unittest.TestCase):
+    def test_items_are_rejected_one_by_one(self):
+        payload = {'success': True, 'items': [
+            make_item('101'),
+            make_item('102', price='free'),
+            make_item('103', status='2'),
+            {'item_id': '104'},
+            'not an item',
+        ]}
+        rejected_count = decode_rejected_total.value(endpoint='items')
+        with self.assertLogs('market_bot', 'INFO'):
+            items_on_sale, items_pending = decode_items(payload)
+        self.assertEqual([(item.item_id, item.price) for item in items_on_sale], [('101', 1199)])
+        self.assertEqual([item.item_id for item in items_pending], ['103'])
+        self.assertEqual(decode_rejected_total.value(endpoint='items'), rejected_count + 3)
+
+    def test_empty_items(self):
+        self.assertEqual(decode_items({'success': True, 'items': None}), ([], []))
+
+    def test_lowest_prices(self):
+        payload = {'success': True, 'data': {
+            'Spectrum 2 Case': [{'price': '1199'}, {'price': '1300'}],
+            'Clutch Case': [],
+            'Broken Case': [{'price': 'n/a'}],
+        }}
+        with self.assertLogs('market_bot', 'INFO'):
+            self.assertEqual(decode_lowest_prices(payload), {'Spectrum 2 Case': 1199})
+        self.assertEqual(decode_specific_lowest_price({'success': True, 'data': [{'price': 650}]}), 650)
+        self.assertEqual(decode_specific_lowest_price({'success': True, 'data': []}), 0)
+
+    def test_backends_agree(self):
+        document = json.dumps({'success': True, 'items': [make_item(str(idx), price=round(1 + idx / 1000, 3))
+                                                          for idx in range(1000)]}).encode()
+        with patch('decoding.orjson', None):
+            stdlib_items = decode_items(loads(document))
+            with self.assertRaises(json.JSONDecodeError):
+                loads(b'<html>Bad Gateway</html>')
+        self.assertEqual(decode_items(loads(document)), stdlib_items,
+                         msg=f'{decoding.JSON_BACKEND} backend decodes differently')
+        self.assertEqual(stdlib_items[0][999].price, 1999)
+        with self.assertRaises(json.JSONDecodeError):
+            loads(b'<html>Bad Gateway</html>')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import time
+import unittest
+from unittest.mock import patch
+from data_structures import ItemOnSale
+from dispatcher import SetPriceDispatcher, PriceChange
+
+
+def slow_set_price(item_id, price):
+    time.sleep(0.05)
+    return item_id != 'bad'
+
+
+class TestSetPriceDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = SetPriceDispatcher(max_workers=4)
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+
+    def test_results_are_applied_to_items(self):
+        good_item = ItemOnSale('good', 3, 1000, 'USD', 'name')
+        bad_item = ItemOnSale('bad', 3, 1000, 'USD', 'name')
+        with patch('dispatcher.set_price_api', side_effect=slow_set_price):
+            statuses = self.dispatcher.dispatch([PriceChange(good_item, 900), PriceChange(bad_item, 900)])
+        self.assertEqual(statuses, [True, False])
+        self.assertEqual(good_item.price, 900)
+        self.assertGreater(good_item.last_update_time, 0)
+        self.assertEqual((bad_item.price, bad_item.last_update_time), (1000, 0.), msg='Failed change was applied')
+
+    def test_changes_are_sent_concurrently(self):
+        price_changes = [PriceChange(ItemOnSale(f'{i}', 3, 1000, 'USD', 'name'), 900) for i in range(8)]
+        with patch('dispatcher.set_price_api', side_effect=slow_set_price):
+            self.dispatcher.dispatch(price_changes)
+        # 8 requests by 0.05 s in 4 workers
+        self.assertLess(self.dispatcher.last_pass_seconds, 0.3)
+        self.assertEqual(self.dispatcher.last_pass_size, 8)
+
+    def test_empty_pass(self):
+        self.assertEqual(self.dispatcher.dispatch([]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from threading import Event, Thread, Timer
+from unittest.mock import patch
+import api_requests
+from api_requests import get_items_on_sale_and_pending_api
+from api_requests import set_price_api
+from api_requests import get_dict_of_items_lowest_prices_api
+from api_requests import get_item_lowest_price_api
+from api_requests import get_item_lowest_price_v2_api
+from api_requests import send_telegram_message
+from api_requests import get_response_with_retries
+from api_requests import refresh_prices_dump_index_api
+from bot import MarketBot, price_update_loop, MAX_STOP_SECONDS
+from cadence import CadenceController
+from cancellation import set_cancel_event
+from price_index import PriceDumpIndex
+from rate_limiter import reset_rate_limiters, get_rate_limiter_for_url
+from resilience import reset_circuit_breakers, get_circuit_breaker, STATE_OPEN, STATE_CLOSED
+from tests.fake_market import FakeMarket
+
+
+class FakeMarketTestCase(unittest.TestCase):
+    market_options = {}
+
+    def setUp(self):
+        self.market = FakeMarket(**self.market_options).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch('api_requests.MARKET_API_URL', self.market.api_url),
+            patch('api_requests.TELEGRAM_API_URL', self.market.url),
+            patch('api_requests.prices_dump_index', PriceDumpIndex(Path(self.tmp_dir.name) / 'prices.idx')),
+            patch('api_requests._prices_dump_refresh_time', None),
+            patch.dict(os.environ, {'SECRET_KEY': 'test-key', 'TELEGRAM_BOT_TOKEN': 'token'}),
+        ]
+        for p in self.patches:
+            p.start()
+        reset_rate_limiters()
+        reset_circuit_breakers()
+        api_requests.lowest_prices_cache.clear()
+
+    def tearDown(self):
+        api_requests.prices_dump_index.close()
+        for p in reversed(self.patches):
+            p.stop()
+        self.market.stop()
+        self.tmp_dir.cleanup()
+
+
+class TestApiAgainstFakeMarket(FakeMarketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        self.market.add_item('102', 'Clutch Case', price=500, competitor_price=700)
+        self.market.add_item('103', 'Clutch Case', price=650, competitor_price=700, status='2')
+
+    def test_items_on_sale_and_pending(self):
+        items_on_sale, items_pending = get_items_on_sale_and_pending_api()
+        self.assertEqual([(item.item_id, item.price) for item in items_on_sale], [('101', 1500), ('102', 500)])
+        self.assertEqual([item.item_id for item in items_pending], ['103'])
+        self.assertEqual(items_on_sale[1].position, 1)
+
+    def test_item_prices_are_exact(self):
+        self.market.add_item('104', 'Revolution Case', price=2010, competitor_price=2500)
+        items_on_sale, _ = get_items_on_sale_and_pending_api()
+        self.assertEqual(items_on_sale[-1].price, 2010, msg='2.01 USD is converted with float error')
+
+    def test_set_price(self):
+        self.assertTrue(set_price_api('101', 1199))
+        self.assertEqual(self.market.items['101']['price'], 1199)
+        self.assertFalse(set_price_api('999', 1199))
+
+    def test_lowest_prices(self):
+        self.assertEqual(get_dict_of_items_lowest_prices_api(['Spectrum 2 Case', 'Clutch Case', 'Unknown']),
+                         {'Spectrum 2 Case': 1200, 'Clutch Case': 500})
+        self.assertEqual(get_item_lowest_price_v2_api('Spectrum 2 Case'), 1200)
+
+    def test_lowest_price_from_dump(self):
+        self.assertEqual(get_item_lowest_price_api('Clutch Case'), 500)
+        self.assertEqual(get_item_lowest_price_api('Spectrum 2 Case'), 1200)
+        self.assertEqual(self.market.requests_count['/api/v2/prices/USD.json'], 1, msg='Dump is downloaded twice')
+
+    def test_truncated_dump_keeps_old_index(self):
+        self.assertTrue(refresh_prices_dump_index_api())
+        self.market.competitor_prices['Spectrum 2 Case'] = 900
+        self.market.truncate_prices_dump = True
+        self.assertFalse(refresh_prices_dump_index_api(), msg='Truncated dump is indexed')
+
+        with patch('api_requests.PRICES_DUMP_MAX_AGE', 0):
+            self.assertEqual(get_item_lowest_price_api('Spectrum 2 Case'), 1200, msg='Old index is replaced')
+            self.assertEqual(get_item_lowest_price_api('Clutch Case'), 500)
+        self.assertEqual(self.market.requests_count['/api/v2/prices/USD.json'], 2,
+                         msg='Dump is downloaded again right after a failed refresh')
+
+    def test_send_telegram_message(self):
+        self.assertTrue(send_telegram_message('Item was sold'))
+        self.assertEqual(self.market.telegram_messages, ['Item was sold'])
+
+
+class TestRateLimitedFakeMarket(FakeMarketTestCase):
+    market_options = {'rate_limit': 2}
+
+    def test_rate_limit_slows_client_down(self):
+        request_url = f'{self.market.api_url}/items?key=test-key'
+        statuses = [get_response_with_retries(request_url, 0).status_code for _ in range(4)]
+        self.assertIn(429, statuses)
+        self.assertLess(get_rate_limiter_for_url(request_url).rate, 5, msg='Rate is not lowered after 429')
+
+
+class TestFailingFakeMarket(FakeMarketTestCase):
+    market_options = {'error_rate': 1.}
+
+    def test_server_errors(self):
+        with patch('api_requests.SLEEP_ON_RETRY', 0):
+            self.assertFalse(set_price_api('101', 1000))
+        self.assertEqual(self.market.requests_count['/api/v2/set-price'], 1)
+
+    def test_failed_dump_refresh_is_not_repeated_on_every_lookup(self):
+        with patch('api_requests.SLEEP_ON_RETRY', 0):
+            self.assertEqual(get_item_lowest_price_api('Clutch Case'), 0)
+            self.assertEqual(get_item_lowest_price_api('Clutch Case'), 0)
+        self.assertEqual(self.market.requests_count['/api/v2/prices/USD.json'], 1,
+                         msg='Dump is downloaded again right after a failed refresh')
+
+        self.market.error_rate = 0.
+        self.market.add_item('101', 'Clutch Case', price=650, competitor_price=500)
+        with patch('api_requests.PRICES_DUMP_RETRY_DELAY', 0):
+            self.assertEqual(get_item_lowest_price_api('Clutch Case'), 500)
+
+    def test_breaker_fails_fast_and_recovers(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        breaker = get_circuit_breaker('set-price')
+        breaker.recovery_seconds = 0.2
+        for _ in range(breaker.failure_threshold + 3):
+            self.assertFalse(set_price_api('101', 1199))
+        self.assertEqual(breaker.state, STATE_OPEN)
+        self.assertEqual(self.market.requests_count['/api/v2/set-price'], breaker.failure_threshold,
+                         msg='Requests were sent while the breaker was open')
+
+        self.market.error_rate = 0.
+        time.sleep(0.2)
+        self.assertTrue(set_price_api('101', 1199), msg='Probe request did not go through')
+        self.assertEqual(breaker.state, STATE_CLOSED)
+
+
+class TestLoopAgainstFakeMarket(FakeMarketTestCase):
+    def test_one_loop_iteration(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        self.market.add_item('103', 'Clutch Case', price=650, competitor_price=700, status='2')
+        bot = MarketBot()
+        bot.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+        bot.save_item_user_prices_to_db('101', 1000, 2000)
+
+        stop_event, finish_event = Event(), Event()
+        price_update_loop(bot, stop_event, finish_event, max_iterations=1)
+        bot.storage.close()
+
+        self.assertTrue(finish_event.is_set())
+        self.assertEqual(self.market.items['101']['price'], 1199)
+        self.assertEqual(len(self.market.telegram_messages), 1)
+
+
+class TestLoopCadenceAgainstFakeMarket(FakeMarketTestCase):
+    def test_quiet_market_backs_off_and_undercut_speeds_up(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        bot = MarketBot()
+        bot.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+        bot.ITEM_UPDATE_COOL_DOWN_SECONDS = 0
+        bot.cadence = CadenceController(first_backoff=0.2, max_interval=0.8)
+        bot.save_item_user_prices_to_db('101', 1000, 2000)
+
+        stop_event, finish_event = Event(), Event()
+        loop_thread = Thread(target=price_update_loop, args=(bot, stop_event, finish_event), daemon=True)
+        loop_thread.start()
+        try:
+            time.sleep(1.2)
+            # First item is cheapest after the first pass, then nothing changes
+            self.assertEqual(self.market.items['101']['price'], 1199)
+            self.assertLessEqual(self.market.requests_count['/api/v2/items'], 5, msg='Quiet market is polled hot')
+            self.assertGreater(bot.cadence.interval, 0.)
+
+            undercut_time = time.monotonic()
+            with self.market._lock:
+                self.market.competitor_prices['Spectrum 2 Case'] = 1100
+            # Lowest prices seen before the undercut can still be cached
+            reaction_bound = bot.cadence.max_interval + api_requests.LOWEST_PRICES_CACHE_TTL + 0.5
+            while self.market.items['101']['price'] != 1099 and time.monotonic() - undercut_time < reaction_bound:
+                time.sleep(0.01)
+            self.assertEqual(self.market.items['101']['price'], 1099, msg='Undercut was not answered in time')
+        finally:
+            stop_event.set()
+            finish_event.wait(MAX_STOP_SECONDS)
+            bot.storage.close()
+
+
+class TestLoopStopAgainstSlowFakeMarket(FakeMarketTestCase):
+    market_options = {'latency': 1.}
+
+    def stop_loop_when(self, bot: MarketBot, condition) -> float:
+        """ Run the loop, set stop_event once condition() is true. Return seconds until finish_event. """
+        stop_event, finish_event = Event(), Event()
+        loop_thread = Thread(target=price_update_loop, args=(bot, stop_event, finish_event), daemon=True)
+        loop_thread.start()
+        deadline = time.monotonic() + 10
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition(), msg='Loop did not reach the stop point')
+        stop_start = time.perf_counter()
+        stop_event.set()
+        finish_event.wait(MAX_STOP_SECONDS)
+        stop_seconds = time.perf_counter() - stop_start
+        loop_thread.join(1)
+        bot.storage.close()
+        self.assertTrue(finish_event.is_set(), msg=f'Loop did not stop in {MAX_STOP_SECONDS} s')
+        self.assertFalse(stop_event.is_set(), msg='Stop event is not cleared for a restart')
+        return stop_seconds
+
+    def test_stop_during_slow_request(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        bot = MarketBot()
+        bot.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+        bot.save_item_user_prices_to_db('101', 1000, 2000)
+
+        # Items request is in flight, it takes a second
+        stop_seconds = self.stop_loop_when(bot, lambda: self.market.requests_count['/api/v2/items'] == 1)
+        self.assertLess(stop_seconds, self.market.latency + 0.5, msg='Stop waited for more than the request')
+        self.assertEqual(self.market.requests_count['/api/v2/search-list-items-by-hash-name-all'], 0,
+                         msg='Loop went on to the next phase after stop')
+        self.assertEqual(self.market.items['101']['price'], 1500)
+
+    def test_stop_during_retry_pause(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        self.market.rate_limit = 0  # every request is answered with 429
+        self.market.latency = 0.
+        bot = MarketBot()
+        bot.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+
+        # Rate-limited request waits before retry, the pause must end on stop
+        with patch('api_requests.get_backoff_delay', return_value=60.):
+            stop_seconds = self.stop_loop_when(bot, lambda: self.market.requests_count['/api/v2/items'] == 1)
+        self.assertLess(stop_seconds, 0.5)
+
+    def test_retry_pause_is_cancelled(self):
+        self.market.rate_limit = 0  # every request is answered with 429
+        self.market.latency = 0.
+        cancel_event = Event()
+        set_cancel_event(cancel_event)
+        self.addCleanup(set_cancel_event, None)
+        Timer(0.2, cancel_event.set).start()
+
+        start = time.perf_counter()
+        with patch('api_requests.get_backoff_delay', return_value=60.):
+            response = get_response_with_retries(f'{self.market.api_url}/items?key=test-key', 5)
+        self.assertIsNone(response)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
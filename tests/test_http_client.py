@@ -0,0 +1,26 @@
+import unittest
+from http_client import create_session, get_session, configure_session, close_session
+
+
+class TestHttpClient(unittest.TestCase):
+    def tearDown(self):
+        close_session()
+
+    def test_get_session_is_shared(self):
+        self.assertIs(get_session(), get_session(), msg='Session is not reused between calls')
+
+    def test_configure_session_pool_limits(self):
+        session = configure_session(pool_connections=2, pool_maxsize=3)
+        adapter = session.get_adapter('https://market.csgo.com/api/v2/items')
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertIs(get_session(), session, msg='Configured session is not shared')
+
+    def test_create_session_mounts_both_schemes(self):
+        session = create_session(pool_maxsize=5)
+        self.assertIs(session.get_adapter('http://127.0.0.1'), session.get_adapter('https://127.0.0.1'))
+        session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
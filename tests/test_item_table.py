@@ -0,0 +1,62 @@
+import unittest
+from data_structures import ItemOnSale
+from item_table import ItemTableModel, TableViewport, FrameTimer, TABLE_HEADER
+
+
+def make_items(count: int) -> list[ItemOnSale]:
+    return [ItemOnSale(f'item_id_{i}', 2, 1000 + i, 'USD', f'name {i}') for i in range(count)]
+
+
+class TestItemTable(unittest.TestCase):
+    def test_only_changed_rows_are_updated(self):
+        items = make_items(100)
+        model = ItemTableModel()
+        self.assertEqual(model.update(items), 100)
+        self.assertEqual(model.update(items), 0)
+
+        items[5].price, items[70].user_min_price = 2000, 900
+        self.assertEqual(model.update(items), 2)
+        self.assertIn('2.000 USD', model.get_rows(5, 1)[0])
+        self.assertEqual(len(model.get_rows(0, 1)[0]), len(TABLE_HEADER), msg='Row does not fit header columns')
+
+        self.assertEqual(model.update(items[:90]), 10)
+        self.assertEqual((len(model), model.item_ids[-1]), (90, 'item_id_89'))
+
+    def test_viewport_writes_only_changed_visible_lines(self):
+        items = make_items(100)
+        model = ItemTableModel()
+        model.update(items)
+        viewport = TableViewport(model, height=10)
+        self.assertEqual([line for line, _ in viewport.get_line_updates()], list(range(10)))
+        self.assertEqual(viewport.get_line_updates(), [])
+
+        items[3].position, items[50].position = 7, 7  # the second one is not visible
+        model.update(items)
+        self.assertEqual([line for line, _ in viewport.get_line_updates()], [3])
+
+        viewport.scroll_to(45)
+        viewport.get_line_updates()
+        self.assertEqual(viewport.get_row_at_line(5), 50)
+        self.assertEqual(viewport.get_scroll_fractions(), (0.45, 0.55))
+
+        viewport.scroll_by(1000)
+        self.assertEqual(viewport.first_row, 90, msg='Scrolled past the last page')
+
+    def test_empty_table_text(self):
+        model = ItemTableModel()
+        viewport = TableViewport(model, height=5, empty_text='empty\ntable')
+        self.assertEqual(viewport.get_line_updates(), [(0, 'empty'), (1, 'table')])
+        model.update(make_items(1))
+        self.assertEqual(len(viewport.get_line_updates()), 2)
+        self.assertIsNone(viewport.get_row_at_line(1))
+
+    def test_frame_timer(self):
+        timer = FrameTimer(budget_seconds=0.01)
+        self.assertTrue(timer.record(0.005))
+        self.assertFalse(timer.record(0.02))
+        self.assertEqual(timer.over_budget_count, 1)
+        self.assertEqual(timer.percentile(0.99), 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
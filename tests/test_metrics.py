@@ -0,0 +1,124 @@
+import unittest
+from pathlib import Path
+from threading import Event
+from unittest.mock import patch
+from requests import get
+from metrics import MetricsRegistry, get_endpoint_name, start_metrics_server, parse_port
+from metrics import registry, http_request_seconds, http_failures_total, reprice_outcomes_total, loop_iterations_total
+from api_requests import set_price_api
+from bot import MarketBot, price_update_loop
+from tests.test_fake_market import FakeMarketTestCase
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter('requests_total', 'Requests.', ('endpoint',))
+        counter.inc(endpoint='items')
+        counter.inc(2, endpoint='items')
+        self.assertEqual(counter.value(endpoint='items'), 3)
+        self.assertEqual(counter.value(endpoint='set-price'), 0)
+        self.assertIs(self.registry.counter('requests_total', 'Requests.', ('endpoint',)), counter,
+                      msg='Same metric is registered twice')
+        with self.assertRaises(ValueError):
+            counter.inc(status='200')
+
+    def test_histogram_render(self):
+        histogram = self.registry.histogram('latency_seconds', 'Latency.', ('endpoint',), buckets=(0.1, 1.))
+        for value in (0.05, 0.5, 0.7, 3.):
+            histogram.observe(value, endpoint='items')
+        text = self.registry.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{endpoint="items",le="0.1"} 1\n', text)
+        self.assertIn('latency_seconds_bucket{endpoint="items",le="1.0"} 3\n', text)
+        self.assertIn('latency_seconds_bucket{endpoint="items",le="+Inf"} 4\n', text, msg='Buckets are not cumulative')
+        self.assertIn('latency_seconds_count{endpoint="items"} 4\n', text)
+        self.assertAlmostEqual(histogram.sum(endpoint='items'), 4.25)
+
+    def test_gauge(self):
+        gauge = self.registry.gauge('interval_seconds', 'Interval.')
+        gauge.set(4.)
+        gauge.set(0.5)
+        self.assertEqual(gauge.value(), 0.5)
+        self.assertIn('# TYPE interval_seconds gauge\ninterval_seconds 0.5\n', self.registry.render())
+        with self.assertRaises(ValueError):
+            self.registry.counter('interval_seconds', 'Interval.')
+
+    def test_label_values_are_escaped(self):
+        counter = self.registry.counter('errors_total', 'Errors.', ('error',))
+        counter.inc(error='bad "quote"\n')
+        self.assertIn(r'errors_total{error="bad \"quote\"\n"} 1', self.registry.render())
+
+    def test_reset(self):
+        counter = self.registry.counter('requests_total', 'Requests.')
+        counter.inc()
+        self.registry.reset()
+        self.assertEqual(counter.value(), 0)
+
+    def test_endpoint_name(self):
+        self.assertEqual(get_endpoint_name('https://market.csgo.com/api/v2/items?key=secret'), 'items')
+        self.assertEqual(get_endpoint_name('https://api.telegram.org/bottoken/sendMessage?text=hi'), 'sendMessage')
+
+    def test_scrape_endpoint(self):
+        self.registry.counter('requests_total', 'Requests.').inc()
+        server = start_metrics_server(port=0, metrics_registry=self.registry)
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}'
+            response = get(f'{url}/metrics', timeout=5)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('requests_total 1\n', response.text)
+            self.assertEqual(get(f'{url}/other', timeout=5).status_code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_parse_port(self):
+        self.assertEqual(parse_port('9100', 'METRICS_PORT'), 9100)
+        self.assertIsNone(parse_port(None, 'METRICS_PORT'))
+        with self.assertLogs('market_bot', 'WARNING'):
+            self.assertIsNone(parse_port('nine', 'METRICS_PORT'), msg='Invalid port is not ignored')
+
+    def test_disabled_without_port(self):
+        self.assertIsNone(start_metrics_server(port=None))
+
+
+class TestInstrumentation(FakeMarketTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def tearDown(self):
+        registry.reset()
+        super().tearDown()
+
+    def test_requests_are_measured(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        set_price_api('101', 1199)
+        self.assertEqual(http_request_seconds.count(endpoint='set-price', status='200'), 1)
+
+        self.market.error_rate = 1.
+        with patch('api_requests.SLEEP_ON_RETRY', 0):
+            set_price_api('101', 1198)
+        self.assertEqual(http_request_seconds.count(endpoint='set-price', status='502'), 1)
+        self.assertEqual(http_failures_total.value(endpoint='set-price'), 0, msg='Response is counted as failure')
+
+    def test_loop_outcomes_are_counted(self):
+        self.market.add_item('101', 'Spectrum 2 Case', price=1500, competitor_price=1200)
+        self.market.add_item('102', 'Clutch Case', price=500, competitor_price=700)
+        bot = MarketBot()
+        bot.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+        bot.save_item_user_prices_to_db('101', 1000, 2000)
+
+        stop_event, finish_event = Event(), Event()
+        price_update_loop(bot, stop_event, finish_event, max_iterations=1)
+        bot.storage.close()
+
+        self.assertEqual(loop_iterations_total.value(), 1)
+        self.assertEqual(reprice_outcomes_total.value(outcome='ok'), 1)
+        self.assertEqual(reprice_outcomes_total.value(outcome='pass_unset'), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
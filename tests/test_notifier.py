@@ -0,0 +1,122 @@
+import time
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+from data_structures import ItemOnSale
+from notifier import SaleNotifier, format_sales_message
+from storage import BotStorage
+from tests.fake_market import is_valid_markdown_v2
+from tests.test_fake_market import FakeMarketTestCase
+
+
+def make_sales(count: int) -> list[ItemOnSale]:
+    return [ItemOnSale(str(100 + i), 1, 1000 + i, 'USD', f'Case {i}') for i in range(count)]
+
+
+class TestFormatSalesMessage(unittest.TestCase):
+    def test_single_sale(self):
+        message = format_sales_message([('101', 'Clutch Case', 650, 'USD', 0.)])
+        self.assertEqual(message, 'An Item was bought from you on MarketCSGO\\. '
+                                  'To receive *0\\.650 USD* transfer _Clutch Case_ to the buyer\\.')
+
+    def test_several_sales(self):
+        sales = [('101', 'Clutch Case', 650, 'USD', 0.), ('102', 'Revolution Case', 2010, 'USD', 0.)]
+        self.assertEqual(format_sales_message(sales, markdown=False).splitlines(),
+                         ['2 items were bought from you on MarketCSGO. Transfer them to the buyers:',
+                          '- Clutch Case for 0.650 USD',
+                          '- Revolution Case for 2.010 USD'])
+        self.assertEqual(format_sales_message(sales).splitlines()[1:], ['\\- _Clutch Case_ for *0\\.650 USD*',
+                                                                       '\\- _Revolution Case_ for *2\\.010 USD*'])
+
+    def test_hash_names_are_escaped(self):
+        hash_name = 'StatTrak™ M4A1-S | Player_Two [x] *1* `a`'
+        message = format_sales_message([('101', hash_name, 650, 'USD', 0.)])
+        self.assertIn('_StatTrak™ M4A1\\-S \\| Player\\_Two \\[x\\] \\*1\\* \\`a\\`_', message)
+        self.assertTrue(is_valid_markdown_v2(message), msg=message)
+
+
+class TestSaleNotifierAgainstFakeMarket(FakeMarketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+        self.storage = BotStorage(self.db_path)
+
+    def tearDown(self):
+        self.storage.close()
+        super().tearDown()
+
+    def wait_messages(self, count: int, timeout=3.):
+        deadline = time.monotonic() + timeout
+        while len(self.market.telegram_messages) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    def test_burst_is_one_message(self):
+        self.market.latency = 0.5
+        notifier = SaleNotifier(self.storage, coalesce_seconds=0.2)
+        notifier.start()
+        start_time = time.monotonic()
+        for item in make_sales(3):
+            notifier.notify_sales([item])
+        self.assertLess(time.monotonic() - start_time, 0.1, msg='notify_sales waited for Telegram')
+        self.wait_messages(1)
+        notifier.stop()
+
+        self.assertEqual(len(self.market.telegram_messages), 1, msg='Burst of sales was not coalesced')
+        for i in range(3):
+            self.assertIn(f'Case {i}', self.market.telegram_messages[0])
+        self.assertEqual(self.storage.get_pending_notifications(), [])
+
+    def test_undelivered_sales_survive_restart(self):
+        self.market.error_rate = 1.
+        notifier = SaleNotifier(self.storage, coalesce_seconds=0.)
+        notifier.start()
+        notifier.notify_sales(make_sales(2))
+        time.sleep(0.2)
+        notifier.stop()
+        self.assertEqual(self.market.telegram_messages, [])
+        self.assertEqual(len(self.storage.get_pending_notifications()), 2, msg='Undelivered sales were lost')
+
+        self.market.error_rate = 0.
+        self.storage.close()
+        self.storage = BotStorage(self.db_path)
+        notifier = SaleNotifier(self.storage, coalesce_seconds=0.)
+        notifier.start()
+        self.wait_messages(1)
+        notifier.stop()
+
+        self.assertEqual(len(self.market.telegram_messages), 1)
+        self.assertIn('2 items were bought', self.market.telegram_messages[0])
+        self.assertEqual(self.storage.get_pending_notifications(), [])
+
+    def test_rejected_markdown_is_sent_as_plain_text(self):
+        notifier = SaleNotifier(self.storage, coalesce_seconds=0.)
+        with patch('notifier.escape_markdown', str):  # markup Telegram can not parse
+            notifier.notify_sales([ItemOnSale('101', 1, 650, 'USD', 'Player_Two [x]')])
+            notifier.start()
+            self.wait_messages(1)
+            notifier.stop()
+
+        self.assertEqual(self.market.telegram_messages, ['An Item was bought from you on MarketCSGO. '
+                                                         'To receive 0.650 USD transfer Player_Two [x] to the buyer.'])
+        self.assertEqual(self.storage.get_pending_notifications(), [])
+
+    def test_rejected_message_does_not_block_queue(self):
+        self.market.reject_telegram_messages = True
+        notifier = SaleNotifier(self.storage, coalesce_seconds=0.)
+        notifier.start()
+        notifier.notify_sales(make_sales(2))
+        deadline = time.monotonic() + 3
+        while self.storage.get_pending_notifications() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.storage.get_pending_notifications(), [], msg='Rejected message is retried')
+
+        self.market.reject_telegram_messages = False
+        notifier.notify_sales(make_sales(1))
+        self.wait_messages(1)
+        notifier.stop()
+        self.assertEqual(len(self.market.telegram_messages), 1)
+        self.assertIn('Case 0', self.market.telegram_messages[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
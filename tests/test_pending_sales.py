@@ -0,0 +1,54 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from pending_sales import PendingSalesTracker
+from data_structures import ItemOnSale
+from storage import BotStorage
+
+
+class TestPendingSalesTracker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = BotStorage(Path(self.tmp_dir.name) / 'bot_data.db')
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_changed_price_or_position_is_not_new_sale(self):
+        tracker = PendingSalesTracker(self.storage)
+        item = ItemOnSale('101', 1, 500, 'USD', 'Spectrum 2 Case')
+        self.assertEqual(tracker.select_new([item, item]), [item], msg='Same sale selected twice')
+        tracker.mark_notified([item.item_id])
+
+        same_sale = ItemOnSale('101', 0, 450, 'USD', 'Spectrum 2 Case')
+        self.assertEqual(tracker.select_new([same_sale]), [])
+
+    def test_notified_state_survives_restart(self):
+        PendingSalesTracker(self.storage).mark_notified(['101', '102'])
+        tracker = PendingSalesTracker(self.storage)
+        self.assertIn('101', tracker)
+        self.assertEqual(len(tracker), 2)
+
+    def test_completed_sales_expire(self):
+        tracker = PendingSalesTracker(self.storage)
+        tracker.mark_notified(['101', '102'])
+        tracker.expire(['102'])
+        self.assertNotIn('101', tracker)
+        self.assertIn('102', tracker)
+        self.assertNotIn('101', PendingSalesTracker(self.storage), msg='Expired sale is kept in db')
+
+    def test_long_pending_sale_is_not_notified_again(self):
+        tracker = PendingSalesTracker(self.storage)
+        item = ItemOnSale('101', 1, 500, 'USD', 'Spectrum 2 Case')
+        with patch('pending_sales.time.time', return_value=time.time() - 30 * 24 * 60 * 60):
+            tracker.mark_notified([item.item_id])
+        tracker.expire([item.item_id])
+        self.assertEqual(tracker.select_new([item]), [], msg='Sale pending for a month is notified again')
+        self.assertEqual(PendingSalesTracker(self.storage).select_new([item]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
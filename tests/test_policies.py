@@ -1,5 +1,8 @@
+import random
 import unittest
-from policies import price_update_policy
+from policies import price_update_policy, batch_price_update_policy, get_changed_indices
+from policies import PRICE_CHANGE, SKIP_UNSET, SKIP_FIRST_IN_QUEUE, SKIP_SAME_PRICE, SKIP_POLICY_ERROR
+from policies import SKIP_USER_INPUT_ERROR
 
 
 class TestPolicies(unittest.TestCase):
@@ -40,6 +43,35 @@ class TestPolicies(unittest.TestCase):
         # Check the target bound
         self.assertEqual(new_price, 1300)
 
+    def test_batch_price_update_policy(self):
+        new_prices, skip_reasons = batch_price_update_policy(
+            current_prices=[1200, 1200, 1200, 1200, 1200, 1200, 1200],
+            lowest_market_prices=[1100, 700, 1500, 1100, 1100, 1201, 1100],
+            min_prices=[900, 900, 900, 0, 900, 900, 1300],
+            target_prices=[1300, 1300, 1300, 1300, 1300, 1300, 1000],
+            positions=[3, 3, 3, 3, 1, 2, 3],
+        )
+        self.assertEqual(new_prices.tolist(), [1099, 1200, 1300, 1099, 1200, 1200, 1200])
+        self.assertEqual(skip_reasons.tolist(), [PRICE_CHANGE, SKIP_SAME_PRICE, PRICE_CHANGE, SKIP_UNSET,
+                                                 SKIP_FIRST_IN_QUEUE, SKIP_SAME_PRICE, SKIP_SAME_PRICE])
+        self.assertEqual(get_changed_indices(skip_reasons).tolist(), [0, 2])
+
+    def test_batch_matches_scalar_policy(self):
+        rng = random.Random(0)
+        rows = [(rng.randint(1, 2000), rng.randint(0, 2000), rng.randint(0, 2000), rng.randint(0, 2000),
+                 rng.randint(1, 5)) for _ in range(5000)]
+        new_prices, skip_reasons = batch_price_update_policy(*zip(*rows))
+
+        for (current, lowest, min_price, target, position), new_price, reason in zip(rows, new_prices, skip_reasons):
+            expected = price_update_policy(current, lowest, min_price, target) if position > 1 else current
+            self.assertEqual(new_price, expected)
+            if reason == PRICE_CHANGE:
+                self.assertTrue(min_price and target and min_price <= expected != current and target >= min_price)
+            elif reason == SKIP_POLICY_ERROR:
+                self.assertLess(expected, min_price)
+            elif reason == SKIP_USER_INPUT_ERROR:
+                self.assertLess(target, min_price)
+
 
 if __name__ == "__main__":
     unittest.main()
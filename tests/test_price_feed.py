@@ -0,0 +1,96 @@
+import json
+import time
+import unittest
+from unittest.mock import patch
+from bot import MarketBot
+from data_structures import ItemOnSale
+from price_feed import PriceFeed, parse_feed_message
+from tests.websocket_stub import WebsocketStub
+
+
+def wait_until(condition, timeout=5.) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestParseFeedMessage(unittest.TestCase):
+    def test_parse_feed_message(self):
+        self.assertEqual(parse_feed_message('{"market_hash_name": "a", "price": "1200"}'), [('a', 1200)])
+        self.assertEqual(parse_feed_message('{"data": [{"market_hash_name": "a", "price": 5}, {"price": 1}]}'),
+                         [('a', 5)], msg='Malformed offer is not skipped')
+        self.assertEqual(parse_feed_message('not json'), [])
+
+
+@unittest.skipUnless(PriceFeed.is_available(), 'websocket-client is not installed')
+class TestPriceFeed(unittest.TestCase):
+    def setUp(self):
+        self.stub = WebsocketStub()
+        self.feed = PriceFeed(self.stub.url, reconnect_delay=0.05)
+        self.feed.subscribe(['Spectrum 2 Case', 'Clutch Case'])
+        self.feed.start()
+        self.assertTrue(self.feed.wait_connected(5), msg='Feed did not connect to the stand-in')
+
+    def tearDown(self):
+        self.feed.stop()
+        self.stub.close()
+
+    def test_subscribe_and_receive_prices(self):
+        self.assertTrue(wait_until(lambda: self.stub.received))
+        self.assertEqual(json.loads(self.stub.received[0])['hash_names'], ['Clutch Case', 'Spectrum 2 Case'])
+
+        self.stub.push(json.dumps({'data': [{'market_hash_name': 'Spectrum 2 Case', 'price': '1234'},
+                                            {'market_hash_name': 'Not subscribed', 'price': '1'}]}))
+        self.assertTrue(wait_until(lambda: self.feed.get_lowest_prices(['Spectrum 2 Case'])))
+        self.assertEqual(self.feed.get_lowest_prices(['Spectrum 2 Case', 'Clutch Case', 'Not subscribed']),
+                         {'Spectrum 2 Case': 1234})
+        self.assertEqual(self.feed.pop_changed_names(), {'Spectrum 2 Case'})
+        self.assertEqual(self.feed.pop_changed_names(), set())
+
+    def test_reconnect_after_drop(self):
+        self.stub.drop_clients()
+        self.assertTrue(wait_until(lambda: self.stub.connections_count == 2), msg='Feed did not reconnect')
+        self.assertTrue(self.feed.wait_connected(5))
+
+    def test_bot_reprices_only_changed_names(self):
+        bot = MarketBot()
+        bot.price_feed = self.feed
+        bot.update_items([ItemOnSale('1', 3, 1500, 'USD', 'Spectrum 2 Case'),
+                          ItemOnSale('2', 3, 1500, 'USD', 'Clutch Case')])
+        for item in bot.items:
+            item.user_min_price, item.user_target_price = 900, 2000
+        self.stub.push(json.dumps({'data': [{'market_hash_name': 'Spectrum 2 Case', 'price': 1200},
+                                            {'market_hash_name': 'Clutch Case', 'price': 1300}]}))
+        self.assertTrue(wait_until(lambda: len(self.feed.get_lowest_prices(['Spectrum 2 Case', 'Clutch Case'])) == 2))
+
+        with patch('bot.get_dict_of_items_lowest_prices_api') as poll, \
+                patch('dispatcher.set_price_api', return_value=False) as set_price:
+            bot.set_user_price_for_all_items()
+            self.assertEqual(set_price.call_count, 2)
+            poll.assert_not_called()
+
+            # Prices were not set, so they are retried although nothing changed in the feed
+            bot.set_user_price_for_all_items()
+            self.assertEqual(set_price.call_count, 4, msg='Failed price changes are not retried')
+
+            set_price.return_value = True
+            bot.set_user_price_for_all_items()
+            self.assertEqual(set_price.call_count, 6)
+            for item in bot.items:
+                item.last_update_time = 0  # past the cool-down
+            bot.set_user_price_for_all_items()
+            self.assertEqual(set_price.call_count, 6, msg='Unchanged names are repriced')
+
+            self.stub.push(json.dumps({'market_hash_name': 'Clutch Case', 'price': 1100}))
+            self.assertTrue(wait_until(lambda: self.feed.get_lowest_prices(['Clutch Case']) == {'Clutch Case': 1100}))
+            bot.set_user_price_for_all_items()
+            set_price.assert_called_with('2', 1099)
+            self.assertEqual(set_price.call_count, 7)
+            poll.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
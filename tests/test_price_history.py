@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from array import array
+from pathlib import Path
+from price_history import PriceHistory, OWN_PRICE_SERIES, CHUNK_MAX_POINTS, RAW_RETENTION_SECONDS
+from price_history import RETENTION_SECONDS, DOWNSAMPLED_RESOLUTION_SECONDS, downsample_points
+from storage import BotStorage
+from tests.fake_clock import FakeClock
+
+
+class TestPriceHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.storage = BotStorage(Path(self.tmp_dir.name) / 'bot_data.db')
+        self.clock = FakeClock(1_700_000_000.)
+        self.history = PriceHistory(self.storage, clock=self.clock)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_only_changes_are_stored(self):
+        for price in (1200, 1200, 1150, 1150, 1100, 1300):
+            self.history.record_lowest_prices({'Clutch Case': price, 'Spectrum 2 Case': 700})
+            self.clock.now += 10
+        times, prices = self.history.query('Clutch Case')
+        self.assertEqual(prices.tolist(), [1200, 1150, 1100, 1300])
+        self.assertEqual(times.dtype.name, 'float64')
+        self.assertEqual(times[1] - times[0], 20)
+        self.assertEqual(self.history.query('Spectrum 2 Case')[1].tolist(), [700])
+        self.assertEqual(self.history.count_undercuts('Clutch Case'), 2)
+
+    def test_nothing_is_written_before_flush(self):
+        self.history.record_own_prices({'Clutch Case': 499})
+        self.assertEqual(self.storage.get_price_chunks(OWN_PRICE_SERIES, 'Clutch Case', 0, float('inf')), [])
+        self.history.flush()
+        self.assertEqual(len(self.storage.get_price_chunks(OWN_PRICE_SERIES, 'Clutch Case', 0, float('inf'))), 1)
+
+    def test_full_chunks_are_sealed(self):
+        point_count = CHUNK_MAX_POINTS * 2 + 10
+        for price in range(point_count):
+            self.history.record_lowest_prices({'Clutch Case': price})
+            self.clock.now += 1
+        self.history.flush()
+        _, prices = self.history.query('Clutch Case')
+        self.assertEqual(prices.tolist(), list(range(point_count)))
+        self.assertEqual(len(self.storage.get_price_chunks('lowest', 'Clutch Case', 0, float('inf'))), 3)
+
+    def test_query_time_range(self):
+        for price in range(10):
+            self.history.record_lowest_prices({'Clutch Case': price})
+            self.clock.now += 1
+        start = self.clock.now - 10
+        times, prices = self.history.query('Clutch Case', start_time=start + 2, end_time=start + 4)
+        self.assertEqual(prices.tolist(), [2, 3, 4])
+
+    def test_downsampling_and_retention(self):
+        for price in range(100):
+            self.history.record_lowest_prices({'Clutch Case': price})
+            self.clock.now += 60
+        self.history.flush()
+
+        self.history.maintain(now=self.clock.now + RAW_RETENTION_SECONDS)
+        times, prices = self.history.query('Clutch Case')
+        self.assertLess(len(prices), 100 * 60 // DOWNSAMPLED_RESOLUTION_SECONDS + 2)
+        self.assertEqual(prices[-1], 99, msg='Last price is lost after downsampling')
+
+        self.history.maintain(now=self.clock.now + RETENTION_SECONDS)
+        self.assertEqual(len(self.history.query('Clutch Case')[0]), 0)
+
+    def test_downsample_points(self):
+        times, prices = downsample_points(array('d', [0, 100, 299, 300, 650]), array('q', [5, 4, 3, 2, 1]), 300)
+        self.assertEqual((times.tolist(), prices.tolist()), ([299, 300, 650], [3, 2, 1]))
+
+    def test_background_flush(self):
+        history = PriceHistory(self.storage, flush_interval=0.01)
+        history.start()
+        history.record_lowest_prices({'Clutch Case': 500})
+        history.stop()
+        self.assertEqual(len(self.storage.get_price_chunks('lowest', 'Clutch Case', 0, float('inf'))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from price_index import iter_dump_items, build_index, PriceDumpIndex, dump_price_to_int
+
+DUMP_ITEMS = [
+    {'market_hash_name': '★ Driver Gloves | Racing Green (Field-Tested)', 'volume': '3', 'price': '160.5'},
+    {'market_hash_name': 'Spectrum 2 Case', 'volume': '1000', 'price': '0.123'},
+    {'market_hash_name': 'Spectrum 2 Case', 'volume': '5', 'price': '0.120'},
+    {'market_hash_name': 'Broken item', 'volume': '1', 'price': 'n/a'},
+]
+DUMP = json.dumps({'success': True, 'time': 1672531200, 'currency': 'USD', 'items': DUMP_ITEMS},
+                  ensure_ascii=False).encode()
+
+
+def split_bytes(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestPriceIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_path = Path(self.tmp_dir.name) / 'prices.idx'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iter_dump_items_from_small_chunks(self):
+        # 1 byte chunks split multibyte characters and every json token
+        self.assertEqual(list(iter_dump_items(split_bytes(DUMP, 1))), DUMP_ITEMS)
+        self.assertEqual(list(iter_dump_items(split_bytes(DUMP, 4096))), DUMP_ITEMS)
+
+    def test_iter_dump_items_without_items(self):
+        self.assertEqual(list(iter_dump_items([b'{"success": false}'])), [])
+
+    def test_dump_price_to_int(self):
+        self.assertEqual(dump_price_to_int('0.123'), 123)
+        self.assertEqual(dump_price_to_int(160.5), 160500)
+        self.assertEqual(dump_price_to_int('n/a'), 0)
+
+    def test_truncated_dump_raises(self):
+        truncated_dump = DUMP[:DUMP.rindex(b'"price"')]
+        with self.assertRaises(ValueError):
+            list(iter_dump_items(split_bytes(truncated_dump, 16)))
+        self.assertEqual(list(iter_dump_items([b'{"success": false}'])), [])
+
+    def test_build_index_and_lookup(self):
+        self.assertEqual(build_index(iter_dump_items([DUMP]), self.index_path), 2)
+        index = PriceDumpIndex(self.index_path)
+        self.assertEqual(index.lookup('★ Driver Gloves | Racing Green (Field-Tested)'), 160500)
+        self.assertEqual(index.lookup('Spectrum 2 Case'), 120, msg='Duplicate name does not keep lowest price')
+        self.assertEqual(index.lookup('Broken item'), 0)
+        self.assertEqual(index.lookup('Unknown item'), 0)
+        self.assertEqual(index.lookup_many(['Spectrum 2 Case', 'Unknown item']), {'Spectrum 2 Case': 120})
+        index.close()
+
+    def test_replace_keeps_old_index_on_empty_dump(self):
+        index = PriceDumpIndex(self.index_path)
+        self.assertTrue(index.is_stale(60), msg='Missing index is not stale')
+        self.assertEqual(index.replace(iter_dump_items([DUMP])), 2)
+        self.assertFalse(index.is_stale(60))
+
+        self.assertEqual(index.replace(iter_dump_items([b'{"success": false}'])), 0)
+        self.assertEqual(index.lookup('Spectrum 2 Case'), 120, msg='Empty dump replaced the index')
+        index.close()
+
+    def test_truncated_index_is_missing(self):
+        build_index(iter_dump_items([DUMP]), self.index_path)
+        data = self.index_path.read_bytes()
+        for size in (10, len(data) - len(data) // 2):
+            self.index_path.write_bytes(data[:size])
+            index = PriceDumpIndex(self.index_path)
+            self.assertEqual(len(index), 0, msg=f'Index truncated to {size} bytes is opened')
+            self.assertTrue(index.is_stale(60))
+            self.assertEqual(index.lookup('Spectrum 2 Case'), 0)
+            index.close()
+
+    def test_lookup_many_names(self):
+        items = ({'market_hash_name': f'item {i}', 'price': f'{i}.001'} for i in range(1, 5001))
+        build_index(items, self.index_path)
+        index = PriceDumpIndex(self.index_path)
+        self.assertEqual(len(index), 5000)
+        self.assertTrue(all(index.lookup(f'item {i}') == i * 1000 + 1 for i in range(1, 5001)))
+        index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
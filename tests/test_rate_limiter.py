@@ -0,0 +1,59 @@
+import time
+import unittest
+from threading import Thread
+from rate_limiter import TokenBucket, get_rate_limiter, get_rate_limiter_for_url, reset_rate_limiters
+from tests.fake_clock import FakeClock
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, burst=5, clock=clock)
+        self.assertTrue(all(bucket.try_acquire() for _ in range(5)), msg='Burst is not allowed')
+        self.assertFalse(bucket.try_acquire(), msg='More tokens than burst size')
+
+        clock.now += 0.2
+        self.assertTrue(bucket.try_acquire(), msg='Token was not refilled')
+        self.assertFalse(bucket.try_acquire())
+
+    def test_penalize_lowers_rate_and_recovers(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, burst=4, clock=clock)
+        bucket.penalize()
+        self.assertEqual(bucket.rate, 2)
+        self.assertFalse(bucket.try_acquire(), msg='Burst is kept after rate-limit error')
+
+        clock.now += 60
+        bucket.try_acquire()
+        self.assertEqual(bucket.rate, 4, msg='Rate is not restored after error-free period')
+
+    def test_acquire_shared_between_threads(self):
+        bucket = TokenBucket(rate=50, burst=5)
+        start = time.monotonic()
+        threads = [Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 15 tokens: 5 from burst + 10 refilled at 50/sec
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_acquire_timeout(self):
+        bucket = TokenBucket(rate=1, burst=1)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0.01))
+
+
+class TestLimiterRegistry(unittest.TestCase):
+    def tearDown(self):
+        reset_rate_limiters()
+
+    def test_limiter_keyed_by_host_and_key(self):
+        limiter = get_rate_limiter_for_url('https://market.csgo.com/api/v2/items?key=abc')
+        self.assertIs(limiter, get_rate_limiter('market.csgo.com', 'abc'))
+        self.assertIs(limiter, get_rate_limiter_for_url('https://market.csgo.com/api/v2/set-price?key=abc&price=1'))
+        self.assertIsNot(limiter, get_rate_limiter_for_url('https://market.csgo.com/api/v2/items?key=other'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from requests import ConnectionError, ReadTimeout, Response
+from metrics import circuit_breaker_state, circuit_breaker_rejected_total
+from resilience import (CircuitBreaker, classify_exception, classify_response, get_backoff_delay,
+                        STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN)
+from tests.fake_clock import FakeClock
+
+
+def make_response(status_code: int) -> Response:
+    response = Response()
+    response.status_code = status_code
+    return response
+
+
+class TestErrorClassification(unittest.TestCase):
+    def test_classify(self):
+        self.assertEqual(classify_exception(ReadTimeout()), 'timeout')
+        self.assertEqual(classify_exception(ConnectionError()), 'connection')
+        self.assertEqual(classify_response(make_response(429)), 'rate_limit')
+        self.assertEqual(classify_response(make_response(503)), 'server')
+        self.assertIsNone(classify_response(make_response(200)))
+        self.assertIsNone(classify_response(make_response(404)), msg='Client errors are answers of a working server')
+
+    def test_backoff_grows_with_jitter(self):
+        self.assertEqual([get_backoff_delay(attempt, 0.5, rng=lambda: 1.) for attempt in range(6)],
+                         [0.5, 1., 2., 4., 8., 8.])
+        self.assertEqual(get_backoff_delay(3, 0.5, rng=lambda: 0.25), 1.)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('test-endpoint', failure_threshold=3, recovery_seconds=10, clock=self.clock)
+
+    def test_opens_after_failures_in_a_row(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.breaker.record_success()
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, STATE_CLOSED, msg='Success did not reset the failures')
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, STATE_OPEN)
+        self.assertEqual(circuit_breaker_state.value(endpoint='test-endpoint'), 2)
+
+        rejected_count = circuit_breaker_rejected_total.value(endpoint='test-endpoint')
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(circuit_breaker_rejected_total.value(endpoint='test-endpoint'), rejected_count + 1)
+
+    def test_half_open_probe(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 10.
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, STATE_HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request(), msg='Second request went through while probing')
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, STATE_OPEN, msg='Failed probe did not open the breaker again')
+        self.assertFalse(self.breaker.allow_request())
+
+        self.clock.now = 20.
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_lost_probe_expires(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.clock.now = 10.
+        self.assertTrue(self.breaker.allow_request())
+        self.clock.now = 20.
+        self.assertTrue(self.breaker.allow_request(), msg='Probe without outcome blocks the endpoint')
+
+
+if __name__ == "__main__":
+    unittest.main()
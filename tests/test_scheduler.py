@@ -0,0 +1,51 @@
+import unittest
+from data_structures import ItemOnSale
+from scheduler import RepriceScheduler, get_urgency
+
+
+class TestUrgency(unittest.TestCase):
+    def test_urgency_components(self):
+        base = get_urgency(position=2, price=1000, lowest_price=1000, seconds_since_ready=0, seconds_since_check=0)
+        self.assertGreater(get_urgency(8, 1000, 1000, 0, 0), base, msg='Position is ignored')
+        self.assertGreater(get_urgency(2, 1200, 1000, 0, 0), base, msg='Price gap is ignored')
+        self.assertGreater(get_urgency(2, 1000, 1000, 30, 30), base, msg='Waiting time is ignored')
+        self.assertEqual(get_urgency(2, 1000, 1000, 30, 0), base, msg='Waiting does not restart after check')
+        self.assertEqual(get_urgency(2, 1000, 1000, -5, 30), base, msg='Item in cool-down is waiting')
+        self.assertEqual(get_urgency(1, 900, 1000, 0, 0), 0.)
+
+
+class TestRepriceScheduler(unittest.TestCase):
+    def test_select_most_urgent_within_budget(self):
+        scheduler = RepriceScheduler(cool_down_seconds=9, max_items_per_pass=2)
+        items = [ItemOnSale('near', 2, 1010, 'USD', 'a'), ItemOnSale('far', 15, 1500, 'USD', 'b'),
+                 ItemOnSale('middle', 5, 1100, 'USD', 'c')]
+        for item in items:
+            item.last_update_time = 1000.
+        scheduler.observe_lowest_prices({'a': 1000, 'b': 1000, 'c': 1000})
+
+        selected = scheduler.select(items, now=1010.)
+        self.assertEqual([item.item_id for item in selected], ['far', 'middle'])
+
+    def test_price_gap_raises_urgency(self):
+        scheduler = RepriceScheduler(cool_down_seconds=9, max_items_per_pass=1)
+        items = [ItemOnSale('small gap', 3, 1010, 'USD', 'a'), ItemOnSale('big gap', 3, 1300, 'USD', 'b')]
+        scheduler.observe_lowest_prices({'a': 1000, 'b': 1000})
+        self.assertEqual(scheduler.select(items, now=100.)[0].item_id, 'big gap')
+
+    def test_deferred_items_are_not_starved(self):
+        scheduler = RepriceScheduler(cool_down_seconds=9, max_items_per_pass=1)
+        items = [ItemOnSale('quiet', 2, 1001, 'USD', 'a'), ItemOnSale('busy', 4, 1001, 'USD', 'b')]
+        scheduler.observe_lowest_prices({'a': 1000, 'b': 1000})
+        selected_ids = [scheduler.select(items, now=float(now))[0].item_id for now in range(0, 60, 5)]
+        self.assertIn('quiet', selected_ids, msg='Less urgent item is never selected')
+
+    def test_retain(self):
+        scheduler = RepriceScheduler(cool_down_seconds=9)
+        scheduler.select([ItemOnSale('1', 2, 1001, 'USD', 'a')], now=0.)
+        scheduler.observe_lowest_prices({'a': 1000})
+        scheduler.retain([])
+        self.assertEqual((scheduler._last_check_time, scheduler._last_lowest_prices), ({}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
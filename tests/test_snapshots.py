@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+from threading import Thread, Event
+from bot import MarketBot
+from commands import CommandQueue, SetUserPrices
+from data_structures import ItemOnSale
+from snapshots import InventorySnapshot, take_snapshot
+
+
+def make_items(count: int) -> list[ItemOnSale]:
+    return [ItemOnSale(str(100 + i), 2, 1000 + i, 'USD', f'name {i % 3}') for i in range(count)]
+
+
+class TestSnapshots(unittest.TestCase):
+    def test_copy_on_write(self):
+        items = make_items(5)
+        first = take_snapshot(items, InventorySnapshot())
+        self.assertEqual((first.version, len(first)), (1, 5))
+        self.assertIs(take_snapshot(items, first), first, msg='New snapshot without changes')
+
+        items[2].price = 5000
+        second = take_snapshot(items, first)
+        self.assertEqual(second.version, 2)
+        self.assertEqual((first.get('102').price, second.get('102').price), (1002, 5000))
+        self.assertIs(second.items[0], first.items[0], msg='Unchanged item is copied')
+
+        self.assertEqual(take_snapshot(items[::-1], second).items[0].item_id, '104')
+        self.assertEqual(len(take_snapshot(items[:3], second)), 3)
+
+    def test_snapshot_is_immutable(self):
+        snapshot = take_snapshot(make_items(1), InventorySnapshot())
+        with self.assertRaises(AttributeError):
+            snapshot.items[0].price = 1
+
+    def test_command_queue(self):
+        queue = CommandQueue()
+        queue.submit(SetUserPrices('1', 100))
+        queue.submit(SetUserPrices('2', target_price=900))
+        self.assertEqual(queue.drain(), [SetUserPrices('1', 100, None), SetUserPrices('2', None, 900)])
+        self.assertEqual(queue.drain(), [])
+
+
+class TestBotCommands(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bot = MarketBot(db_path=Path(self.tmp_dir.name) / 'bot_data.db')
+        self.bot.update_items(make_items(50))
+        self.bot.publish_snapshot()
+
+    def tearDown(self):
+        self.bot.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_commands_are_applied_saved_and_published(self):
+        self.bot.submit_user_prices('101', 100, 900)
+        self.bot.submit_user_prices('101', target_price=950)
+        self.bot.submit_user_prices('unknown', 100, 900)
+        self.assertEqual(self.bot.snapshot.get('101').user_min_price, 0, msg='Applied before the owner did')
+
+        self.assertEqual(self.bot.apply_commands(), 3)
+        item_snapshot = self.bot.snapshot.get('101')
+        self.assertEqual((item_snapshot.user_min_price, item_snapshot.user_target_price), (100, 950))
+        self.assertEqual(self.bot.storage.get_all_user_prices(), {'101': (100, 950)})
+
+    def test_readers_never_see_half_applied_edits(self):
+        stop_event = Event()
+        torn_reads = []
+
+        def read_snapshots():
+            while not stop_event.is_set():
+                for item in self.bot.snapshot:
+                    if item.user_min_price != item.user_target_price:
+                        torn_reads.append(item)
+
+        reader = Thread(target=read_snapshots)
+        reader.start()
+        try:
+            for value in range(1, 200):
+                for item in make_items(50):
+                    self.bot.submit_user_prices(item.item_id, value, value)
+                self.bot.apply_commands()
+        finally:
+            stop_event.set()
+            reader.join()
+        self.assertEqual(torn_reads, [])
+        self.assertEqual(self.bot.snapshot.get('100').user_target_price, 199)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+from bot import MarketBot
+from data_structures import ItemOnSale
+from storage import BotStorage
+
+
+class TestBotStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+        self.storage = BotStorage(self.db_path)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_wal_mode(self):
+        journal_mode = self.storage._connection.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(journal_mode, 'wal')
+
+    def test_batch_save_and_get(self):
+        self.storage.save_user_prices([(str(i), 100 + i, 900 + i) for i in range(2000)])
+        self.storage.save_user_prices([('5', 1, 2)])
+        user_prices = self.storage.get_user_prices([str(i) for i in range(0, 2000, 5)] + ['999999'])
+        self.assertEqual(len(user_prices), 400)
+        self.assertEqual(user_prices['5'], (1, 2))
+        self.assertEqual(user_prices['1995'], (2095, 2895))
+
+    def test_data_version_changes_on_commits(self):
+        version = self.storage.get_data_version()
+        self.assertEqual(self.storage.get_data_version(), version, msg='Version changed without commits')
+
+        self.storage.save_user_prices([('1', 100, 900)])
+        own_commit_version = self.storage.get_data_version()
+        self.assertNotEqual(own_commit_version, version)
+
+        other_storage = BotStorage(self.db_path)
+        other_storage.save_user_prices([('2', 100, 900)])
+        other_storage.close()
+        self.assertNotEqual(self.storage.get_data_version(), own_commit_version,
+                            msg='Commit from another connection is not detected')
+
+
+class TestMarketBotUserPrices(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bot = MarketBot()
+        self.bot.db_path = Path(self.tmp_dir.name) / 'bot_data.db'
+
+    def tearDown(self):
+        self.bot.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_update_user_prices_reloads_only_on_change(self):
+        self.bot.update_items([ItemOnSale('1', 2, 500, 'USD', 'name'), ItemOnSale('2', 2, 500, 'USD', 'name')])
+        self.bot.save_items_user_prices_to_db([('1', 100, 900)])
+        self.bot.update_user_prices_from_db()
+        self.assertEqual((self.bot.items.get('1').user_min_price, self.bot.items.get('1').user_target_price),
+                         (100, 900))
+
+        loaded_prices = self.bot._user_prices
+        self.bot.update_user_prices_from_db()
+        self.assertIs(self.bot._user_prices, loaded_prices, msg='Unchanged prices were reloaded')
+
+        self.bot.save_item_user_prices_to_db('2', 200, 800)
+        self.bot.update_user_prices_from_db()
+        self.assertEqual(self.bot.items.get('2').user_min_price, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from threading import Event, Thread
+from unittest.mock import patch
+from bot import MarketBot
+from supervisor import Account, LowestPricesStore, Supervisor, parse_accounts, get_db_path
+from tests.fake_market import FakeMarket
+from tests.fake_clock import FakeClock
+
+
+class TestAccounts(unittest.TestCase):
+    def test_parse_accounts(self):
+        self.assertEqual(parse_accounts('main=key1, second=key2,'),
+                         [Account('main', 'key1'), Account('second', 'key2')])
+        self.assertNotIn('key1', repr(Account('main', 'key1')), msg='Secret key is shown in logs')
+        with self.assertRaises(ValueError):
+            parse_accounts('main=key1,main=key2')
+        with self.assertRaises(ValueError):
+            parse_accounts('key-without-name')
+        for name in ('../main', 'a/b', '..', 'a\\b'):
+            with self.assertRaises(ValueError, msg=f'Account name {name!r} escapes the database directory'):
+                parse_accounts(f'{name}=key1')
+
+    def test_db_path_per_account(self):
+        self.assertNotEqual(get_db_path(Path('.'), Account('a', 'k')), get_db_path(Path('.'), Account('b', 'k')))
+
+
+class TestLowestPricesStore(unittest.TestCase):
+    def test_prices_expire(self):
+        clock = FakeClock()
+        store = LowestPricesStore(ttl=3, clock=clock)
+        store.update({'Clutch Case': 500})
+        self.assertEqual(store.get_many(['Clutch Case', 'Unknown']), {'Clutch Case': 500})
+        clock.now += 3
+        self.assertEqual(store.get_many(['Clutch Case']), {})
+        self.assertEqual(len(store), 0)
+
+    @patch('bot.get_dict_of_items_lowest_prices_api')
+    def test_bots_share_lowest_prices(self, lowest_prices_mock):
+        store = LowestPricesStore()
+        first_bot, second_bot = MarketBot(shared_lowest_prices=store), MarketBot(shared_lowest_prices=store)
+        lowest_prices_mock.return_value = {'Clutch Case': 500}
+        self.assertEqual(first_bot.get_lowest_prices(['Clutch Case']), {'Clutch Case': 500})
+
+        lowest_prices_mock.return_value = {'Spectrum 2 Case': 1200}
+        self.assertEqual(second_bot.get_lowest_prices(['Clutch Case', 'Spectrum 2 Case']),
+                         {'Clutch Case': 500, 'Spectrum 2 Case': 1200})
+        lowest_prices_mock.assert_called_with(['Spectrum 2 Case'])
+
+
+class TestSupervisor(unittest.TestCase):
+    def test_workers_run_and_stop(self):
+        market = FakeMarket().start()
+        market.add_item('101', 'Clutch Case', price=1500, competitor_price=1200)
+        accounts = [Account('main', 'key1'), Account('second', 'key2')]
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.dict(os.environ, {'MARKET_API_URL': market.api_url, 'TELEGRAM_API_URL': market.url}):
+            supervisor = Supervisor(accounts, Path(tmp_dir), log_level='WARNING')
+            stop_event = Event()
+            supervisor_thread = Thread(target=supervisor.run, args=(stop_event,))
+            supervisor_thread.start()
+            deadline = time.monotonic() + 30
+            while len(market.items_requests_times) < 2 and time.monotonic() < deadline:
+                time.sleep(0.1)
+            stop_event.set()
+            supervisor_thread.join(60)
+            market.stop()
+
+            self.assertFalse(supervisor_thread.is_alive())
+            self.assertEqual([process.exitcode for process in supervisor.processes.values()], [0, 0])
+            for account in accounts:
+                self.assertTrue(get_db_path(Path(tmp_dir), account).exists())
+        self.assertGreaterEqual(len(market.items_requests_times), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
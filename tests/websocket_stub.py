@@ -0,0 +1,103 @@
+import socket
+import struct
+from base64 import b64encode
+from hashlib import sha1
+from threading import Thread, Lock
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def encode_frame(message: str, opcode=0x1) -> bytes:
+    payload = message.encode()
+    if len(payload) < 126:
+        header = struct.pack('!BB', 0x80 | opcode, len(payload))
+    elif len(payload) < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, len(payload))
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, len(payload))
+    return header + payload
+
+
+def receive_exactly(client: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = client.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('client disconnected')
+        data += chunk
+    return data
+
+
+class WebsocketStub:
+    """ Local stand-in of the market websocket: records text messages from clients and pushes messages to them. """
+
+    def __init__(self):
+        self.received: list[str] = []
+        self.connections_count = 0
+        self._clients: list[socket.socket] = []
+        self._lock = Lock()
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self.url = f'ws://127.0.0.1:{self._server.getsockname()[1]}/'
+        Thread(target=self._accept_loop, daemon=True).start()
+
+    def push(self, message: str):
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.sendall(encode_frame(message))
+
+    def drop_clients(self):
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.shutdown(socket.SHUT_RDWR)
+            client.close()
+
+    def close(self):
+        self.drop_clients()
+        self._server.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            Thread(target=self._serve_client, args=(client,), daemon=True).start()
+
+    def _serve_client(self, client: socket.socket):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += client.recv(1024)
+        headers = dict(line.split(': ', 1) for line in request.decode().split('\r\n')[1:] if ': ' in line)
+        accept_key = b64encode(sha1((headers['Sec-WebSocket-Key'] + WEBSOCKET_GUID).encode()).digest()).decode()
+        # Registered before the handshake reply, so messages pushed right after the client connected are not lost
+        with self._lock:
+            self._clients.append(client)
+            self.connections_count += 1
+        client.sendall(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                        f'Sec-WebSocket-Accept: {accept_key}\r\n\r\n').encode())
+
+        try:
+            while True:
+                first_byte, second_byte = receive_exactly(client, 2)
+                opcode, length = first_byte & 0x0F, second_byte & 0x7F
+                if length == 126:
+                    length, = struct.unpack('!H', receive_exactly(client, 2))
+                elif length == 127:
+                    length, = struct.unpack('!Q', receive_exactly(client, 8))
+                mask = receive_exactly(client, 4)  # client frames are always masked
+                payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(receive_exactly(client, length)))
+                if opcode == 0x8:  # close
+                    client.sendall(encode_frame('', opcode=0x8))
+                    break
+                if opcode == 0x1:
+                    with self._lock:
+                        self.received.append(payload.decode())
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+            client.close()